@@ -0,0 +1,1693 @@
+import ccxt
+import ccxt.async_support as ccxt_async
+import asyncio
+import concurrent.futures
+import time
+import logging
+import threading
+import queue
+import collections
+import os
+
+try:
+    import ccxt.pro as ccxtpro # Websocket support, bundled with ccxt >= 4
+except ImportError:
+    ccxtpro = None
+
+from fees import FeeSchedule, market_fee
+from market_cache import MarketCache
+from market_index import MarketIndex
+from metrics import METRICS_PORT, LatencyMetrics, MetricsServer, PipelineMetrics, render_prometheus
+from order_book import DepthTracker, book_side
+from scheduler import AdaptiveRateScheduler, SymbolPriority, SymbolPriorityScheduler, THROTTLE_ERRORS
+from tick_recorder import TICK_RECORD_DIR, TickRecorder
+from triangular import TriangularTracker
+from spread_engine import OpportunityTracker, SpreadMatrix
+from support_matrix import SupportMatrix
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Path to the binary support matrix written by exchange3.py (primary data source)
+SUPPORT_MATRIX_PATH = r"C:\Users\Automatic\Desktop\arbitrageapp\crypto_exchange_support.bin"
+
+# Path to the Excel file containing crypto support data (legacy fallback)
+EXCEL_FILE_PATH = r"C:\Users\Automatic\Desktop\arbitrageapp\crypto_exchange_support.xlsx"
+
+# All possible exchanges CCXT supports (a subset for demonstration)
+# This list is used to populate the initial exchange selection dropdowns
+all_available_exchanges = [
+    {'id': 'binance', 'name': 'Binance', 'type': 'cex'},
+    {'id': 'coinbase', 'name': 'Coinbase', 'type': 'cex'},
+    {'id': 'kraken', 'name': 'Kraken', 'type': 'cex'},
+    {'id': 'bitget', 'name': 'Bitget', 'type': 'cex'},
+    {'id': 'bybit', 'name': 'Bybit', 'type': 'cex'},
+    {'id': 'kucoin', 'name': 'KuCoin', 'type': 'cex'},
+    {'id': 'bitfinex', 'name': 'Bitfinex', 'type': 'cex'},
+    {'id': 'cryptocom', 'name': 'Crypto.com', 'type': 'cex'},
+    {'id': 'gateio', 'name': 'Gate.io', 'type': 'cex'},
+    {'id': 'huobi', 'name': 'Huobi', 'type': 'cex'},
+    {'id': 'mexc', 'name': 'MEXC', 'type': 'cex'},
+    {'id': 'bitstamp', 'name': 'Bitstamp', 'type': 'cex'},
+    {'id': 'lbank', 'name': 'LBank', 'type': 'cex'},
+    {'id': 'coinex', 'name': 'CoinEx', 'type': 'cex'},
+    {'id': 'ascendex', 'name': 'AscendEX', 'type': 'cex'},
+    {'id': 'digifinex', 'name': 'DigiFineFinex', 'type': 'cex'},
+    {'id': 'fmfwio', 'name': 'FMFW.io', 'type': 'cex'},
+    {'id': 'hitbtc', 'name': 'HitBTC', 'type': 'cex'},
+    {'id': 'phemex', 'name': 'Phemex', 'type': 'cex'},
+    {'id': 'probit', 'name': 'ProBit Global', 'type': 'cex'},
+    {'id': 'whitebit', 'name': 'WhiteBIT', 'type': 'cex'},
+    {'id': 'woo', 'name': 'WOO X', 'type': 'cex'},
+    {'id': 'poloniex', 'name': 'Poloniex', 'type': 'cex'},
+    {'id': 'bitrue', 'name': 'Bitrue', 'type': 'cex'},
+    {'id': 'tokocrypto', 'name': 'Tokocrypto', 'type': 'cex'},
+    {'id': 'indodax', 'name': 'Indodax', 'type': 'cex'},
+    {'id': 'upbit', 'name': 'Upbit', 'type': 'cex'},
+]
+
+# List of exchanges that do not support fetch_tickers with multiple symbols
+# This is used by ExchangePriceFetcher to determine fetch strategy
+SINGLE_TICKER_FETCH_EXCHANGES = ['cryptocom', 'bitfinex']
+
+# Quote currencies tried (in order of preference) when picking the market for a crypto
+QUOTE_CURRENCIES_TO_TRY = ['USDT', 'USD', 'USDC']
+
+# Error codes carried per quote in 'price_batch' messages
+PRICE_OK = 0
+PRICE_NO_MARKET = 1 # No suitable spot market for the crypto on this exchange
+PRICE_FETCH_FAILED = 2 # The individual fetch_ticker request failed
+PRICE_NOT_IN_BATCH = 3 # Missing from (or failed in) the fetch_tickers batch
+PRICE_EXPIRED = 4 # Not in batches: the GUI's status for a quote dropped after its TTL (see QUOTE_TTL_SECONDS)
+
+# Streaming mode: subscribe to websocket ticker channels (ccxt.pro) instead of polling REST.
+# Exchanges without ticker streams automatically fall back to REST polling.
+USE_STREAMING = False
+STREAM_RECONNECT_MIN_DELAY = 1 # seconds, doubled after every failed reconnect
+STREAM_RECONNECT_MAX_DELAY = 30
+STREAM_IDLE_TIMEOUT = 5 # seconds to wait for a frame before re-checking whether to stop
+
+# Set to e.g. ws://127.0.0.1:8765 to stream from mock_ws_server.py instead of real exchanges
+MOCK_WS_URL = os.environ.get('CRYPTO_ARB_MOCK_WS_URL')
+
+# Fetch engine used by the GUI: 'threads' (one ExchangePriceFetcher thread per exchange)
+# or 'asyncio' (AsyncExchangeManager, one event loop driving all exchanges).
+FETCH_ENGINE = 'threads'
+# Max in-flight requests per exchange: fetch_ticker fan-out of single-ticker exchanges
+# (thread pool in the threads engine, semaphore in the asyncio engine)
+DEFAULT_REQUEST_CONCURRENCY = 8
+ASYNC_STOP_TIMEOUT = 5 # Seconds stop_all() waits for exchanges to close their connections
+
+# Depth mode: fetch the order books of cryptos with a wide top-of-book spread and
+# compute VWAP-based executable spreads (see order_book.py for its thresholds)
+DEPTH_MODE = False
+# Order book limits for exchanges that only accept specific values (default: DEPTH_LEVELS)
+DEPTH_FETCH_LIMITS = {'bitfinex': 25}
+
+# Triangular mode: fetch every ticker of each exchange in its fetch_tickers call and scan
+# the exchange's whole market graph for profitable 3-market cycles (see triangular.py).
+# Exchanges in SINGLE_TICKER_FETCH_EXCHANGES and ticker streams are not scanned.
+TRIANGULAR_MODE = False
+
+# Minimum seconds between fetch cycles of an exchange. The actual pace is set per
+# exchange by its AdaptiveRateScheduler (scheduler.py) from the ccxt rateLimit.
+DEFAULT_FETCH_INTERVAL = 0.5
+
+# Number of best opportunities tracked (and shown on the GUI's Arbitrage Spreads tab)
+SPREADS_TOP_K = 100
+
+# Seconds after which a received quote expires: it is dropped from latest_prices and
+# the spreads, so an exchange that stopped responding can't keep producing phantom
+# opportunities. Keep it above scheduler.COLD_REFRESH_SECONDS, the target age of cold
+# cryptos on single-ticker exchanges. 0 = quotes never expire.
+QUOTE_TTL_SECONDS = 90
+# A single-ticker exchange may need longer than that to request every crypto once at its
+# sustainable rate (e.g. ~300 cryptos at ~3 req/s on bitfinex), so its TTL is raised to
+# this many full sweeps, as reported by its fetcher in a 'fetch_pace' message.
+QUOTE_TTL_SWEEP_MARGIN = 2.0
+EXCHANGE_QUOTE_TTLS = {} # Per-exchange overrides (win over the derived TTL), e.g. {'bitfinex': 300}
+QUOTE_SWEEP_INTERVAL = 1.0 # Seconds between expiry sweeps, i.e. how late a quote may expire
+
+# Shared on-disk cache of load_markets() results (also used by exchange3.py),
+# so fetcher threads can start quoting without re-downloading market metadata.
+market_cache = MarketCache()
+
+
+class PriceBatch:
+    """
+    Collects the quotes of one fetch cycle for one exchange as parallel lists and
+    publishes them as a single 'price_batch' message, instead of one message per crypto.
+
+    Message layout:
+        {'type': 'price_batch', 'id': exchange_id, 'received_at': ms since epoch,
+         'base_cryptos': [...], 'symbols': [...], 'bids': [...], 'asks': [...],
+         'timestamps': [...], 'durations': [...], 'errors': [...], 'error': str or None,
+         'endpoint': 'fetch_tickers', 'fetch_ticker', 'stream' or None}
+    where 'timestamps' are the exchange's ticker timestamps (ms, or None), 'durations'
+    the request durations (ms, or None) and 'errors' one of the PRICE_* codes.
+    'error' describes a failure of the whole exchange (e.g. initialization).
+    'endpoint' is how the quotes were fetched (see metrics.LatencyMetrics).
+    """
+    __slots__ = ('exchange_id', 'base_cryptos', 'symbols', 'bids', 'asks', 'timestamps', 'durations', 'errors', 'error',
+                 'endpoint')
+
+    def __init__(self, exchange_id, endpoint=None):
+        self.exchange_id = exchange_id
+        self.endpoint = endpoint
+        self.base_cryptos = []
+        self.symbols = []
+        self.bids = []
+        self.asks = []
+        self.timestamps = []
+        self.durations = []
+        self.errors = []
+        self.error = None
+
+    def __len__(self):
+        return len(self.base_cryptos)
+
+    def add(self, base_crypto, symbol, bid_price, ask_price, timestamp=None, duration=None, error=PRICE_OK):
+        self.base_cryptos.append(base_crypto)
+        self.symbols.append(symbol)
+        self.bids.append(bid_price)
+        self.asks.append(ask_price)
+        self.timestamps.append(timestamp)
+        self.durations.append(duration)
+        self.errors.append(error)
+
+    def add_ticker(self, base_crypto, symbol, ticker, duration=None):
+        self.add(base_crypto, symbol, ticker.get('bid'), ticker.get('ask'), ticker.get('timestamp'), duration)
+
+    def publish(self, data_queue):
+        """Puts the batch on the queue as one message (nothing is sent for an empty batch without an error)."""
+        if not self.base_cryptos and self.error is None:
+            return
+        data_queue.put({
+            'type': 'price_batch',
+            'id': self.exchange_id,
+            'received_at': time.time_ns() // 1_000_000,
+            'base_cryptos': self.base_cryptos,
+            'symbols': self.symbols,
+            'bids': self.bids,
+            'asks': self.asks,
+            'timestamps': self.timestamps,
+            'durations': self.durations,
+            'errors': self.errors,
+            'error': self.error,
+            'endpoint': self.endpoint,
+        })
+
+
+def apply_price_batch(message, latest_prices, previous_prices, scrape_stats):
+    """
+    Applies a 'price_batch' message to the shared price state in one step:
+    stores every quote in `latest_prices[base][exchange]` with the exchange's
+    timestamp and the batch's 'received_at' (both ms), remembers the bids
+    it replaced in `previous_prices`, and folds the request durations into
+    `scrape_stats[exchange]`. Returns the list of durations in the batch.
+    Kept free of any Tk code so it can be benchmarked and reused headless.
+    """
+    exchange_id = message['id']
+    received_at = message['received_at']
+    for base_crypto, symbol, bid_price, ask_price, timestamp in zip(message['base_cryptos'], message['symbols'],
+                                                                    message['bids'], message['asks'], message['timestamps']):
+        latest_prices[base_crypto][exchange_id] = {'bid': bid_price, 'ask': ask_price, 'symbol': symbol,
+                                                   'timestamp': timestamp, 'received_at': received_at}
+        previous_prices[base_crypto][exchange_id] = bid_price
+
+    durations = [d for d in message['durations'] if d is not None]
+    if durations and exchange_id in scrape_stats:
+        stats = scrape_stats[exchange_id]
+        stats['total_duration'] += sum(durations)
+        stats['count'] += len(durations)
+        stats['average'] = stats['total_duration'] / stats['count']
+    return durations
+
+
+def _notify(notify, level, title, message):
+    """Passes a problem to the front-end's `notify(level, title, message)` callback, if any (level: 'error' or 'warning')."""
+    if notify is not None:
+        notify(level, title, message)
+
+
+def load_and_filter_cryptos(selected_exchange_ids, matrix_path=SUPPORT_MATRIX_PATH, excel_path=EXCEL_FILE_PATH, notify=None):
+    """
+    Returns a sorted list of cryptocurrency symbols supported by ALL selected exchanges.
+    Reads the binary support matrix when it exists and falls back to the legacy
+    Excel report otherwise.
+
+    Args:
+        selected_exchange_ids (list): A list of exchange IDs (e.g., ['binance', 'mexc'])
+                                      that the user has selected.
+        matrix_path (str): The full path to the crypto_exchange_support.bin file.
+        excel_path (str): The full path to the crypto_exchange_support.xlsx file.
+        notify (callable): Optional `notify(level, title, message)` used to show problems to the user.
+    """
+    if not os.path.exists(matrix_path):
+        logger.info(f"Support matrix not found at {matrix_path}, falling back to Excel file.")
+        return load_and_filter_cryptos_from_excel(excel_path, selected_exchange_ids, notify)
+
+    try:
+        matrix = SupportMatrix.load(matrix_path)
+    except (OSError, ValueError) as e:
+        _notify(notify, 'error', "Error Reading Support Matrix", f"An error occurred while reading the support matrix: {e}")
+        logger.error(f"Error reading support matrix {matrix_path}: {type(e).__name__} - {str(e)}")
+        return []
+
+    missing_exchanges = [ex_id for ex_id in selected_exchange_ids if ex_id not in matrix.bitsets]
+    if missing_exchanges:
+        logger.warning(f"Support matrix has no data for {missing_exchanges}, excluding them from filtering.")
+        _notify(notify, 'warning', "Missing Exchange Data",
+                f"The support matrix is missing data for the following selected exchanges: {', '.join(missing_exchanges)}\n"
+                "These exchanges will be excluded from filtering.")
+
+    available_exchanges = [ex_id for ex_id in selected_exchange_ids if ex_id in matrix.bitsets]
+    if not available_exchanges:
+        logger.warning("No valid exchanges found in the support matrix for the selected exchanges.")
+        return []
+
+    common_cryptos = matrix.common_cryptos(available_exchanges)
+    logger.info(f"Filtered {len(common_cryptos)} common cryptocurrencies for selected exchanges: {selected_exchange_ids}")
+    return common_cryptos
+
+
+def load_and_filter_cryptos_from_excel(excel_path, selected_exchange_ids, notify=None):
+    """
+    Loads the crypto support data from the Excel file and filters
+    cryptocurrencies that are supported by ALL selected exchanges.
+
+    Args:
+        excel_path (str): The full path to the crypto_exchange_support.xlsx file.
+        selected_exchange_ids (list): A list of exchange IDs (e.g., ['binance', 'mexc'])
+                                      that the user has selected.
+        notify (callable): Optional `notify(level, title, message)` used to show problems to the user.
+
+    Returns:
+        list: A sorted list of cryptocurrency symbols (e.g., ['BTC', 'ETH'])
+              that are supported by all specified exchanges.
+    """
+    if not os.path.exists(excel_path):
+        _notify(notify, 'error', "File Not Found", f"The Excel file was not found at: {excel_path}\n"
+                                                   "Please ensure the file exists at the specified location.")
+        logger.error(f"Excel file not found at {excel_path}")
+        return []
+
+    try:
+        import pandas as pd # Only needed for the legacy Excel path
+
+        # Read the Excel file. The 'Crypto' column is the index.
+        df = pd.read_excel(excel_path, sheet_name='Crypto Support', index_col='Crypto')
+
+        # Map display names from Excel columns back to CCXT IDs for filtering
+        # This assumes the Excel columns are the 'name' from all_available_exchanges
+        # and we need to convert them to 'id' for filtering.
+        exchange_name_to_id_map = {ex['name']: ex['id'] for ex in all_available_exchanges}
+        
+        # Filter df columns to only include the selected exchanges' names
+        # Need to convert selected_exchange_ids to their corresponding names in the DataFrame
+        selected_exchange_names = [ex['name'] for ex in all_available_exchanges if ex['id'] in selected_exchange_ids]
+        
+        # Check if all selected exchange names exist as columns in the DataFrame
+        missing_columns = [name for name in selected_exchange_names if name not in df.columns]
+        if missing_columns:
+            logger.warning(f"Excel file has no data for {missing_columns}, excluding them from filtering.")
+            _notify(notify, 'warning', "Missing Exchange Data",
+                    f"The Excel file is missing data for the following selected exchanges: {', '.join(missing_columns)}\n"
+                    "These exchanges will be excluded from filtering.")
+            # Filter out the missing columns from selected_exchange_names
+            selected_exchange_names = [name for name in selected_exchange_names if name in df.columns]
+
+        if not selected_exchange_names:
+            logger.warning("No valid exchange columns found in Excel for the selected exchanges.")
+            return []
+
+        df_filtered = df[selected_exchange_names]
+
+        # Convert '✅' to True and '❌' to False for boolean logic
+        # Explicitly call .infer_objects(copy=False) to address FutureWarning
+        df_filtered = df_filtered.replace({'✅': True, '❌': False}).infer_objects(copy=False)
+
+        # Find cryptos where ALL selected exchanges have 'True' (i.e., '✅')
+        # Use .all(axis=1) to check if all values in a row are True
+        common_cryptos = df_filtered[df_filtered.all(axis=1)].index.tolist()
+
+        logger.info(f"Filtered {len(common_cryptos)} common cryptocurrencies for selected exchanges: {selected_exchange_ids}")
+        return sorted(common_cryptos)
+
+    except FileNotFoundError:
+        # This case is handled by the initial os.path.exists check
+        return []
+    except Exception as e:
+        _notify(notify, 'error', "Error Reading Excel", f"An error occurred while reading the Excel file: {e}")
+        logger.error(f"Error reading Excel file {excel_path}: {type(e).__name__} - {str(e)}")
+        return []
+
+
+def publish_order_book(data_queue, exchange_id, base_crypto, symbol, order_book, levels, duration_ms=None):
+    """
+    Puts a fetched ccxt order book on the queue as an 'order_book' message:
+        {'type': 'order_book', 'id': exchange_id, 'base_crypto': ..., 'symbol': ...,
+         'bids': (n, 2) array, 'asks': (n, 2) array, 'timestamp': ms or None, 'duration': ms}
+    with [price, amount] rows, best level first, at most `levels` per side.
+    """
+    data_queue.put({
+        'type': 'order_book',
+        'id': exchange_id,
+        'base_crypto': base_crypto,
+        'symbol': symbol,
+        'bids': book_side(order_book.get('bids', []), levels),
+        'asks': book_side(order_book.get('asks', []), levels),
+        'timestamp': order_book.get('timestamp'),
+        'duration': duration_ms,
+    })
+
+
+def publish_market_fees(data_queue, exchange, exchange_id, symbols_by_base):
+    """
+    Puts the maker and taker fees of the markets the cryptos are fetched from
+    ({base_crypto: symbol or None}) on the queue, once the exchange's markets are loaded:
+        {'type': 'market_fees', 'id': exchange_id, 'base_cryptos': [...], 'symbols': [...],
+         'maker': [...], 'taker': [...]}
+    """
+    symbols_by_base = {base_crypto: symbol for base_crypto, symbol in symbols_by_base.items() if symbol is not None}
+    if not symbols_by_base:
+        return
+    data_queue.put({
+        'type': 'market_fees',
+        'id': exchange_id,
+        'base_cryptos': list(symbols_by_base),
+        'symbols': list(symbols_by_base.values()),
+        'maker': [market_fee(exchange, symbol, 'maker') for symbol in symbols_by_base.values()],
+        'taker': [market_fee(exchange, symbol, 'taker') for symbol in symbols_by_base.values()],
+    })
+
+
+def publish_fetch_pace(data_queue, exchange_id, scheduler, symbols):
+    """
+    Puts the seconds one cycle over all `symbols` takes at the exchange's sustainable request
+    rate on the queue (ArbitrageCore sizes the exchange's quote TTL from it):
+        {'type': 'fetch_pace', 'id': exchange_id, 'sweep_seconds': seconds}
+    """
+    data_queue.put({
+        'type': 'fetch_pace',
+        'id': exchange_id,
+        'sweep_seconds': fetch_cycle_cost(exchange_id, symbols) / scheduler.sustainable_rate,
+    })
+
+
+class RequestCostMeter:
+    """
+    Sums the rate-limit cost ccxt itself charges for each request of an exchange instance,
+    in units of its `rateLimit` like the AdaptiveRateScheduler tokens. Endpoint weights
+    vary widely: on binance fetch_tickers without a single symbol costs 16 and a ticker
+    0.4, so counting every request as one token would overrun the exchange's limit.
+    Wraps the instance's calculate_rate_limiter_cost, which ccxt calls once per request.
+    """
+    def __init__(self, exchange):
+        self.total = 0.0
+        self.calculate = exchange.calculate_rate_limiter_cost
+        exchange.calculate_rate_limiter_cost = self._metered
+
+    def _metered(self, *args, **kwargs):
+        cost = self.calculate(*args, **kwargs)
+        self.total += cost
+        return cost
+
+    @classmethod
+    def install(cls, exchange):
+        """Meters `exchange`; None for exchanges without ccxt's rate limiter (e.g. fake_exchange.py)."""
+        return cls(exchange) if hasattr(exchange, 'calculate_rate_limiter_cost') else None
+
+
+def fetch_cycle_cost(exchange_id, cryptos):
+    """Number of REST requests one fetch cycle makes: one fetch_tickers call, or one fetch_ticker per crypto."""
+    return len(cryptos) if exchange_id in SINGLE_TICKER_FETCH_EXCHANGES else 1
+
+
+def fetch_endpoint(exchange_id):
+    """The ccxt method a fetch cycle of `exchange_id` gets its quotes from."""
+    return 'fetch_ticker' if exchange_id in SINGLE_TICKER_FETCH_EXCHANGES else 'fetch_tickers'
+
+
+class ExchangePriceFetcher(threading.Thread):
+    """
+    A dedicated thread to continuously fetch prices for a single exchange.
+    This version uses fetch_tickers for efficiency across multiple cryptocurrencies,
+    but falls back to individual fetch_ticker calls for exchanges that don't support it.
+    It now takes a dynamic list of `supported_cryptos_to_fetch`.
+    """
+    def __init__(self, exchange_id, exchange_type, data_queue, latest_prices_ref, 
+                 supported_cryptos_to_fetch, interval=DEFAULT_FETCH_INTERVAL, symbol_priority=None,
+                 max_concurrency=DEFAULT_REQUEST_CONCURRENCY, depth_tracker=None, exchange_factory=None,
+                 pipeline_metrics=None, triangular_tracker=None):
+        super().__init__()
+        self.exchange_id = exchange_id
+        self.exchange_type = exchange_type
+        self.data_queue = data_queue
+        self.latest_prices_ref = latest_prices_ref
+        self.supported_cryptos_to_fetch = supported_cryptos_to_fetch # Dynamic list
+        self.interval = interval # Minimum seconds between cycles
+        self.running = True
+        self.daemon = True
+        self.scheduler = None # AdaptiveRateScheduler, created once the exchange's rateLimit is known
+        self.cost_meter = None # RequestCostMeter of the exchange instance, for bulk requests weighing more than one token
+        self.wake_event = threading.Event() # Interrupts the sleep between cycles
+        self.force_requested = False
+        self.exchange = None
+        self.markets_loaded = False
+        self.market_index = None # MarketIndex over the exchange's spot markets
+        self.supported_symbols_on_exchange = {} # {base_crypto: actual_symbol_on_exchange}
+        self.single_ticker_fetch_exchanges = SINGLE_TICKER_FETCH_EXCHANGES
+        self.max_concurrency = max_concurrency
+        self.request_pool = None # ThreadPoolExecutor for the fetch_ticker fan-out, created on first use
+        self.depth_tracker = depth_tracker # DepthTracker asking for order books (depth mode only)
+        self.exchange_factory = exchange_factory # Optional callable(exchange_id) -> ccxt-like exchange (see fake_exchange.py)
+        self.pipeline_metrics = pipeline_metrics # Optional PipelineMetrics counting the requests
+        self.triangular_tracker = triangular_tracker # TriangularTracker scanning every ticker (triangular mode only)
+        # Hot/cold scheduling of the per-symbol requests (single-ticker exchanges only)
+        self.symbol_scheduler = None
+        if symbol_priority is not None and exchange_id in self.single_ticker_fetch_exchanges:
+            self.symbol_scheduler = SymbolPriorityScheduler(exchange_id, supported_cryptos_to_fetch, symbol_priority)
+
+    def _initialize_exchange(self):
+        """Initializes the CCXT exchange instance and loads markets (from the on-disk cache when fresh) for CEXs."""
+        try:
+            if self.exchange_factory is not None: # Injected exchanges bring their own markets, keep them out of the cache
+                self.exchange = self.exchange_factory(self.exchange_id)
+                self.exchange.load_markets()
+            else:
+                exchange_class = getattr(ccxt, self.exchange_id)
+                self.exchange = exchange_class({
+                    'enableRateLimit': True,
+                    'timeout': 30000, # 30 seconds timeout
+                })
+                market_cache.load_markets(self.exchange)
+            self.cost_meter = RequestCostMeter.install(self.exchange)
+            self.market_index = MarketIndex.from_markets(self.exchange.markets, self.exchange_id)
+            self.markets_loaded = True
+            symbols_by_base = {c: self._determine_actual_symbol(c) for c in self.supported_cryptos_to_fetch}
+            publish_market_fees(self.data_queue, self.exchange, self.exchange_id, symbols_by_base)
+            if self.triangular_tracker is not None and self.exchange_id not in self.single_ticker_fetch_exchanges:
+                self.triangular_tracker.build(self.exchange_id, self.exchange)
+            if self.scheduler is None:
+                self.scheduler = AdaptiveRateScheduler(self.exchange_id, self.exchange.rateLimit, min_interval=self.interval)
+            publish_fetch_pace(self.data_queue, self.exchange_id, self.scheduler, [s for s in symbols_by_base.values() if s])
+            logger.info(f"Markets loaded for CEX {self.exchange_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to initialize or load markets for CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+            batch = PriceBatch(self.exchange_id)
+            batch.error = f"Initialization failed: {str(e)}"
+            batch.publish(self.data_queue)
+            return False
+
+    def _determine_actual_symbol(self, base_crypto):
+        """
+        Determines the actual trading symbol for a given base_crypto on the CEX exchange.
+        Caches results for efficiency. Looks the crypto up in the spot market index
+        and picks the first available quote from QUOTE_CURRENCIES_TO_TRY.
+        """
+        if base_crypto in self.supported_symbols_on_exchange:
+            return self.supported_symbols_on_exchange[base_crypto]
+
+        symbol = self.market_index.symbol_for(base_crypto, QUOTE_CURRENCIES_TO_TRY)
+        if symbol is not None:
+            self.supported_symbols_on_exchange[base_crypto] = symbol
+            return symbol
+        
+        logger.debug(f"No suitable SPOT market symbol found for {base_crypto} on {self.exchange_id}. "
+                     f"Available quotes: {self.market_index.quotes_for(base_crypto)}")
+        return None
+
+    def _plan_cycle(self):
+        """
+        Cryptos to fetch in the next cycle: all of them, except on single-ticker exchanges
+        with symbol priority, where only the due ones (most overdue first) fitting one
+        rate-limit burst are fetched (all of them on force_fetch), possibly none.
+        """
+        if self.symbol_scheduler is None or self.force_requested:
+            return self.supported_cryptos_to_fetch
+        return self.symbol_scheduler.plan(self.scheduler.capacity)
+
+    def _fetch_all_supported_crypto_prices(self, cryptos=None):
+        """
+        Fetches prices for all `supported_cryptos_to_fetch` using fetch_tickers for efficiency (CEX),
+        or individual fetch_ticker calls (CEX) for `cryptos` (default: all of them).
+        Now fetching highest bid and lowest ask.
+        The whole cycle is published as a single PriceBatch message.
+        """
+        if not self.markets_loaded:
+            if not self._initialize_exchange():
+                return
+
+        start_time_ns = time.time_ns()
+        batch = PriceBatch(self.exchange_id, fetch_endpoint(self.exchange_id))
+
+        if self.exchange_id in self.single_ticker_fetch_exchanges:
+            # Fan the fetch_ticker calls out over the request pool; each one is timed on its own
+            pending = {} # {future: (base_crypto, actual_symbol)}
+            for base_crypto in (self.supported_cryptos_to_fetch if cryptos is None else cryptos):
+                actual_symbol = self._determine_actual_symbol(base_crypto)
+                if actual_symbol:
+                    pending[self._request_pool().submit(self._fetch_single_ticker, actual_symbol)] = (base_crypto, actual_symbol)
+                else:
+                    batch.add(base_crypto, None, None, None, error=PRICE_NO_MARKET)
+
+            throttled = False
+            for future in concurrent.futures.as_completed(pending):
+                base_crypto, actual_symbol = pending[future]
+                try:
+                    ticker, duration_ms = future.result()
+                    batch.add_ticker(base_crypto, actual_symbol, ticker, duration_ms)
+                    logger.debug(f"Fetched {base_crypto} from CEX {self.exchange_id} individually in {duration_ms} ms.")
+                    self._record_symbol_fetch(base_crypto, True)
+
+                except concurrent.futures.CancelledError: # Not sent because the exchange throttled us
+                    batch.add(base_crypto, actual_symbol, None, None, error=PRICE_FETCH_FAILED)
+                except THROTTLE_ERRORS as e:
+                    logger.error(f"Throttled by CEX {self.exchange_id} fetching {base_crypto}: {type(e).__name__} - {str(e)}")
+                    batch.add(base_crypto, actual_symbol, None, None, error=PRICE_FETCH_FAILED)
+                    self._record_symbol_fetch(base_crypto, False)
+                    self.scheduler.on_throttle(e)
+                    if not throttled: # Don't keep hammering a throttling exchange for the rest of the cycle
+                        throttled = True
+                        for other in pending:
+                            other.cancel()
+                except Exception as e:
+                    logger.error(f"Error fetching {base_crypto} from CEX {self.exchange_id} individually: {type(e).__name__} - {str(e)}")
+                    batch.add(base_crypto, actual_symbol, None, None, error=PRICE_FETCH_FAILED)
+                    self._record_symbol_fetch(base_crypto, False)
+            if not throttled:
+                self.scheduler.on_success()
+        else:
+            symbols_to_fetch_unique = set()
+            for base_crypto in self.supported_cryptos_to_fetch:
+                actual_symbol = self._determine_actual_symbol(base_crypto)
+                if actual_symbol:
+                    symbols_to_fetch_unique.add(actual_symbol)
+                else:
+                    batch.add(base_crypto, None, None, None, error=PRICE_NO_MARKET)
+            
+            symbols_to_fetch = list(symbols_to_fetch_unique)
+
+            if not symbols_to_fetch:
+                logger.warning(f"No symbols to fetch for CEX {self.exchange_id} in this cycle.")
+                batch.publish(self.data_queue)
+                return
+
+            fetched_base_cryptos_in_batch = set()
+            try:
+                scan_all = self.triangular_tracker is not None and self.triangular_tracker.wants_all_tickers(self.exchange_id)
+                cost_before = self.cost_meter.total if self.cost_meter is not None else None
+                tickers = self._request('fetch_tickers', None if scan_all else symbols_to_fetch)
+                self._charge_bulk_cost(cost_before)
+                end_time_ns = time.time_ns()
+                duration_ms = (end_time_ns - start_time_ns) // 1_000_000
+
+                for symbol, ticker in tickers.items():
+                    base_crypto = self.market_index.symbol_to_base.get(symbol)
+                    if base_crypto is None or symbol not in symbols_to_fetch_unique: # Not one of the fetched spot markets
+                        continue
+                    batch.add_ticker(base_crypto, symbol, ticker, duration_ms)
+                    fetched_base_cryptos_in_batch.add(base_crypto)
+
+                logger.info(f"Successfully fetched {len(tickers)} tickers from CEX {self.exchange_id} in {duration_ms} ms")
+                self.scheduler.on_success()
+                if scan_all:
+                    message = self.triangular_tracker.scan(self.exchange_id, tickers)
+                    if message is not None: # None once the tracker was cleared by a reload mid-fetch
+                        self.data_queue.put(message)
+
+            # Rate limit / DDoS protection errors and RequestTimeout are NetworkErrors, so they must be caught first
+            except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+                logger.error(f"DDoS Protection for CEX {self.exchange_id}: {str(e)}")
+                self.scheduler.on_throttle(e)
+            except ccxt.RequestTimeout as e:
+                logger.error(f"Request Timeout for CEX {self.exchange_id}: {str(e)}")
+                self.scheduler.on_throttle(e)
+            except ccxt.ExchangeNotAvailable as e:
+                logger.error(f"CEX {self.exchange_id} is not available: {str(e)}")
+            except ccxt.NetworkError as e:
+                logger.error(f"Network error with CEX {self.exchange_id}: {str(e)}")
+            except Exception as e:
+                logger.error(f"An unexpected error occurred fetching tickers from CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+            
+            # Ensure all `supported_cryptos_to_fetch` send an update, even if not found in fetch_tickers
+            for base_crypto in self.supported_cryptos_to_fetch:
+                if base_crypto not in fetched_base_cryptos_in_batch and self._determine_actual_symbol(base_crypto):
+                    batch.add(base_crypto, None, None, None, error=PRICE_NOT_IN_BATCH)
+
+        batch.publish(self.data_queue)
+
+    def _request_pool(self):
+        """Thread pool for the fetch_ticker fan-out, at most one rate-limit burst wide."""
+        if self.request_pool is None:
+            workers = max(1, min(self.max_concurrency, int(self.scheduler.capacity)))
+            self.request_pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{self.exchange_id}-ticker")
+        return self.request_pool
+
+    def _request(self, endpoint, *args):
+        """Calls the ccxt method `endpoint`, counting the request (and its failure, by exception class) in the pipeline metrics."""
+        error = None
+        try:
+            return getattr(self.exchange, endpoint)(*args)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.pipeline_metrics is not None:
+                self.pipeline_metrics.count_request(self.exchange_id, endpoint, error)
+
+    def _charge_bulk_cost(self, cost_before):
+        """
+        Charges the scheduler what ccxt weighed the fetch_tickers request just sent beyond the
+        one token its cycle was planned with (e.g. all tickers of binance in triangular mode).
+        """
+        if cost_before is not None:
+            self.scheduler.charge(max(0.0, self.cost_meter.total - cost_before - 1))
+
+    def _fetch_single_ticker(self, symbol):
+        """Runs on the request pool. Returns (ticker, duration in ms of this request alone)."""
+        start_time_ns = time.time_ns()
+        ticker = self._request('fetch_ticker', symbol)
+        return ticker, (time.time_ns() - start_time_ns) // 1_000_000
+
+    def _record_symbol_fetch(self, base_crypto, ok):
+        if self.symbol_scheduler is not None:
+            self.symbol_scheduler.record(base_crypto, ok)
+
+    def _fetch_order_book(self, symbol):
+        """Runs on the request pool. Returns (order book, duration in ms)."""
+        start_time_ns = time.time_ns()
+        order_book = self._request('fetch_order_book', symbol, DEPTH_FETCH_LIMITS.get(self.exchange_id, self.depth_tracker.levels))
+        return order_book, (time.time_ns() - start_time_ns) // 1_000_000
+
+    def _fetch_order_books(self):
+        """Depth mode: fetches the order books the depth tracker wants from this exchange, one message each."""
+        if self.depth_tracker is None or self.scheduler.blocked():
+            return
+        symbols_by_base = {base_crypto: self._determine_actual_symbol(base_crypto) for base_crypto in self.depth_tracker.due(self.exchange_id)}
+        symbols_by_base = {base_crypto: symbol for base_crypto, symbol in symbols_by_base.items() if symbol}
+        if not symbols_by_base:
+            return
+        self.scheduler.charge(len(symbols_by_base))
+        pending = {self._request_pool().submit(self._fetch_order_book, symbol): base_crypto for base_crypto, symbol in symbols_by_base.items()}
+        for future in concurrent.futures.as_completed(pending):
+            base_crypto = pending[future]
+            try:
+                order_book, duration_ms = future.result()
+            except THROTTLE_ERRORS as e:
+                logger.error(f"Throttled by CEX {self.exchange_id} fetching the {base_crypto} order book: {type(e).__name__} - {str(e)}")
+                self.scheduler.on_throttle(e)
+                continue
+            except Exception as e:
+                logger.error(f"Error fetching the {base_crypto} order book from CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+                continue
+            publish_order_book(self.data_queue, self.exchange_id, base_crypto, symbols_by_base[base_crypto],
+                               order_book, self.depth_tracker.levels, duration_ms)
+
+    def run(self):
+        if not self._initialize_exchange():
+            return
+        self._poll_loop()
+
+    def _poll_loop(self):
+        """
+        Fetches from the REST API whenever the rate-limit scheduler allows it, sleeping
+        until the next eligible slot in between, until stopped.
+        """
+        try:
+            while self.running:
+                cryptos = self._plan_cycle()
+                if not cryptos and self.symbol_scheduler is not None: # No quote reached its target age yet
+                    self._fetch_order_books()
+                    self.wake_event.wait(self.symbol_scheduler.idle_delay) # Woken early by force_fetch() and stop()
+                    self.wake_event.clear()
+                    continue
+                cost = fetch_cycle_cost(self.exchange_id, cryptos)
+                delay = self.scheduler.delay(cost, ignore_interval=self.force_requested)
+                if delay > 0:
+                    self.wake_event.wait(delay) # Woken early by force_fetch() and stop()
+                    self.wake_event.clear()
+                    continue
+                self.force_requested = False
+                self.scheduler.start_cycle(cost)
+                self._fetch_all_supported_crypto_prices(cryptos)
+                self._fetch_order_books()
+        finally:
+            if self.request_pool is not None:
+                self.request_pool.shutdown(wait=False)
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+        logger.info(f"Stopped fetching for {self.exchange_id}")
+
+    def force_fetch(self):
+        """Forces a fetch for this specific exchange as soon as its rate limit allows."""
+        self.force_requested = True
+        self.wake_event.set()
+        logger.info(f"Forcing immediate fetch for {self.exchange_id}")
+
+
+class StreamingPriceFetcher(ExchangePriceFetcher):
+    """
+    Streaming variant of ExchangePriceFetcher. Subscribes to the exchange's ticker
+    websocket channels through ccxt.pro (`watch_tickers`, or `watch_ticker` per symbol)
+    and pushes every update to the data queue as soon as it arrives.
+    Reconnects and resubscribes with exponential backoff when the stream drops,
+    and falls back to REST polling when the exchange has no ticker streams.
+    """
+    def __init__(self, exchange_id, exchange_type, data_queue, latest_prices_ref,
+                 supported_cryptos_to_fetch, interval=DEFAULT_FETCH_INTERVAL, ws_exchange_factory=None, symbol_priority=None,
+                 max_concurrency=DEFAULT_REQUEST_CONCURRENCY, depth_tracker=None, exchange_factory=None,
+                 pipeline_metrics=None, triangular_tracker=None):
+        super().__init__(exchange_id, exchange_type, data_queue, latest_prices_ref,
+                         supported_cryptos_to_fetch, interval, symbol_priority=symbol_priority,
+                         max_concurrency=max_concurrency, depth_tracker=depth_tracker, exchange_factory=exchange_factory,
+                         pipeline_metrics=pipeline_metrics, triangular_tracker=triangular_tracker)
+        self.ws_exchange_factory = ws_exchange_factory # Optional callable(exchange_id) -> ccxt.pro-like exchange
+        self.ws_exchange = None
+        self.reconnect_delay = STREAM_RECONNECT_MIN_DELAY
+
+    def _create_ws_exchange(self):
+        """Creates the websocket exchange instance, or returns None if streaming isn't available."""
+        if self.ws_exchange_factory is not None:
+            ws_exchange = self.ws_exchange_factory(self.exchange_id)
+        elif ccxtpro is not None and hasattr(ccxtpro, self.exchange_id):
+            ws_exchange = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True})
+        else:
+            return None
+        # Reuse the markets already loaded (or cached) for the REST instance
+        ws_exchange.set_markets(self.exchange.markets, self.exchange.currencies)
+        return ws_exchange
+
+    async def _close_ws_exchange(self):
+        if self.ws_exchange is not None:
+            try:
+                await self.ws_exchange.close()
+            except Exception as e:
+                logger.debug(f"Error closing ticker stream for {self.exchange_id}: {type(e).__name__} - {str(e)}")
+            self.ws_exchange = None
+
+    def _emit_tickers(self, tickers):
+        """Publishes one batch for the tickers delivered by a single stream update."""
+        batch = PriceBatch(self.exchange_id, 'stream')
+        now_ms = time.time_ns() // 1_000_000
+        for symbol, ticker in tickers.items():
+            base_crypto = self.market_index.symbol_to_base.get(symbol)
+            if base_crypto is None:
+                continue
+            # For streams, the "duration" is how old the update was when it arrived
+            timestamp = ticker.get('timestamp')
+            duration_ms = max(0, now_ms - timestamp) if timestamp else None
+            batch.add_ticker(base_crypto, symbol, ticker, duration_ms)
+        batch.publish(self.data_queue)
+        self.reconnect_delay = STREAM_RECONNECT_MIN_DELAY # The stream is healthy again
+
+    async def _watch_all_tickers(self, symbols):
+        while self.running:
+            try:
+                tickers = await asyncio.wait_for(self.ws_exchange.watch_tickers(symbols), timeout=STREAM_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                continue # Quiet market, check whether we should stop
+            self._emit_tickers(tickers)
+
+    async def _watch_single_ticker(self, symbol):
+        while self.running:
+            try:
+                ticker = await asyncio.wait_for(self.ws_exchange.watch_ticker(symbol), timeout=STREAM_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                continue
+            self._emit_tickers({symbol: ticker})
+
+    async def _watch_tickers_individually(self, symbols):
+        tasks = [asyncio.ensure_future(self._watch_single_ticker(symbol)) for symbol in symbols]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _stream(self, symbols):
+        """Runs the subscription, reconnecting with exponential backoff until stopped."""
+        while self.running:
+            try:
+                if self.ws_exchange is None:
+                    self.ws_exchange = self._create_ws_exchange()
+                    logger.info(f"Subscribed to {len(symbols)} ticker streams on {self.exchange_id}")
+                if self.ws_exchange.has.get('watchTickers'):
+                    await self._watch_all_tickers(symbols)
+                else:
+                    await self._watch_tickers_individually(symbols)
+            except Exception as e:
+                logger.warning(f"Ticker stream for {self.exchange_id} dropped: {type(e).__name__} - {str(e)}. "
+                               f"Reconnecting in {self.reconnect_delay:.1f} s")
+                await self._close_ws_exchange()
+                reconnect_at = time.time() + self.reconnect_delay
+                while self.running and time.time() < reconnect_at:
+                    await asyncio.sleep(0.1)
+                self.reconnect_delay = min(self.reconnect_delay * 2, STREAM_RECONNECT_MAX_DELAY)
+        await self._close_ws_exchange()
+
+    def run(self):
+        if not self._initialize_exchange():
+            return
+
+        self.ws_exchange = self._create_ws_exchange()
+        if self.ws_exchange is None or not (self.ws_exchange.has.get('watchTickers') or self.ws_exchange.has.get('watchTicker')):
+            logger.info(f"No ticker stream available for {self.exchange_id}, falling back to REST polling.")
+            self.ws_exchange = None
+            self._poll_loop()
+            return
+
+        symbols = []
+        missing = PriceBatch(self.exchange_id)
+        for base_crypto in self.supported_cryptos_to_fetch:
+            actual_symbol = self._determine_actual_symbol(base_crypto)
+            if actual_symbol:
+                symbols.append(actual_symbol)
+            else:
+                missing.add(base_crypto, None, None, None, error=PRICE_NO_MARKET)
+        missing.publish(self.data_queue)
+        if not symbols:
+            logger.warning(f"No symbols to stream for CEX {self.exchange_id}.")
+            return
+
+        asyncio.run(self._stream(symbols))
+
+
+class AsyncExchangeWorker:
+    """
+    Fetches prices for a single exchange as a coroutine on the AsyncExchangeManager's
+    event loop, using ccxt.async_support. Publishes the same 'price_batch' messages
+    on the data queue as ExchangePriceFetcher, one per cycle. At most `max_concurrency` requests to
+    the exchange are in flight at once (this matters for single-ticker exchanges,
+    whose per-symbol requests are issued concurrently).
+    """
+    def __init__(self, exchange_id, exchange_type, data_queue, supported_cryptos_to_fetch,
+                 interval=DEFAULT_FETCH_INTERVAL, max_concurrency=DEFAULT_REQUEST_CONCURRENCY, symbol_priority=None,
+                 depth_tracker=None, exchange_factory=None, pipeline_metrics=None, triangular_tracker=None):
+        self.exchange_id = exchange_id
+        self.exchange_type = exchange_type
+        self.data_queue = data_queue
+        self.supported_cryptos_to_fetch = supported_cryptos_to_fetch
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.exchange = None
+        self.market_index = None
+        self.supported_symbols_on_exchange = {} # {base_crypto: actual_symbol_on_exchange}
+        self.semaphore = None # Created on the event loop
+        self.refresh_event = None # Set to trigger an immediate fetch
+        self.scheduler = None # AdaptiveRateScheduler, created once the exchange's rateLimit is known
+        self.cost_meter = None # RequestCostMeter of the exchange instance, for bulk requests weighing more than one token
+        self.cycle_throttled = False
+        self.depth_tracker = depth_tracker # DepthTracker asking for order books (depth mode only)
+        self.exchange_factory = exchange_factory # Optional callable(exchange_id) -> ccxt.async_support-like exchange
+        self.pipeline_metrics = pipeline_metrics # Optional PipelineMetrics counting the requests
+        self.triangular_tracker = triangular_tracker # TriangularTracker scanning every ticker (triangular mode only)
+        # Hot/cold scheduling of the per-symbol requests (single-ticker exchanges only)
+        self.symbol_scheduler = None
+        if symbol_priority is not None and exchange_id in SINGLE_TICKER_FETCH_EXCHANGES:
+            self.symbol_scheduler = SymbolPriorityScheduler(exchange_id, supported_cryptos_to_fetch, symbol_priority)
+
+    async def _initialize_exchange(self):
+        try:
+            if self.exchange_factory is not None: # Injected exchanges bring their own markets, keep them out of the cache
+                self.exchange = self.exchange_factory(self.exchange_id)
+                await self.exchange.load_markets()
+            else:
+                exchange_class = getattr(ccxt_async, self.exchange_id)
+                self.exchange = exchange_class({
+                    'enableRateLimit': True,
+                    'timeout': 30000, # 30 seconds timeout
+                })
+                await market_cache.load_markets_async(self.exchange)
+            self.cost_meter = RequestCostMeter.install(self.exchange)
+            self.market_index = MarketIndex.from_markets(self.exchange.markets, self.exchange_id)
+            symbols_by_base = {c: self._determine_actual_symbol(c) for c in self.supported_cryptos_to_fetch}
+            publish_market_fees(self.data_queue, self.exchange, self.exchange_id, symbols_by_base)
+            if self.triangular_tracker is not None and self.exchange_id not in SINGLE_TICKER_FETCH_EXCHANGES:
+                # Enumerating the cycles of thousands of markets takes a moment, keep it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, self.triangular_tracker.build, self.exchange_id, self.exchange)
+            self.scheduler = AdaptiveRateScheduler(self.exchange_id, self.exchange.rateLimit, min_interval=self.interval)
+            publish_fetch_pace(self.data_queue, self.exchange_id, self.scheduler, [s for s in symbols_by_base.values() if s])
+            logger.info(f"Markets loaded for CEX {self.exchange_id} (asyncio engine)")
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to initialize or load markets for CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+            batch = PriceBatch(self.exchange_id)
+            batch.error = f"Initialization failed: {str(e)}"
+            batch.publish(self.data_queue)
+            return False
+
+    def _determine_actual_symbol(self, base_crypto):
+        if base_crypto not in self.supported_symbols_on_exchange:
+            self.supported_symbols_on_exchange[base_crypto] = self.market_index.symbol_for(base_crypto, QUOTE_CURRENCIES_TO_TRY)
+        return self.supported_symbols_on_exchange[base_crypto]
+
+    async def _request(self, endpoint, *args):
+        """Awaits the ccxt method `endpoint`, counting the request (and its failure) like ExchangePriceFetcher._request."""
+        error = None
+        try:
+            return await getattr(self.exchange, endpoint)(*args)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.pipeline_metrics is not None:
+                self.pipeline_metrics.count_request(self.exchange_id, endpoint, error)
+
+    def _charge_bulk_cost(self, cost_before):
+        """Charges the extra weight of a fetch_tickers request (see ExchangePriceFetcher._charge_bulk_cost)."""
+        if cost_before is not None:
+            self.scheduler.charge(max(0.0, self.cost_meter.total - cost_before - 1))
+
+    async def _fetch_single_ticker(self, batch, base_crypto, symbol):
+        async with self.semaphore:
+            start_time_ns = time.time_ns()
+            try:
+                ticker = await self._request('fetch_ticker', symbol)
+            except asyncio.CancelledError:
+                raise
+            except THROTTLE_ERRORS as e:
+                logger.error(f"Throttled by CEX {self.exchange_id} fetching {base_crypto}: {type(e).__name__} - {str(e)}")
+                batch.add(base_crypto, symbol, None, None, error=PRICE_FETCH_FAILED)
+                self._record_symbol_fetch(base_crypto, False)
+                self.scheduler.on_throttle(e)
+                self.cycle_throttled = True
+                return
+            except Exception as e:
+                logger.error(f"Error fetching {base_crypto} from CEX {self.exchange_id} individually: {type(e).__name__} - {str(e)}")
+                batch.add(base_crypto, symbol, None, None, error=PRICE_FETCH_FAILED)
+                self._record_symbol_fetch(base_crypto, False)
+                return
+            duration_ms = (time.time_ns() - start_time_ns) // 1_000_000
+        batch.add_ticker(base_crypto, symbol, ticker, duration_ms)
+        self._record_symbol_fetch(base_crypto, True)
+
+    def _record_symbol_fetch(self, base_crypto, ok):
+        if self.symbol_scheduler is not None:
+            self.symbol_scheduler.record(base_crypto, ok)
+
+    def _plan_cycle(self, forced):
+        """Cryptos to fetch in the next cycle (see ExchangePriceFetcher._plan_cycle)."""
+        if self.symbol_scheduler is None or forced:
+            return self.supported_cryptos_to_fetch
+        return self.symbol_scheduler.plan(self.scheduler.capacity)
+
+    async def _fetch_order_book(self, base_crypto, symbol):
+        async with self.semaphore:
+            start_time_ns = time.time_ns()
+            try:
+                order_book = await self._request('fetch_order_book', symbol, DEPTH_FETCH_LIMITS.get(self.exchange_id, self.depth_tracker.levels))
+            except asyncio.CancelledError:
+                raise
+            except THROTTLE_ERRORS as e:
+                logger.error(f"Throttled by CEX {self.exchange_id} fetching the {base_crypto} order book: {type(e).__name__} - {str(e)}")
+                self.scheduler.on_throttle(e)
+                return
+            except Exception as e:
+                logger.error(f"Error fetching the {base_crypto} order book from CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+                return
+            duration_ms = (time.time_ns() - start_time_ns) // 1_000_000
+        publish_order_book(self.data_queue, self.exchange_id, base_crypto, symbol, order_book, self.depth_tracker.levels, duration_ms)
+
+    async def _fetch_order_books(self):
+        """Depth mode: fetches the order books the depth tracker wants from this exchange, one message each."""
+        if self.depth_tracker is None or self.scheduler.blocked():
+            return
+        symbols_by_base = {base_crypto: self._determine_actual_symbol(base_crypto) for base_crypto in self.depth_tracker.due(self.exchange_id)}
+        symbols_by_base = {base_crypto: symbol for base_crypto, symbol in symbols_by_base.items() if symbol}
+        if symbols_by_base:
+            self.scheduler.charge(len(symbols_by_base))
+            await asyncio.gather(*(self._fetch_order_book(base, symbol) for base, symbol in symbols_by_base.items()))
+
+    async def _fetch_all_supported_crypto_prices(self, cryptos=None):
+        batch = PriceBatch(self.exchange_id, fetch_endpoint(self.exchange_id))
+        self.cycle_throttled = False
+        try:
+            await self._fill_batch(batch, self.supported_cryptos_to_fetch if cryptos is None else cryptos)
+        finally:
+            batch.publish(self.data_queue)
+        if not self.cycle_throttled:
+            self.scheduler.on_success()
+
+    async def _fill_batch(self, batch, cryptos):
+        symbols_by_base = {}
+        for base_crypto in cryptos:
+            actual_symbol = self._determine_actual_symbol(base_crypto)
+            if actual_symbol:
+                symbols_by_base[base_crypto] = actual_symbol
+            else:
+                batch.add(base_crypto, None, None, None, error=PRICE_NO_MARKET)
+
+        if not symbols_by_base:
+            logger.warning(f"No symbols to fetch for CEX {self.exchange_id} in this cycle.")
+            return
+
+        if self.exchange_id in SINGLE_TICKER_FETCH_EXCHANGES:
+            await asyncio.gather(*(self._fetch_single_ticker(batch, base, symbol) for base, symbol in symbols_by_base.items()))
+            return
+
+        fetched_base_cryptos_in_batch = set()
+        try:
+            scan_all = self.triangular_tracker is not None and self.triangular_tracker.wants_all_tickers(self.exchange_id)
+            async with self.semaphore:
+                start_time_ns = time.time_ns()
+                cost_before = self.cost_meter.total if self.cost_meter is not None else None
+                tickers = await self._request('fetch_tickers', None if scan_all else list(symbols_by_base.values()))
+                self._charge_bulk_cost(cost_before)
+                duration_ms = (time.time_ns() - start_time_ns) // 1_000_000
+
+            fetched_symbols = set(symbols_by_base.values())
+            for symbol, ticker in tickers.items():
+                base_crypto = self.market_index.symbol_to_base.get(symbol)
+                if base_crypto is None or symbol not in fetched_symbols:
+                    continue
+                batch.add_ticker(base_crypto, symbol, ticker, duration_ms)
+                fetched_base_cryptos_in_batch.add(base_crypto)
+
+            logger.info(f"Successfully fetched {len(tickers)} tickers from CEX {self.exchange_id} in {duration_ms} ms")
+            if scan_all: # Scanned off the event loop, like the build
+                message = await asyncio.get_running_loop().run_in_executor(
+                    None, self.triangular_tracker.scan, self.exchange_id, tickers)
+                if message is not None: # None once the tracker was cleared by a reload mid-fetch
+                    self.data_queue.put(message)
+
+        except asyncio.CancelledError:
+            raise
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection) as e:
+            logger.error(f"DDoS Protection for CEX {self.exchange_id}: {str(e)}")
+            self.scheduler.on_throttle(e)
+            self.cycle_throttled = True
+        except ccxt.RequestTimeout as e:
+            logger.error(f"Request Timeout for CEX {self.exchange_id}: {str(e)}")
+            self.scheduler.on_throttle(e)
+            self.cycle_throttled = True
+        except ccxt.ExchangeNotAvailable as e:
+            logger.error(f"CEX {self.exchange_id} is not available: {str(e)}")
+        except ccxt.NetworkError as e:
+            logger.error(f"Network error with CEX {self.exchange_id}: {str(e)}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred fetching tickers from CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
+
+        # Ensure all `supported_cryptos_to_fetch` send an update, even if not found in fetch_tickers
+        for base_crypto, symbol in symbols_by_base.items():
+            if base_crypto not in fetched_base_cryptos_in_batch:
+                batch.add(base_crypto, None, None, None, error=PRICE_NOT_IN_BATCH)
+
+    async def run(self):
+        """Fetches whenever the rate-limit scheduler allows it (sooner on force_fetch) until cancelled."""
+        self.semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        self.refresh_event = asyncio.Event()
+        try:
+            if not await self._initialize_exchange():
+                return
+            while True:
+                forced = self.refresh_event.is_set()
+                cryptos = self._plan_cycle(forced)
+                if not cryptos and self.symbol_scheduler is not None: # No quote reached its target age yet
+                    await self._fetch_order_books()
+                    try:
+                        await asyncio.wait_for(self.refresh_event.wait(), timeout=self.symbol_scheduler.idle_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                cost = fetch_cycle_cost(self.exchange_id, cryptos)
+                delay = self.scheduler.delay(cost, ignore_interval=forced)
+                if delay > 0:
+                    if forced: # Only the token budget or a backoff is left to wait for
+                        await asyncio.sleep(delay)
+                        continue
+                    try:
+                        # Sleep until the next eligible slot, waking early on force_fetch()
+                        await asyncio.wait_for(self.refresh_event.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self.refresh_event.clear()
+                self.scheduler.start_cycle(cost)
+                await self._fetch_all_supported_crypto_prices(cryptos)
+                await self._fetch_order_books()
+        finally:
+            if self.exchange is not None:
+                await self.exchange.close()
+            logger.info(f"Stopped fetching for {self.exchange_id}")
+
+    def force_fetch(self):
+        """Wakes the worker for an immediate fetch. Must be called on the event loop thread."""
+        if self.refresh_event is not None:
+            self.refresh_event.set()
+            logger.info(f"Forcing immediate fetch for {self.exchange_id}")
+
+
+class AsyncExchangeManager:
+    """
+    Alternative to ExchangeManager that drives every exchange from a single asyncio
+    event loop running in one background thread, instead of one thread per exchange.
+    It has the same interface (add_exchange, remove_exchange, force_refresh_all,
+    stop_all, active_exchanges) and puts the same messages on `data_queue`, so
+    CryptoPriceApp can use either engine.
+    """
+    def __init__(self, data_queue, latest_prices_ref, supported_cryptos_list, fetch_interval=DEFAULT_FETCH_INTERVAL, exchange_intervals=None,
+                 max_concurrency=DEFAULT_REQUEST_CONCURRENCY, exchange_concurrency=None, symbol_priority=None,
+                 depth_tracker=None, exchange_factory=None, pipeline_metrics=None, triangular_tracker=None):
+        self.data_queue = data_queue
+        self.latest_prices_ref = latest_prices_ref
+        self.supported_cryptos_list = supported_cryptos_list # The dynamically filtered list
+        self.fetch_interval = fetch_interval
+        self.exchange_intervals = exchange_intervals if exchange_intervals is not None else {}
+        self.max_concurrency = max_concurrency
+        self.exchange_concurrency = exchange_concurrency if exchange_concurrency is not None else {}
+        self.symbol_priority = symbol_priority # Shared SymbolPriority for single-ticker exchanges (optional)
+        self.depth_tracker = depth_tracker # Shared DepthTracker (depth mode only)
+        self.triangular_tracker = triangular_tracker # Shared TriangularTracker (triangular mode only)
+        self.exchange_factory = exchange_factory # Optional async exchange factory, replaces ccxt.async_support
+        self.pipeline_metrics = pipeline_metrics # Shared PipelineMetrics (optional)
+        self.active_exchanges = {}
+        self.loop = None
+        self.loop_thread = None
+
+    def _ensure_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self.loop.run_forever, name="AsyncExchangeManager", daemon=True)
+            self.loop_thread.start()
+
+    def add_exchange(self, exchange_id, exchange_type):
+        if exchange_id not in self.active_exchanges:
+            logger.info(f"Adding {exchange_type} exchange: {exchange_id} (asyncio engine)")
+            self._ensure_loop()
+            worker = AsyncExchangeWorker(
+                exchange_id, exchange_type, self.data_queue, self.supported_cryptos_list,
+                interval=self.exchange_intervals.get(exchange_id, self.fetch_interval),
+                max_concurrency=self.exchange_concurrency.get(exchange_id, self.max_concurrency),
+                symbol_priority=self.symbol_priority,
+                depth_tracker=self.depth_tracker,
+                exchange_factory=self.exchange_factory,
+                pipeline_metrics=self.pipeline_metrics,
+                triangular_tracker=self.triangular_tracker
+            )
+            future = asyncio.run_coroutine_threadsafe(worker.run(), self.loop)
+            self.active_exchanges[exchange_id] = {
+                'worker': worker,
+                'future': future,
+                'type': exchange_type
+            }
+            self.data_queue.put({'type': 'add_exchange_row', 'id': exchange_id, 'ex_type': exchange_type})
+        else:
+            logger.warning(f"Exchange {exchange_id} is already active.")
+
+    def remove_exchange(self, exchange_id):
+        if exchange_id in self.active_exchanges:
+            logger.info(f"Removing exchange: {exchange_id}")
+            future = self.active_exchanges[exchange_id]['future']
+            future.cancel()
+            concurrent.futures.wait([future], timeout=1)
+            del self.active_exchanges[exchange_id]
+            self.data_queue.put({'type': 'remove_exchange_row', 'id': exchange_id})
+        else:
+            logger.warning(f"Exchange {exchange_id} is not active.")
+
+    def force_refresh_all(self):
+        if self.loop is None:
+            return
+        for exchange_data in self.active_exchanges.values():
+            self.loop.call_soon_threadsafe(exchange_data['worker'].force_fetch)
+
+    def symbol_freshness(self):
+        """{exchange_id: SymbolPriorityScheduler.freshness()} for the exchanges fetched symbol by symbol."""
+        return {exchange_id: exchange_data['worker'].symbol_scheduler.freshness()
+                for exchange_id, exchange_data in list(self.active_exchanges.items())
+                if exchange_data['worker'].symbol_scheduler is not None}
+
+    def request_rates(self):
+        """{exchange_id: request rate (req/s) its rate-limit scheduler currently allows}"""
+        return {exchange_id: exchange_data['worker'].scheduler.rate
+                for exchange_id, exchange_data in list(self.active_exchanges.items())
+                if exchange_data['worker'].scheduler is not None}
+
+    def stop_all(self):
+        if self.loop is None:
+            return
+        futures = [exchange_data['future'] for exchange_data in self.active_exchanges.values()]
+        for future in futures:
+            future.cancel()
+        # Give the workers a moment to close their HTTP sessions before the loop stops
+        concurrent.futures.wait(futures, timeout=ASYNC_STOP_TIMEOUT)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=1)
+        if not self.loop_thread.is_alive():
+            self.loop.close()
+        self.loop = None
+        self.loop_thread = None
+        logger.info("All exchange fetchers stopped (asyncio engine).")
+
+
+def mock_ws_exchange_factory(url):
+    """Returns a ws_exchange_factory that streams from mock_ws_server.py at `url`."""
+    from mock_ws_server import MockWsExchange # Optional, needs the websockets package
+    return lambda exchange_id: MockWsExchange(exchange_id, url)
+
+
+class ExchangeManager:
+    """
+    Manages active exchange threads and their configurations.
+    Now dynamically receives `supported_cryptos_list`.
+    With `streaming=True`, exchanges are watched over websockets (see StreamingPriceFetcher).
+    """
+    def __init__(self, data_queue, latest_prices_ref, supported_cryptos_list, fetch_interval=DEFAULT_FETCH_INTERVAL, exchange_intervals=None,
+                 streaming=False, ws_exchange_factory=None, symbol_priority=None,
+                 max_concurrency=DEFAULT_REQUEST_CONCURRENCY, exchange_concurrency=None, depth_tracker=None,
+                 exchange_factory=None, pipeline_metrics=None, triangular_tracker=None):
+        self.data_queue = data_queue
+        self.latest_prices_ref = latest_prices_ref
+        self.supported_cryptos_list = supported_cryptos_list # The dynamically filtered list
+        self.fetch_interval = fetch_interval
+        self.exchange_intervals = exchange_intervals if exchange_intervals is not None else {}
+        self.streaming = streaming
+        self.ws_exchange_factory = ws_exchange_factory
+        self.symbol_priority = symbol_priority # Shared SymbolPriority for single-ticker exchanges (optional)
+        self.max_concurrency = max_concurrency
+        self.exchange_concurrency = exchange_concurrency if exchange_concurrency is not None else {}
+        self.depth_tracker = depth_tracker # Shared DepthTracker (depth mode only)
+        self.triangular_tracker = triangular_tracker # Shared TriangularTracker (triangular mode only)
+        self.exchange_factory = exchange_factory # Optional exchange factory, replaces ccxt (REST only)
+        self.pipeline_metrics = pipeline_metrics # Shared PipelineMetrics (optional)
+        self.active_exchanges = {} 
+
+    def add_exchange(self, exchange_id, exchange_type):
+        if exchange_id not in self.active_exchanges:
+            logger.info(f"Adding {exchange_type} exchange: {exchange_id}")
+            interval = self.exchange_intervals.get(exchange_id, self.fetch_interval)
+            max_concurrency = self.exchange_concurrency.get(exchange_id, self.max_concurrency)
+            if self.streaming:
+                fetcher_thread = StreamingPriceFetcher(
+                    exchange_id, exchange_type, self.data_queue, self.latest_prices_ref,
+                    self.supported_cryptos_list, interval, ws_exchange_factory=self.ws_exchange_factory,
+                    symbol_priority=self.symbol_priority, max_concurrency=max_concurrency,
+                    depth_tracker=self.depth_tracker, exchange_factory=self.exchange_factory,
+                    pipeline_metrics=self.pipeline_metrics, triangular_tracker=self.triangular_tracker
+                )
+            else:
+                fetcher_thread = ExchangePriceFetcher(
+                    exchange_id, exchange_type, self.data_queue, self.latest_prices_ref,
+                    self.supported_cryptos_list, interval, # Pass the filtered crypto list
+                    symbol_priority=self.symbol_priority, max_concurrency=max_concurrency,
+                    depth_tracker=self.depth_tracker, exchange_factory=self.exchange_factory,
+                    pipeline_metrics=self.pipeline_metrics, triangular_tracker=self.triangular_tracker
+                )
+            fetcher_thread.start()
+            self.active_exchanges[exchange_id] = {
+                'thread': fetcher_thread,
+                'type': exchange_type
+            }
+            # Fix: Changed 'ex_type' to 'exchange_type' to resolve NameError
+            self.data_queue.put({'type': 'add_exchange_row', 'id': exchange_id, 'ex_type': exchange_type})
+        else:
+            logger.warning(f"Exchange {exchange_id} is already active.")
+
+    def remove_exchange(self, exchange_id):
+        if exchange_id in self.active_exchanges:
+            logger.info(f"Removing exchange: {exchange_id}")
+            self.active_exchanges[exchange_id]['thread'].stop()
+            self.active_exchanges[exchange_id]['thread'].join(timeout=1)
+            del self.active_exchanges[exchange_id]
+            self.data_queue.put({'type': 'remove_exchange_row', 'id': exchange_id})
+        else:
+            logger.warning(f"Exchange {exchange_id} is not active.")
+
+    def force_refresh_all(self):
+        for exchange_data in self.active_exchanges.values():
+            exchange_data['thread'].force_fetch()
+
+    def symbol_freshness(self):
+        """{exchange_id: SymbolPriorityScheduler.freshness()} for the exchanges fetched symbol by symbol."""
+        return {exchange_id: exchange_data['thread'].symbol_scheduler.freshness()
+                for exchange_id, exchange_data in list(self.active_exchanges.items())
+                if exchange_data['thread'].symbol_scheduler is not None}
+
+    def request_rates(self):
+        """{exchange_id: request rate (req/s) its rate-limit scheduler currently allows}"""
+        return {exchange_id: exchange_data['thread'].scheduler.rate
+                for exchange_id, exchange_data in list(self.active_exchanges.items())
+                if exchange_data['thread'].scheduler is not None}
+
+    def stop_all(self):
+        for exchange_data in self.active_exchanges.values():
+            exchange_data['thread'].stop()
+        
+        for exchange_data in self.active_exchanges.values():
+            exchange_data['thread'].join(timeout=1)
+        logger.info("All exchange fetcher threads stopped.")
+
+
+class QuoteSweeper(threading.Thread):
+    """
+    Looks for expired quotes (see ArbitrageCore.expired_quotes) every `interval` seconds
+    and posts them as one 'expire_quotes' message:
+        {'type': 'expire_quotes', 'quotes': [(base_crypto, exchange_id, received_at), ...]}
+    The scan over all quotes runs on this thread; the consumer only drops what it lists.
+    """
+    def __init__(self, core, interval=QUOTE_SWEEP_INTERVAL):
+        super().__init__(name="QuoteSweeper", daemon=True)
+        self.core = core
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            quotes = self.core.expired_quotes()
+            if quotes:
+                self.core.data_queue.put({'type': 'expire_quotes', 'quotes': quotes})
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class ArbitrageCore:
+    """
+    Tk-free live state of the arbitrage watcher: the exchange manager and the queue it
+    publishes to, latest/previous prices, scrape stats and the opportunity tracker.
+    Front-ends (the Tk GUI in okl6.py, headless.py) call load_exchanges() and then
+    either drain the queue with poll() or pass each message to process_message().
+    """
+    def __init__(self, fetch_interval=DEFAULT_FETCH_INTERVAL, exchange_intervals=None, exchange_concurrency=None,
+                 engine=None, streaming=None, top_k=SPREADS_TOP_K, notify=None, symbol_priority=None, depth_tracker=None,
+                 recorder=None, exchange_factory=None, metrics_port=None, quote_ttl=None, exchange_quote_ttls=None,
+                 fee_schedule=None, triangular_tracker=None):
+        self.data_queue = queue.Queue()
+        self.latest_prices = collections.defaultdict(lambda: collections.defaultdict(dict))
+        self.previous_prices = collections.defaultdict(dict)
+        self.scrape_stats = {} # Populated after exchanges are loaded
+
+        self.fetch_interval = fetch_interval
+        self.exchange_intervals = exchange_intervals if exchange_intervals is not None else {}
+        # Max in-flight requests per exchange (default: DEFAULT_REQUEST_CONCURRENCY)
+        self.exchange_concurrency = exchange_concurrency if exchange_concurrency is not None else {}
+        self.engine = engine if engine is not None else FETCH_ENGINE
+        self.streaming = streaming if streaming is not None else USE_STREAMING
+        self.top_k = top_k
+        self.notify = notify # Optional notify(level, title, message) for problems the user should see
+        # Heat of each crypto, used to refresh hot symbols more often on single-ticker exchanges
+        self.symbol_priority = symbol_priority if symbol_priority is not None else SymbolPriority()
+        self.track_heat = False # Only needed while single-ticker exchanges are being fetched
+        # Order books and executable spreads of wide-spread candidates (None unless depth mode is on)
+        self.depth_tracker = depth_tracker if depth_tracker is not None else (DepthTracker() if DEPTH_MODE else None)
+        # Appends every quote to memory-mapped files (None unless TICK_RECORD_DIR is set; recorder=False never records)
+        if recorder is None:
+            recorder = TickRecorder(TICK_RECORD_DIR) if TICK_RECORD_DIR else None
+        self.recorder = recorder if recorder is not False else None
+        # Request latency histograms per exchange and endpoint, and quote staleness per exchange
+        self.latency_metrics = LatencyMetrics()
+        # Request/error/batch counters and tick timings, served in Prometheus format when a metrics port is set
+        self.pipeline_metrics = PipelineMetrics()
+        metrics_port = metrics_port if metrics_port is not None else METRICS_PORT
+        self.metrics_server = MetricsServer(self.prometheus_metrics, port=metrics_port) if metrics_port else None
+        # Builds the REST exchange instances instead of ccxt (e.g. fake_exchange.py for benchmarks)
+        self.exchange_factory = exchange_factory
+        # Seconds a quote stays in the spreads after it was received (0 = forever), and per-exchange overrides
+        self.quote_ttl = quote_ttl if quote_ttl is not None else QUOTE_TTL_SECONDS
+        self.exchange_quote_ttls = exchange_quote_ttls if exchange_quote_ttls is not None else dict(EXCHANGE_QUOTE_TTLS)
+        self.sweep_seconds = {} # {exchange_id: seconds to fetch every crypto once}, from 'fetch_pace' messages
+        self.quote_sweeper = None # Running while the fetchers are
+        # Fee per leg of the net spreads: market fees published by the fetchers, with user overrides
+        self.fee_schedule = fee_schedule if fee_schedule is not None else FeeSchedule()
+        # Profitable 3-market cycles within each exchange (None unless triangular mode is on)
+        self.triangular_tracker = triangular_tracker if triangular_tracker is not None else (
+            TriangularTracker(self.fee_schedule) if TRIANGULAR_MODE else None)
+        if self.triangular_tracker is not None and self.triangular_tracker.fee_schedule is None:
+            self.triangular_tracker.fee_schedule = self.fee_schedule # Same fees (and overrides) as the spreads
+
+        self.selected_exchange_ids = [] # Stores IDs of exchanges selected by the user
+        self.filtered_supported_cryptos = [] # Dynamically updated list of cryptos to scrape
+        # Best opportunity per crypto, rebuilt when exchanges are loaded
+        self.spread_tracker = OpportunityTracker(SpreadMatrix([], []), k=self.top_k)
+        # Initialize the exchange manager with empty lists initially
+        self.exchange_manager = self._create_exchange_manager()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+    def _create_exchange_manager(self):
+        """Creates the exchange manager for the configured engine, fetching `filtered_supported_cryptos`."""
+        if self.engine == 'asyncio':
+            return AsyncExchangeManager(self.data_queue, self.latest_prices,
+                                        self.filtered_supported_cryptos,
+                                        fetch_interval=self.fetch_interval,
+                                        exchange_intervals=self.exchange_intervals,
+                                        exchange_concurrency=self.exchange_concurrency,
+                                        symbol_priority=self.symbol_priority,
+                                        depth_tracker=self.depth_tracker,
+                                        exchange_factory=self.exchange_factory,
+                                        pipeline_metrics=self.pipeline_metrics,
+                                        triangular_tracker=self.triangular_tracker)
+        return ExchangeManager(self.data_queue, self.latest_prices,
+                               self.filtered_supported_cryptos, # Pass the filtered list
+                               fetch_interval=self.fetch_interval,
+                               exchange_intervals=self.exchange_intervals,
+                               streaming=self.streaming,
+                               ws_exchange_factory=mock_ws_exchange_factory(MOCK_WS_URL) if MOCK_WS_URL else None,
+                               symbol_priority=self.symbol_priority,
+                               exchange_concurrency=self.exchange_concurrency,
+                               depth_tracker=self.depth_tracker,
+                               exchange_factory=self.exchange_factory,
+                               pipeline_metrics=self.pipeline_metrics,
+                               triangular_tracker=self.triangular_tracker)
+
+    def load_exchanges(self, selected_exchange_ids):
+        """
+        Stops the running fetchers, resets all state and starts fetching the cryptos
+        common to `selected_exchange_ids`. Returns that crypto list; when it is empty
+        nothing was started.
+        """
+        # Load and filter cryptos based on selected exchanges
+        self.load_universe(selected_exchange_ids, load_and_filter_cryptos(selected_exchange_ids, notify=self.notify))
+        if self.filtered_supported_cryptos:
+            self.start_fetchers()
+        return self.filtered_supported_cryptos
+
+    def start_fetchers(self):
+        """Starts fetching `filtered_supported_cryptos` from every selected exchange (after load_universe())."""
+        self.track_heat = any(ex_id in SINGLE_TICKER_FETCH_EXCHANGES for ex_id in self.selected_exchange_ids)
+
+        # Re-initialize the exchange manager with the selected exchanges and filtered cryptos
+        self.exchange_manager = self._create_exchange_manager()
+
+        # Add selected exchanges to the manager, which will start their fetchers
+        for ex_id in self.selected_exchange_ids:
+            ex_type = next((ex['type'] for ex in all_available_exchanges if ex['id'] == ex_id), 'cex') # Default to cex
+            self.exchange_manager.add_exchange(ex_id, ex_type)
+
+        if self.quote_ttl or any(self.exchange_quote_ttls.values()):
+            self.quote_sweeper = QuoteSweeper(self)
+            self.quote_sweeper.start()
+
+    def _stop_quote_sweeper(self):
+        if self.quote_sweeper is not None:
+            self.quote_sweeper.stop()
+            self.quote_sweeper.join(timeout=1)
+            self.quote_sweeper = None
+
+    def load_universe(self, exchange_ids, cryptos):
+        """
+        Stops the running fetchers and resets all state for `exchange_ids` x `cryptos`
+        without starting any fetcher; messages then come from start_fetchers() or from
+        another source (see replay.py).
+        """
+        self.exchange_manager.stop_all()
+        self._stop_quote_sweeper()
+
+        self.selected_exchange_ids = list(exchange_ids)
+        self.scrape_stats.clear()
+        self.latest_prices.clear()
+        self.previous_prices.clear()
+        self.symbol_priority.clear()
+        self.track_heat = False
+        self.latency_metrics.clear()
+        self.sweep_seconds.clear()
+        if self.depth_tracker is not None:
+            self.depth_tracker.clear()
+        if self.triangular_tracker is not None:
+            self.triangular_tracker.clear()
+        self.exchange_manager.active_exchanges.clear() # Ensure manager's active exchanges are clear
+
+        self.filtered_supported_cryptos = list(cryptos)
+        fees = {ex_id: self.fee_schedule.exchange_fee(ex_id) for ex_id in self.selected_exchange_ids}
+        self.spread_tracker = OpportunityTracker(SpreadMatrix(self.filtered_supported_cryptos, self.selected_exchange_ids, fees),
+                                                 k=self.top_k)
+        if self.depth_tracker is not None:
+            for ex_id, fee in fees.items():
+                self.depth_tracker.set_exchange_fee(ex_id, fee)
+        for ex_id in self.selected_exchange_ids:
+            self.scrape_stats[ex_id] = {'total_duration': 0, 'count': 0, 'average': 0}
+
+    def process_message(self, item):
+        """
+        Applies one queue message to the core state (prices, scrape stats, spreads).
+        Returns the scrape durations of a 'price_batch' message, [] for other messages.
+        """
+        if item['type'] == 'price_batch':
+            if item['error'] is not None:
+                logger.warning(f"{item['id']}: {item['error']}")
+            durations = apply_price_batch(item, self.latest_prices, self.previous_prices, self.scrape_stats)
+            self.latency_metrics.observe_batch(item)
+            self.pipeline_metrics.count_batch(item, item['errors'].count(PRICE_OK))
+            if self.recorder is not None:
+                self.recorder.record_batch(item)
+            start = time.perf_counter()
+            self.spread_tracker.apply_batch(item)
+            self.pipeline_metrics.observe_spread_update(time.perf_counter() - start)
+            if self.track_heat:
+                self.symbol_priority.observe_batch(item, self.spread_tracker)
+            if self.depth_tracker is not None:
+                self.depth_tracker.update_candidates(self.spread_tracker)
+            return durations
+        if item['type'] == 'order_book':
+            self.latency_metrics.observe_order_book(item)
+            self.pipeline_metrics.count_order_book(item['id'])
+            if self.depth_tracker is not None:
+                self.depth_tracker.apply_order_book(item)
+        elif item['type'] == 'remove_exchange_row':
+            self.remove_exchange_data(item['id'])
+        elif item['type'] == 'expire_quotes':
+            self.expire_quotes(item['quotes'])
+        elif item['type'] == 'fetch_pace':
+            self.sweep_seconds[item['id']] = item['sweep_seconds']
+            if self.quote_ttl and self.quote_ttl_for(item['id']) > self.quote_ttl:
+                logger.info(f"{item['id']}: a full fetch takes {item['sweep_seconds']:.0f} s, "
+                            f"quotes expire after {self.quote_ttl_for(item['id']):.0f} s")
+        elif item['type'] == 'triangular':
+            if self.triangular_tracker is not None:
+                self.triangular_tracker.apply(item)
+        elif item['type'] == 'market_fees':
+            fees = self.fee_schedule.fees_for(item)
+            self.spread_tracker.set_fees(item['id'], item['base_cryptos'], fees)
+            if self.depth_tracker is not None:
+                self.depth_tracker.set_fees(item['id'], item['base_cryptos'], fees)
+                self.depth_tracker.update_candidates(self.spread_tracker)
+        return []
+
+    def poll(self):
+        """Drains the queue, applies every message and returns the messages in arrival order."""
+        messages = []
+        try:
+            while True:
+                item = self.data_queue.get_nowait()
+                self.process_message(item)
+                messages.append(item)
+        except queue.Empty:
+            pass
+        return messages
+
+    def remove_exchange_data(self, exchange_id):
+        """Drops the scrape stats, prices and spread quotes of a removed exchange."""
+        self.scrape_stats.pop(exchange_id, None)
+        for crypto_prices in self.latest_prices.values():
+            crypto_prices.pop(exchange_id, None)
+        for crypto_prices in self.previous_prices.values():
+            crypto_prices.pop(exchange_id, None)
+        self.spread_tracker.clear_exchange(exchange_id)
+        self.latency_metrics.clear_exchange(exchange_id)
+        if self.depth_tracker is not None:
+            self.depth_tracker.clear_exchange(exchange_id)
+        if self.triangular_tracker is not None:
+            self.triangular_tracker.clear_exchange(exchange_id)
+
+    def quote_ttl_for(self, exchange_id):
+        """
+        Seconds a quote of `exchange_id` stays usable after it was received (0 = forever): its
+        override, else quote_ttl, raised to QUOTE_TTL_SWEEP_MARGIN full sweeps of a slow exchange.
+        """
+        ttl = self.exchange_quote_ttls.get(exchange_id)
+        if ttl is not None:
+            return ttl
+        if not self.quote_ttl:
+            return self.quote_ttl
+        return max(self.quote_ttl, QUOTE_TTL_SWEEP_MARGIN * self.sweep_seconds.get(exchange_id, 0.0))
+
+    def expired_quotes(self, now_ms=None):
+        """
+        Returns (base_crypto, exchange_id, received_at) for every quote in latest_prices that
+        is older than its exchange's TTL. Only reads the shared state, so QuoteSweeper can call
+        it off the GUI thread; the quotes are dropped when its message reaches expire_quotes().
+        """
+        if now_ms is None:
+            now_ms = time.time_ns() // 1_000_000
+        cutoffs = {} # {exchange_id: oldest received_at still valid, or None if its quotes never expire}
+        expired = []
+        for base_crypto, crypto_prices in list(self.latest_prices.items()):
+            for exchange_id, quote in list(crypto_prices.items()):
+                if exchange_id not in cutoffs:
+                    ttl = self.quote_ttl_for(exchange_id)
+                    cutoffs[exchange_id] = now_ms - ttl * 1000 if ttl else None
+                cutoff = cutoffs[exchange_id]
+                if cutoff is not None and quote['received_at'] < cutoff:
+                    expired.append((base_crypto, exchange_id, quote['received_at']))
+        return expired
+
+    def expire_quotes(self, quotes):
+        """
+        Drops the quotes listed by expired_quotes() from latest_prices, previous_prices and the
+        spreads, skipping those refreshed since the sweep. Returns the (base_crypto, exchange_id)
+        pairs that were dropped.
+        """
+        dropped = []
+        per_exchange = collections.Counter()
+        for base_crypto, exchange_id, received_at in quotes:
+            crypto_prices = self.latest_prices.get(base_crypto, {})
+            quote = crypto_prices.get(exchange_id)
+            if quote is None or quote['received_at'] != received_at:
+                continue
+            del crypto_prices[exchange_id]
+            if not crypto_prices: # Keep the dicts bounded by the live quotes when the universe changes
+                del self.latest_prices[base_crypto]
+            previous = self.previous_prices.get(base_crypto)
+            if previous is not None:
+                previous.pop(exchange_id, None)
+                if not previous:
+                    del self.previous_prices[base_crypto]
+            dropped.append((base_crypto, exchange_id))
+            per_exchange[exchange_id] += 1
+        if not dropped:
+            return dropped
+        self.spread_tracker.clear_quotes(dropped)
+        if self.depth_tracker is not None:
+            self.depth_tracker.update_candidates(self.spread_tracker)
+        self.pipeline_metrics.count_expired(per_exchange)
+        for exchange_id, count in per_exchange.items():
+            logger.info(f"{exchange_id}: {count} quote(s) older than {self.quote_ttl_for(exchange_id)}s expired")
+        return dropped
+
+    def symbol_freshness(self):
+        """Per-crypto quote age, target age, heat and request counts of each single-ticker exchange."""
+        return self.exchange_manager.symbol_freshness()
+
+    def latency_summary(self):
+        """Request latency percentiles per exchange and endpoint, and quote staleness (see LatencyMetrics.summary)."""
+        return self.latency_metrics.summary()
+
+    def prometheus_metrics(self):
+        """The pipeline and latency metrics in Prometheus text format (rendered by the metrics server on each scrape)."""
+        return render_prometheus(self.pipeline_metrics, self.latency_metrics, self.data_queue.qsize(),
+                                 self.exchange_manager.request_rates())
+
+    def best_opportunities(self, k=None):
+        """Returns up to `k` (default: top_k) best cross-exchange opportunities, highest spread first."""
+        return self.spread_tracker.top(k)
+
+    def stop(self):
+        self.exchange_manager.stop_all()
+        self._stop_quote_sweeper()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
@@ -0,0 +1,546 @@
+import argparse
+import collections
+import json
+import logging
+import math
+import os
+import platform
+import queue
+import random
+import subprocess
+import time
+from datetime import datetime, UTC
+
+import ccxt
+import numpy as np
+
+import arbitrage_core
+from fake_exchange import fake_bases, fake_exchange_factory
+from table_view import KeyedTreeView, SortedRowModel
+from triangular import TriangularTracker
+
+# --- Offline benchmarks for the arbitrage watcher's data path ---
+# Run all benchmarks:      python benchmark.py
+# Run selected ones:       python benchmark.py queue
+# Save a report:           python benchmark.py --json bench-new.json
+# Compare with a report:   python benchmark.py --baseline bench-old.json
+# None of them touch the network or open a window.
+
+GUI_REFRESH_SECONDS = 0.2 # update_prices_gui runs every 200 ms (master.after(200, ...) in okl6.py)
+E2E_WARMUP_SECONDS = 1.0 # Market loading and the first cycles are not measured
+
+
+def _synthetic_quotes(n_cryptos, seed=1):
+    rng = random.Random(seed)
+    cryptos = [f"C{i:04d}" for i in range(n_cryptos)]
+    return [(crypto, f"{crypto}/USDT", rng.uniform(1, 100)) for crypto in cryptos]
+
+
+def _legacy_produce(data_queue, exchange_id, quotes):
+    """One dict message per crypto, as ExchangePriceFetcher used to publish them."""
+    for base_crypto, symbol, mid in quotes:
+        data_queue.put({
+            'type': 'price_update',
+            'id': exchange_id,
+            'base_crypto': base_crypto,
+            'symbol': symbol,
+            'bid_price': mid * 0.999,
+            'ask_price': mid * 1.001,
+            'duration': 120,
+            'error': None
+        })
+
+
+def _legacy_consume(data_queue, latest_prices, previous_prices, scrape_stats):
+    """The per-message state updates update_prices_gui used to do, including the status text per item."""
+    processed = 0
+    try:
+        while True:
+            item = data_queue.get_nowait()
+            exchange_id = item['id']
+            base_crypto = item['base_crypto']
+            duration = item['duration']
+            latest_prices[base_crypto][exchange_id] = {'bid': item['bid_price'], 'ask': item['ask_price'], 'symbol': item['symbol']}
+            if duration is not None and exchange_id in scrape_stats:
+                stats = scrape_stats[exchange_id]
+                stats['total_duration'] += duration
+                stats['count'] += 1
+                stats['average'] = stats['total_duration'] / stats['count']
+            previous_prices[base_crypto][exchange_id] = item['bid_price']
+            datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')
+            processed += 1
+    except queue.Empty:
+        pass
+    return processed
+
+
+def _batch_produce(data_queue, exchange_id, quotes):
+    batch = arbitrage_core.PriceBatch(exchange_id)
+    for base_crypto, symbol, mid in quotes:
+        batch.add(base_crypto, symbol, mid * 0.999, mid * 1.001, None, 120)
+    batch.publish(data_queue)
+
+
+def _batch_consume(data_queue, latest_prices, previous_prices, scrape_stats):
+    processed = 0
+    try:
+        while True:
+            item = data_queue.get_nowait()
+            arbitrage_core.apply_price_batch(item, latest_prices, previous_prices, scrape_stats)
+            processed += len(item['base_cryptos'])
+    except queue.Empty:
+        pass
+    datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')
+    return processed
+
+
+def _run_queue_variant(produce, consume, n_exchanges, quotes, cycles):
+    data_queue = queue.Queue()
+    latest_prices = collections.defaultdict(lambda: collections.defaultdict(dict))
+    previous_prices = collections.defaultdict(dict)
+    exchange_ids = [f"ex{i}" for i in range(n_exchanges)]
+    scrape_stats = {ex_id: {'total_duration': 0, 'count': 0, 'average': 0} for ex_id in exchange_ids}
+
+    produce_time = consume_time = 0.0
+    for _ in range(cycles):
+        start = time.perf_counter()
+        for ex_id in exchange_ids:
+            produce(data_queue, ex_id, quotes)
+        produce_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        consume(data_queue, latest_prices, previous_prices, scrape_stats)
+        consume_time += time.perf_counter() - start
+    return produce_time / cycles, consume_time / cycles
+
+
+def bench_queue_messages(n_exchanges=6, n_cryptos=300, cycles=50):
+    """Per-crypto dict messages vs one columnar PriceBatch per exchange per cycle."""
+    quotes = _synthetic_quotes(n_cryptos)
+    print(f"Queue messages: {n_exchanges} exchanges x {n_cryptos} cryptos, {cycles} cycles")
+    print(f"  {'variant':<10} {'messages/tick':>14} {'produce ms':>11} {'consume ms':>11} {'total ms':>9}")
+    results = {}
+    for name, produce, consume, messages in [
+        ('per-item', _legacy_produce, _legacy_consume, n_exchanges * n_cryptos),
+        ('batched', _batch_produce, _batch_consume, n_exchanges),
+    ]:
+        produce_s, consume_s = _run_queue_variant(produce, consume, n_exchanges, quotes, cycles)
+        results[name] = produce_s + consume_s
+        print(f"  {name:<10} {messages:>14} {produce_s * 1000:>11.3f} {consume_s * 1000:>11.3f} {(produce_s + consume_s) * 1000:>9.3f}")
+    print(f"  speedup: {results['per-item'] / results['batched']:.1f}x per tick")
+    return results
+
+
+class _CountingTree:
+    """In-memory stand-in for a ttk.Treeview that counts the calls made on it."""
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.children = []
+        self.values = {}
+        self.calls = 0
+
+    def __getitem__(self, option):
+        return self.columns
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.calls += 1
+        self.children.insert(len(self.children) if index == "end" else index, iid)
+        self.values[iid] = tuple(values)
+        return iid
+
+    def item(self, iid, option=None, values=None, tags=None):
+        self.calls += 1
+        if option == 'values':
+            return self.values[iid]
+        if values is not None:
+            self.values[iid] = tuple(values)
+
+    def delete(self, iid):
+        self.calls += 1
+        self.children.remove(iid)
+        del self.values[iid]
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def get_children(self, parent=''):
+        return tuple(self.children)
+
+    def heading(self, column, **kwargs):
+        self.calls += 1
+
+    def configure(self, **kwargs):
+        pass
+
+
+def _legacy_get_sort_value(value, col):
+    """The old CryptoPriceApp.get_sort_value: parses the formatted cell text back to a float."""
+    if "Bid" in col or "Ask" in col or "Spread" in col:
+        if isinstance(value, str):
+            value = value.replace('$', '').replace(',', '').replace(' ms', '').replace(' %', '').strip()
+        try:
+            return float(value)
+        except ValueError:
+            return float('inf')
+    return value
+
+
+def _legacy_apply_sort(tree, col, sort_order):
+    """The old CryptoPriceApp._apply_sort: read every row, parse, sort, move every row, reset headings."""
+    rows = []
+    for k in tree.get_children(''):
+        item_values = tree.item(k, 'values')
+        rows.append((_legacy_get_sort_value(item_values[tree["columns"].index(col)], col), k))
+    rows.sort(key=lambda x: x[0], reverse=(sort_order == "desc"))
+    for index, (_, k) in enumerate(rows):
+        tree.move(k, '', index)
+    for c in tree["columns"]:
+        tree.heading(c, text=c)
+    tree.heading(col, text=f"{col} (High)")
+
+
+def _spread_row(crypto, spread_pct):
+    values = (crypto, "Binance", "$1.000000", "Kraken", "$1.010000", f"{spread_pct:.2f} %")
+    sort_values = (crypto, "Binance", 1.0, "Kraken", 1.01, spread_pct)
+    return values, sort_values
+
+
+def bench_table_sort(n_rows=500, changed_per_tick=25, idle_ticks=5, cycles=100):
+    """Parsing and re-sorting every Treeview row per tick vs the numeric SortedRowModel + KeyedTreeView."""
+    rng = random.Random(2)
+    columns = ("Crypto", "Buy On", "Buy Ask", "Sell On", "Sell Bid", "Spread (%)")
+    cryptos = [f"C{i:04d}" for i in range(n_rows)]
+    spreads = {crypto: rng.uniform(-1, 1) for crypto in cryptos}
+    # Every cycle changes a few spreads, then the GUI ticks a few more times with nothing new
+    updates = [[(crypto, rng.uniform(-1, 1)) for crypto in rng.sample(cryptos, changed_per_tick)] for _ in range(cycles)]
+    ticks = cycles * (1 + idle_ticks)
+
+    legacy_tree = _CountingTree(columns)
+    for crypto in cryptos:
+        legacy_tree.insert("", "end", iid=crypto, values=_spread_row(crypto, spreads[crypto])[0])
+    legacy_tree.calls = 0
+    start = time.perf_counter()
+    for changes in updates:
+        for crypto, spread_pct in changes:
+            legacy_tree.item(crypto, values=_spread_row(crypto, spread_pct)[0])
+        for _ in range(1 + idle_ticks):
+            _legacy_apply_sort(legacy_tree, "Spread (%)", "desc")
+    legacy_s = (time.perf_counter() - start) / ticks
+    legacy_calls = legacy_tree.calls / ticks
+
+    model_tree = _CountingTree(columns)
+    model = SortedRowModel(columns, "Spread (%)", descending=True)
+    view = KeyedTreeView(model_tree)
+    for crypto in cryptos:
+        values, sort_values = _spread_row(crypto, spreads[crypto])
+        model.set_row(crypto, values, sort_values)
+    view.render_model(model)
+    model_tree.calls = 0
+    start = time.perf_counter()
+    for changes in updates:
+        for crypto, spread_pct in changes:
+            values, sort_values = _spread_row(crypto, spread_pct)
+            model.set_row(crypto, values, sort_values)
+        for _ in range(1 + idle_ticks):
+            model.set_sort("Spread (%)", True)
+            view.render_model(model)
+            view.set_headings({c: f"{c} (High)" if c == "Spread (%)" else c for c in columns})
+    model_s = (time.perf_counter() - start) / ticks
+    model_calls = model_tree.calls / ticks
+
+    # The legacy sort ranks by the 2-decimal text, so only the row model's order is exact
+    model_spreads = [model.rows_by_key[crypto][2][-1] for crypto in model_tree.children]
+    assert model_spreads == sorted(model_spreads, reverse=True)
+    print(f"Table sort: {n_rows} rows, {changed_per_tick} changed per update, {idle_ticks} idle ticks per update")
+    print(f"  {'variant':<10} {'ms/tick':>8} {'tree calls/tick':>16}")
+    print(f"  {'legacy':<10} {legacy_s * 1000:>8.3f} {legacy_calls:>16.1f}")
+    print(f"  {'row model':<10} {model_s * 1000:>8.3f} {model_calls:>16.1f}")
+    print(f"  speedup: {legacy_s / model_s:.1f}x per tick (Python side only; Tk calls are far costlier)")
+    return {'legacy': legacy_s, 'row model': model_s}
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+
+def _drain_like_gui(core, stats):
+    """
+    One update_prices_gui tick without Tk: drains the queue through core.process_message
+    and rebuilds the best-spread list the spreads tab shows. Returns the quote ages (ms from
+    the exchange's ticker timestamp to the end of this tick) of the quotes it applied.
+    """
+    stats['backlog'].append(core.data_queue.qsize())
+    tick_start = time.perf_counter()
+    messages = []
+    try:
+        while True:
+            item = core.data_queue.get_nowait()
+            core.process_message(item)
+            messages.append(item)
+    except queue.Empty:
+        pass
+    core.best_opportunities()
+    stats['busy'] += time.perf_counter() - tick_start
+    displayed_ms = time.time_ns() // 1_000_000
+    ages = []
+    for item in messages:
+        if item['type'] != 'price_batch':
+            continue
+        stats['batches'] += 1
+        for timestamp, bid, error in zip(item['timestamps'], item['bids'], item['errors']):
+            if bid is not None and error == arbitrage_core.PRICE_OK:
+                stats['quotes'] += 1
+                if timestamp is not None:
+                    ages.append(displayed_ms - timestamp)
+            else:
+                stats['failed'] += 1
+    return ages
+
+
+def _run_e2e_case(engine, n_exchanges, n_cryptos, duration, single_ticker_share, fetch_interval, seed, fake_options):
+    """Runs one configuration against fake exchanges and returns its metrics."""
+    exchange_ids = [f"fake{i:02d}" for i in range(n_exchanges)]
+    single_ticker = exchange_ids[:math.ceil(n_exchanges * single_ticker_share)]
+    factory = fake_exchange_factory(asynchronous=(engine == 'asyncio'), single_ticker=single_ticker,
+                                    market_count=n_cryptos, seed=seed, **fake_options)
+    arbitrage_core.SINGLE_TICKER_FETCH_EXCHANGES.extend(single_ticker) # The fetchers decide by exchange id
+    core = arbitrage_core.ArbitrageCore(fetch_interval=fetch_interval, engine=engine, streaming=False,
+                                        exchange_factory=factory)
+    try:
+        core.load_universe(exchange_ids, fake_bases(n_cryptos))
+        # Time the spread engine separately from the rest of process_message
+        spread_times = []
+        apply_batch = core.spread_tracker.apply_batch
+        def timed_apply_batch(message):
+            start = time.perf_counter()
+            apply_batch(message)
+            spread_times.append(time.perf_counter() - start)
+        core.spread_tracker.apply_batch = timed_apply_batch
+
+        core.start_fetchers()
+        stats = {'backlog': [], 'busy': 0.0, 'batches': 0, 'quotes': 0, 'failed': 0}
+        warmup_end = time.perf_counter() + E2E_WARMUP_SECONDS
+        while time.perf_counter() < warmup_end:
+            _drain_like_gui(core, stats)
+            time.sleep(GUI_REFRESH_SECONDS)
+
+        stats = {'backlog': [], 'busy': 0.0, 'batches': 0, 'quotes': 0, 'failed': 0}
+        spread_times.clear()
+        requests_before = sum(exchange.requests for exchange in factory.exchanges.values())
+        ages = []
+        start_wall, start_cpu, start_gui_cpu = time.perf_counter(), time.process_time(), time.thread_time()
+        next_tick = start_wall
+        while next_tick < start_wall + duration:
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+            ages.extend(_drain_like_gui(core, stats))
+            next_tick += GUI_REFRESH_SECONDS
+        wall = time.perf_counter() - start_wall
+        gui_cpu = time.thread_time() - start_gui_cpu
+        fetcher_cpu = time.process_time() - start_cpu - gui_cpu # Every thread but the one draining the queue
+        requests = sum(exchange.requests for exchange in factory.exchanges.values()) - requests_before
+    finally:
+        core.stop()
+        for exchange_id in single_ticker:
+            arbitrage_core.SINGLE_TICKER_FETCH_EXCHANGES.remove(exchange_id)
+
+    return {
+        'quotes_per_s': stats['quotes'] / wall,
+        'failed_per_s': stats['failed'] / wall,
+        'requests_per_s': requests / wall,
+        'fetcher_cpu_pct': fetcher_cpu / wall * 100,
+        'gui_cpu_pct': gui_cpu / wall * 100,
+        'drain_quotes_per_busy_s': (stats['quotes'] + stats['failed']) / stats['busy'] if stats['busy'] else float('nan'),
+        'backlog_max': max(stats['backlog'], default=0),
+        'spread_ms_mean': sum(spread_times) / len(spread_times) * 1000 if spread_times else float('nan'),
+        'spread_ms_p99': _percentile(spread_times, 99) * 1000,
+        'display_latency_ms_p50': _percentile(ages, 50),
+        'display_latency_ms_p99': _percentile(ages, 99),
+    }
+
+
+def bench_end_to_end(exchanges=(2, 8), cryptos=(100, 400), engines=('threads',), duration=4.0, single_ticker_share=0.25,
+                     fetch_interval=arbitrage_core.DEFAULT_FETCH_INTERVAL, seed=1, **fake_options):
+    """
+    The whole pipeline against simulated exchanges (fake_exchange.py): fetchers, queue,
+    a Tk-free update_prices_gui tick every GUI_REFRESH_SECONDS, spread engine and the
+    best-spread list, for every engine x exchange count x crypto count.
+    """
+    print(f"End to end: fake exchanges ({single_ticker_share:.0%} single-ticker), {duration:.0f} s per case "
+          f"after {E2E_WARMUP_SECONDS:.0f} s warmup, GUI tick every {GUI_REFRESH_SECONDS * 1000:.0f} ms")
+    print(f"  {'engine':<8} {'ex':>3} {'cryptos':>7} {'quotes/s':>9} {'req/s':>6} {'fetch CPU%':>10} {'gui CPU%':>8} "
+          f"{'drain q/s':>10} {'backlog':>7} {'spread ms':>9} {'p50 ms':>7} {'p99 ms':>7}")
+    results = {}
+    logging.disable(logging.ERROR) # Fetcher logging would dominate the console (and the CPU numbers)
+    try:
+        for engine in engines:
+            for n_exchanges in exchanges:
+                for n_cryptos in cryptos:
+                    metrics = _run_e2e_case(engine, n_exchanges, n_cryptos, duration, single_ticker_share,
+                                            fetch_interval, seed, fake_options)
+                    results[f"{engine}/{n_exchanges}x{n_cryptos}"] = metrics
+                    print(f"  {engine:<8} {n_exchanges:>3} {n_cryptos:>7} {metrics['quotes_per_s']:>9.0f} "
+                          f"{metrics['requests_per_s']:>6.1f} {metrics['fetcher_cpu_pct']:>10.1f} {metrics['gui_cpu_pct']:>8.1f} "
+                          f"{metrics['drain_quotes_per_busy_s']:>10.0f} {metrics['backlog_max']:>7} "
+                          f"{metrics['spread_ms_mean']:>9.3f} {metrics['display_latency_ms_p50']:>7.0f} "
+                          f"{metrics['display_latency_ms_p99']:>7.0f}")
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+TRIANGULAR_QUOTES = ['USDT', 'BTC', 'ETH', 'BNB', 'USDC', 'EUR', 'TRY', 'FDUSD'] # Quote currencies of the synthetic graph
+
+
+def _synthetic_market_graph(n_markets, seed=1):
+    """
+    A loaded-exchange stand-in with about `n_markets` spot markets (bases listed against
+    a random subset of TRIANGULAR_QUOTES, plus every quote pair) and a matching fetch_tickers
+    response whose prices are consistent up to 0.3% noise, so a few cycles are profitable.
+    """
+    rng = random.Random(seed)
+    usd_price = {quote: 10 ** rng.uniform(-1, 4) for quote in TRIANGULAR_QUOTES}
+    usd_price['USDT'] = 1.0
+    markets = {}
+    for i, quote_a in enumerate(TRIANGULAR_QUOTES):
+        for quote_b in TRIANGULAR_QUOTES[i + 1:]:
+            markets[f"{quote_b}/{quote_a}"] = {'spot': True, 'active': True, 'base': quote_b, 'quote': quote_a}
+    listing_share = 0.35
+    n_bases = max(1, int((n_markets - len(markets)) / (listing_share * len(TRIANGULAR_QUOTES))))
+    for base in fake_bases(n_bases):
+        usd_price[base] = 10 ** rng.uniform(-3, 3)
+        for quote in TRIANGULAR_QUOTES:
+            if rng.random() < listing_share:
+                markets[f"{base}/{quote}"] = {'spot': True, 'active': True, 'base': base, 'quote': quote}
+    tickers = {}
+    for symbol, market in markets.items():
+        mid = usd_price[market['base']] / usd_price[market['quote']] * math.exp(rng.gauss(0, 0.003))
+        tickers[symbol] = {'symbol': symbol, 'bid': mid * 0.9998, 'ask': mid * 1.0002}
+    exchange = collections.namedtuple('GraphExchange', ['markets', 'fees'])(markets, {})
+    return exchange, tickers
+
+
+def bench_triangular(markets=(1000, 5000, 10000), scans=20):
+    """Builds the triangular scanner of one exchange with `markets` spot markets and times a scan of a full fetch_tickers response."""
+    print("Triangular scan: one exchange, every market priced from one fetch_tickers response")
+    print(f"  {'markets':>7} {'cycles':>7} {'build ms':>9} {'scan ms':>8} {'p99 ms':>7} {'found':>5}")
+    results = {}
+    logging.disable(logging.INFO)
+    try:
+        for n_markets in markets:
+            exchange, tickers = _synthetic_market_graph(n_markets)
+            tracker = TriangularTracker()
+            start = time.perf_counter()
+            tracker.build('graph', exchange)
+            build_ms = (time.perf_counter() - start) * 1000
+            scan_ms = []
+            for _ in range(scans):
+                message = tracker.scan('graph', tickers)
+                scan_ms.append(message['scan_ms'])
+            metrics = {'markets': len(exchange.markets), 'cycles': message['cycles_checked'], 'build_ms': build_ms,
+                       'scan_ms_p50': _percentile(scan_ms, 50), 'scan_ms_p99': _percentile(scan_ms, 99),
+                       'found': len(message['cycles'])}
+            results[str(n_markets)] = metrics
+            print(f"  {metrics['markets']:>7} {metrics['cycles']:>7} {build_ms:>9.1f} {metrics['scan_ms_p50']:>8.2f} "
+                  f"{metrics['scan_ms_p99']:>7.2f} {metrics['found']:>5}")
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+BENCHMARKS = {
+    'queue': bench_queue_messages,
+    'sort': bench_table_sort,
+    'e2e': bench_end_to_end,
+    'triangular': bench_triangular,
+}
+
+
+def _git_revision():
+    """(short commit hash, whether tracked files have local changes), or (None, None) outside a git checkout."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True, text=True, check=True)
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.stdout.strip(), bool(status.stdout.strip())
+
+
+def _flatten(results, prefix=''):
+    """{'e2e': {'threads/2x100': {'quotes_per_s': 1.0}}} -> {'e2e/threads/2x100/quotes_per_s': 1.0}"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}/"))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare_reports(baseline, report):
+    """Prints every metric present in both reports, with its relative change."""
+    old, new = _flatten(baseline['results']), _flatten(report['results'])
+    print(f"Compared with {baseline.get('commit') or 'unknown commit'}{' (dirty)' if baseline.get('dirty') else ''} "
+          f"from {baseline.get('created_at', '?')}:")
+    for key in sorted(old.keys() & new.keys()):
+        change = (new[key] - old[key]) / abs(old[key]) * 100 if old[key] else float('nan')
+        print(f"  {key:<55} {old[key]:>12.3f} -> {new[key]:>12.3f} ({change:+.1f} %)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the arbitrage watcher.")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all). Available: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--json', metavar='PATH', help="Write the results, commit and settings to a JSON report.")
+    parser.add_argument('--baseline', metavar='PATH', help="Compare the results with an earlier JSON report.")
+    e2e = parser.add_argument_group("e2e options")
+    e2e.add_argument('--exchanges', type=int, nargs='+', default=[2, 8], help="Exchange counts to scale over.")
+    e2e.add_argument('--cryptos', type=int, nargs='+', default=[100, 400], help="Crypto (market) counts to scale over.")
+    e2e.add_argument('--engines', nargs='+', choices=['threads', 'asyncio'], default=['threads'])
+    e2e.add_argument('--duration', type=float, default=4.0, help="Measured seconds per case.")
+    e2e.add_argument('--single-ticker-share', type=float, default=0.25,
+                     help="Share of the exchanges that only serve fetch_ticker (rounded up).")
+    e2e.add_argument('--fetch-interval', type=float, default=arbitrage_core.DEFAULT_FETCH_INTERVAL)
+    e2e.add_argument('--latency-ms', type=float, default=50.0, help="Median request latency.")
+    e2e.add_argument('--latency-sigma', type=float, default=0.5, help="Lognormal shape of the latency.")
+    e2e.add_argument('--error-rate', type=float, default=0.01, help="Share of requests failing with a network error.")
+    e2e.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests failing with HTTP 429.")
+    e2e.add_argument('--seed', type=int, default=1)
+    triangular = parser.add_argument_group("triangular options")
+    triangular.add_argument('--markets', type=int, nargs='+', default=[1000, 5000, 10000], help="Market counts to scale over.")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    options = {
+        'e2e': {'exchanges': args.exchanges, 'cryptos': args.cryptos, 'engines': args.engines, 'duration': args.duration,
+                'single_ticker_share': args.single_ticker_share, 'fetch_interval': args.fetch_interval, 'seed': args.seed,
+                'latency_ms': args.latency_ms, 'latency_sigma': args.latency_sigma, 'error_rate': args.error_rate,
+                'throttle_rate': args.throttle_rate},
+        'triangular': {'markets': args.markets},
+    }
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = BENCHMARKS[name](**options.get(name, {}))
+        print()
+
+    commit, dirty = _git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now(UTC).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'ccxt': ccxt.__version__,
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        'options': {name: options[name] for name in results if name in options},
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
@@ -1,9 +1,17 @@
 import ccxt
-import pandas as pd
+import ccxt.async_support as ccxt_async
+import argparse
+import asyncio
+import hashlib
+import json
 import logging
 import os
 import time
 
+from market_cache import MarketCache, markets_digest
+from market_index import MarketIndex
+from support_matrix import SupportMatrix
+
 # Set up logging for better feedback
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -218,13 +226,57 @@ EXCHANGES_TO_CHECK = unique_exchanges
 # Prioritize USDT as it's most common for spot.
 BASE_CURRENCIES = ['USDT', 'USD', 'USDC', 'BUSD', 'DAI']
 
+# Async catalog mode: how many exchanges may load markets at the same time,
+# and how long (in seconds) a single exchange may take before it is given up on.
+ASYNC_MAX_CONCURRENCY = 8
+ASYNC_EXCHANGE_TIMEOUT = 60
+
+# Shared on-disk cache of load_markets() results (also used by arbitrage_core.py)
+market_cache = MarketCache()
+
+# Output location for the catalog. The binary support matrix is the primary
+# output read by arbitrage_core.py; the Excel report is an optional, human-readable export.
+OUTPUT_DIR = os.path.join(os.path.expanduser('~'), 'Desktop')
+SUPPORT_MATRIX_FILENAME = "crypto_exchange_support.bin"
+EXCEL_REPORT_FILENAME = "crypto_exchange_support.xlsx"
+
 # --- Main Logic ---
 
-def get_exchange_crypto_support():
+def _support_from_index(market_index):
+    """
+    Determines, for every crypto in SUPPORTED_CRYPTOS, whether the exchange
+    has a spot market against one of the BASE_CURRENCIES.
+    Returns a dictionary: {'crypto_symbol': True/False}
+    """
+    supported_bases = market_index.bases_with_quotes(BASE_CURRENCIES)
+    return {crypto: crypto in supported_bases for crypto in SUPPORTED_CRYPTOS}
+
+def catalog_fingerprint(digest):
+    """
+    Returns a SHA-1 digest of an exchange's spot market set (its market_cache.markets_digest),
+    combined with the catalog configuration (SUPPORTED_CRYPTOS and BASE_CURRENCIES), so a
+    stored column only needs rebuilding when either of them changes.
+    """
+    fingerprint = hashlib.sha1()
+    fingerprint.update(','.join(SUPPORTED_CRYPTOS).encode('utf-8'))
+    fingerprint.update(b'|')
+    fingerprint.update(','.join(BASE_CURRENCIES).encode('utf-8'))
+    fingerprint.update(b'|')
+    fingerprint.update(digest.encode('utf-8'))
+    return fingerprint.digest()
+
+def market_fingerprint(markets):
+    """Fingerprint of the support column built from an exchange's markets (see catalog_fingerprint)."""
+    return catalog_fingerprint(markets_digest(markets))
+
+def get_exchange_crypto_support(fingerprints=None):
     """
     Scrapes each configured exchange to determine which cryptocurrencies
     are supported as spot trading pairs.
     Returns a dictionary of dictionaries: {'exchange_id': {'crypto_symbol': True/False}}
+
+    If `fingerprints` is a dict, it is filled with {'exchange_id': market_fingerprint}
+    for every exchange whose markets loaded, so the matrix can be refreshed incrementally.
     """
     exchange_support_data = {ex['id']: {} for ex in EXCHANGES_TO_CHECK}
 
@@ -239,19 +291,13 @@ def get_exchange_crypto_support():
                 'enableRateLimit': True,
                 'timeout': 30000, # 30 seconds timeout
             })
-            exchange.load_markets()
+            market_cache.load_markets(exchange)
             logger.info(f"Markets loaded for {exchange_name}.")
 
-            for crypto in SUPPORTED_CRYPTOS:
-                is_supported = False
-                for base_currency in BASE_CURRENCIES:
-                    symbol_candidate = f"{crypto}/{base_currency}"
-                    if symbol_candidate in exchange.markets:
-                        market = exchange.markets[symbol_candidate]
-                        if market['spot']: # Ensure it's a spot market
-                            is_supported = True
-                            break # Found a spot market for this crypto
-                exchange_support_data[exchange_id][crypto] = is_supported
+            market_index = MarketIndex.from_markets(exchange.markets, exchange_id)
+            exchange_support_data[exchange_id] = _support_from_index(market_index)
+            if fingerprints is not None:
+                fingerprints[exchange_id] = market_fingerprint(exchange.markets)
             
         except ccxt.ExchangeNotAvailable as e:
             logger.warning(f"Exchange {exchange_name} is not available: {str(e)}")
@@ -278,10 +324,232 @@ def get_exchange_crypto_support():
 
     return exchange_support_data
 
+async def _load_exchange_support_async(ex_config, semaphore, timeout):
+    """
+    Loads the markets of a single exchange with ccxt's async_support and
+    indexes its spot markets. Runs under the shared concurrency semaphore.
+    Returns a tuple: (exchange_id, MarketIndex, wall_time_seconds, status, fingerprint)
+    where the index and fingerprint are None if the markets could not be loaded.
+    """
+    exchange_id = ex_config['id']
+    exchange_name = ex_config['name']
+    market_index = None
+    status = 'ok'
+    fingerprint = None
+    exchange = None
+
+    async with semaphore:
+        logger.info(f"Checking support for {exchange_name} ({exchange_id})...")
+        start_time = time.perf_counter()
+        try:
+            exchange_class = getattr(ccxt_async, exchange_id)
+            exchange = exchange_class({
+                'enableRateLimit': True,
+                'timeout': 30000, # 30 seconds timeout per HTTP request
+            })
+            await asyncio.wait_for(market_cache.load_markets_async(exchange), timeout=timeout)
+            logger.info(f"Markets loaded for {exchange_name}.")
+            market_index = MarketIndex.from_markets(exchange.markets, exchange_id)
+            fingerprint = market_fingerprint(exchange.markets)
+        except asyncio.TimeoutError:
+            status = 'timeout'
+            logger.warning(f"Gave up on {exchange_name} after {timeout} seconds.")
+        except ccxt.ExchangeNotAvailable as e:
+            status = 'not_available'
+            logger.warning(f"Exchange {exchange_name} is not available: {str(e)}")
+        except ccxt.DDoSProtection as e:
+            status = 'ddos_protection'
+            logger.warning(f"DDoS Protection for {exchange_name}: {str(e)}")
+        except ccxt.RequestTimeout as e:
+            status = 'request_timeout'
+            logger.warning(f"Request Timeout for {exchange_name}: {str(e)}")
+        except ccxt.NetworkError as e:
+            status = 'network_error'
+            logger.warning(f"Network error with {exchange_name}: {str(e)}")
+        except Exception as e:
+            status = 'error'
+            logger.error(f"An unexpected error occurred with {exchange_name}: {type(e).__name__} - {str(e)}")
+        finally:
+            if exchange is not None:
+                try:
+                    await exchange.close()
+                except Exception:
+                    pass
+        wall_time = time.perf_counter() - start_time
+
+    return exchange_id, market_index, wall_time, status, fingerprint
+
+async def get_exchange_crypto_support_async(max_concurrency=ASYNC_MAX_CONCURRENCY,
+                                            timeout=ASYNC_EXCHANGE_TIMEOUT,
+                                            exchange_timings=None, fingerprints=None):
+    """
+    Async variant of get_exchange_crypto_support(). Loads the markets of all
+    configured exchanges concurrently, with at most `max_concurrency` in flight
+    and each exchange limited to `timeout` seconds.
+    Returns the same shape: {'exchange_id': {'crypto_symbol': True/False}}
+
+    If `exchange_timings` is a dict, it is filled with
+    {'exchange_id': {'seconds': float, 'status': str}} so slow exchanges can be spotted.
+    `fingerprints` is filled like in get_exchange_crypto_support().
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [_load_exchange_support_async(ex_config, semaphore, timeout) for ex_config in EXCHANGES_TO_CHECK]
+    results = await asyncio.gather(*tasks)
+
+    exchange_support_data = {ex['id']: {} for ex in EXCHANGES_TO_CHECK}
+    timings = {}
+    for exchange_id, market_index, wall_time, status, fingerprint in results:
+        if market_index is not None:
+            exchange_support_data[exchange_id] = _support_from_index(market_index)
+            if fingerprints is not None:
+                fingerprints[exchange_id] = fingerprint
+        else:
+            exchange_support_data[exchange_id] = {crypto: False for crypto in SUPPORTED_CRYPTOS}
+        timings[exchange_id] = {'seconds': wall_time, 'status': status}
+
+    # Report per-exchange wall time, slowest first, so the bottleneck is obvious
+    logger.info("Per-exchange market load times (slowest first):")
+    for exchange_id, timing in sorted(timings.items(), key=lambda x: x[1]['seconds'], reverse=True):
+        logger.info(f"  {exchange_id:<12} {timing['seconds']:8.2f} s  ({timing['status']})")
+
+    if exchange_timings is not None:
+        exchange_timings.update(timings)
+
+    return exchange_support_data
+
+def _checkpoint_path(matrix_path):
+    return f"{matrix_path}.progress"
+
+def _load_checkpoint(matrix_path):
+    """Returns the set of exchange IDs already refreshed by an interrupted incremental run."""
+    path = _checkpoint_path(matrix_path)
+    if not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return set(json.load(f).get('completed', []))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable refresh checkpoint {path}: {type(e).__name__} - {str(e)}")
+        return set()
+
+def _save_checkpoint(matrix_path, completed):
+    path = _checkpoint_path(matrix_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'completed': sorted(completed), 'updated_at': time.time()}, f)
+    os.replace(tmp_path, path)
+
+async def refresh_support_matrix_incremental(matrix_path,
+                                             max_concurrency=ASYNC_MAX_CONCURRENCY,
+                                             timeout=ASYNC_EXCHANGE_TIMEOUT):
+    """
+    Refreshes an existing support matrix in place. Exchanges whose valid market
+    cache entry has the digest their column was built from are skipped without
+    creating the exchange at all. The others are loaded (through the market cache,
+    so only expired entries are downloaded) and fingerprinted; only columns whose
+    fingerprint changed are recomputed and written back. Exchanges that fail to
+    load keep their previous column.
+
+    Progress is checkpointed after each exchange, so a crashed or interrupted
+    run picks up where it stopped the next time it is started.
+    Returns the refreshed SupportMatrix.
+    """
+    exchange_names_map = {ex['id']: ex['name'] for ex in EXCHANGES_TO_CHECK}
+    completed = _load_checkpoint(matrix_path)
+
+    matrix = None
+    if os.path.exists(matrix_path):
+        try:
+            matrix = SupportMatrix.load(matrix_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read existing support matrix, rebuilding it: {type(e).__name__} - {str(e)}")
+    if matrix is None:
+        matrix = SupportMatrix(SUPPORTED_CRYPTOS)
+        completed = set()
+    elif matrix.cryptos != SUPPORTED_CRYPTOS:
+        # The crypto index changed, so every column is rebuilt; until then (or if its exchange
+        # fails to load) each keeps its old support, mapped onto the new index by crypto name
+        matrix = matrix.reindexed(SUPPORTED_CRYPTOS)
+        completed = set()
+
+    if completed:
+        logger.info(f"Resuming interrupted refresh: {len(completed)} exchanges already done.")
+
+    changed, unchanged, failed = [], [], []
+    pending = []
+    for ex_config in EXCHANGES_TO_CHECK:
+        exchange_id = ex_config['id']
+        if exchange_id in completed:
+            continue
+        digest = market_cache.digest(exchange_id)
+        if (digest is not None and exchange_id in matrix.bitsets
+                and matrix.fingerprints.get(exchange_id) == catalog_fingerprint(digest)):
+            unchanged.append(exchange_id) # Column built from the cached markets, nothing to load
+        else:
+            pending.append(ex_config)
+    if unchanged:
+        logger.info(f"Skipping {len(unchanged)} exchanges whose cached markets match their column.")
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [asyncio.ensure_future(_load_exchange_support_async(ex_config, semaphore, timeout)) for ex_config in pending]
+
+    for next_done in asyncio.as_completed(tasks):
+        exchange_id, market_index, wall_time, status, fingerprint = await next_done
+        if fingerprint is None:
+            failed.append(exchange_id)
+            if exchange_id in matrix.bitsets:
+                logger.warning(f"Keeping previous column for {exchange_id} ({status}).")
+            else:
+                logger.warning(f"No column for {exchange_id} ({status}), it is left out of the matrix.")
+            continue
+
+        if exchange_id in matrix.bitsets and matrix.fingerprints.get(exchange_id) == fingerprint:
+            unchanged.append(exchange_id)
+        else:
+            bits = market_index.support_bits(matrix.crypto_index, BASE_CURRENCIES)
+            matrix.set_exchange_bits(exchange_id, bits, exchange_names_map.get(exchange_id), fingerprint)
+            matrix.save(matrix_path)
+            changed.append(exchange_id)
+            logger.info(f"Updated column for {exchange_id} ({wall_time:.2f} s).")
+
+        completed.add(exchange_id)
+        _save_checkpoint(matrix_path, completed)
+
+    # The run finished, so the next one starts from scratch
+    try:
+        os.remove(_checkpoint_path(matrix_path))
+    except FileNotFoundError:
+        pass
+
+    logger.info(f"Incremental refresh finished: {len(changed)} changed, {len(unchanged)} unchanged, {len(failed)} failed.")
+    if changed:
+        logger.info(f"Changed exchanges: {', '.join(sorted(changed))}")
+    return matrix
+
+def generate_support_matrix(support_data, fingerprints=None):
+    """
+    Writes the crypto support data as a compact binary support matrix
+    (see support_matrix.py). This is the file the live watcher reads at startup.
+    The `fingerprints` of the columns ({'exchange_id': market_fingerprint}) are stored
+    with them, so the next --incremental run only rebuilds what changed.
+    """
+    exchange_names_map = {ex['id']: ex['name'] for ex in EXCHANGES_TO_CHECK}
+    output_filename = os.path.join(OUTPUT_DIR, SUPPORT_MATRIX_FILENAME)
+    try:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        matrix = SupportMatrix.from_support_data(support_data, exchange_names_map)
+        matrix.fingerprints.update({exchange_id: fingerprint for exchange_id, fingerprint in (fingerprints or {}).items()
+                                    if exchange_id in matrix.bitsets})
+        matrix.save(output_filename)
+    except Exception as e:
+        logger.error(f"Failed to write support matrix: {type(e).__name__} - {str(e)}")
+
 def generate_excel_report(support_data):
     """
     Generates an Excel spreadsheet from the crypto support data.
     """
+    import pandas as pd # Excel export is optional, so pandas/openpyxl are only needed here
+
     logger.info("Generating Excel report...")
 
     # Create a DataFrame from the support data
@@ -304,8 +572,7 @@ def generate_excel_report(support_data):
     df_display = df.replace({True: '✅', False: '❌'})
 
     # Define output path to desktop
-    desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop')
-    output_filename = os.path.join(desktop_path, "crypto_exchange_support.xlsx")
+    output_filename = os.path.join(OUTPUT_DIR, EXCEL_REPORT_FILENAME)
     
     try:
         # Create a Pandas Excel writer using openpyxl as the engine.
@@ -342,14 +609,55 @@ def generate_excel_report(support_data):
     except Exception as e:
         logger.error(f"Failed to generate Excel report: {type(e).__name__} - {str(e)}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Catalog which cryptocurrencies each exchange supports as spot pairs.")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Load all exchanges concurrently instead of one at a time.")
+    parser.add_argument('--max-concurrency', type=int, default=ASYNC_MAX_CONCURRENCY,
+                        help="Maximum number of exchanges loading markets at once (async mode).")
+    parser.add_argument('--exchange-timeout', type=float, default=ASYNC_EXCHANGE_TIMEOUT,
+                        help="Seconds allowed per exchange before it is skipped (async mode).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Update the existing support matrix in place, rebuilding only exchanges whose markets "
+                             "changed. Uses the async engine and resumes an interrupted run.")
+    parser.add_argument('--refresh-markets', action='store_true',
+                        help="Ignore the on-disk market cache and download all markets again.")
+    parser.add_argument('--excel', action='store_true',
+                        help="Also export the support matrix as a ✅/❌ Excel report.")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     logger.info("Starting cryptocurrency exchange support cataloging...")
+
+    if args.refresh_markets:
+        market_cache.invalidate()
     
-    support_data = get_exchange_crypto_support()
-    
-    if support_data:
-        generate_excel_report(support_data)
+    if args.incremental:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        matrix = asyncio.run(refresh_support_matrix_incremental(
+            os.path.join(OUTPUT_DIR, SUPPORT_MATRIX_FILENAME),
+            max_concurrency=args.max_concurrency,
+            timeout=args.exchange_timeout,
+        ))
+        if args.excel:
+            generate_excel_report(matrix.to_support_data())
     else:
-        logger.error("No support data collected. Excel report not generated.")
+        fingerprints = {}
+        if args.use_async:
+            support_data = asyncio.run(get_exchange_crypto_support_async(
+                max_concurrency=args.max_concurrency,
+                timeout=args.exchange_timeout,
+                fingerprints=fingerprints,
+            ))
+        else:
+            support_data = get_exchange_crypto_support(fingerprints)
+
+        if support_data:
+            generate_support_matrix(support_data, fingerprints)
+            if args.excel:
+                generate_excel_report(support_data)
+        else:
+            logger.error("No support data collected. Support matrix not generated.")
     
-    logger.info("Process finished.")
\ No newline at end of file
+    logger.info("Process finished.")
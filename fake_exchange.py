@@ -0,0 +1,184 @@
+import asyncio
+import math
+import random
+import threading
+import time
+
+import ccxt
+
+# --- Configuration ---
+
+FAKE_MARKET_COUNT = 200 # Spot markets per fake exchange (bases F0000, F0001, ... against USDT)
+FAKE_QUOTE = 'USDT'
+FAKE_RATE_LIMIT_MS = 10 # ccxt `rateLimit`, i.e. 100 requests per second before RATE_LIMIT_UTILIZATION
+FAKE_LATENCY_MS = 50.0 # Median response latency of one request
+FAKE_LATENCY_SIGMA = 0.5 # Lognormal shape of the latency (p99 is about median * e^(2.33 * sigma))
+FAKE_PER_SYMBOL_MS = 0.05 # Extra latency per symbol of a fetch_tickers call
+FAKE_ERROR_RATE = 0.0 # Share of requests failing with ccxt.NetworkError
+FAKE_THROTTLE_RATE = 0.0 # Share of requests failing with ccxt.RateLimitExceeded
+FAKE_PRICE_DISPERSION = 0.002 # Standard deviation of each exchange's price offset from the common mid
+FAKE_HALF_SPREAD = 0.0005 # Half of each quote's bid/ask spread, relative to the mid
+
+# Every fake exchange quotes the same "true" mid of a market (a slow, deterministic wave
+# around a random base price), shifted by a fixed per-exchange offset, so cross-exchange
+# spreads look like real ones: mostly slightly negative, occasionally crossing.
+
+
+def fake_bases(market_count=FAKE_MARKET_COUNT):
+    """Base currencies of the fake markets; every fake exchange with `market_count` markets lists all of them."""
+    return [f"F{i:04d}" for i in range(market_count)]
+
+
+class FakeExchange:
+    """
+    Offline stand-in for a synchronous ccxt exchange, for benchmarks. Implements what
+    ExchangePriceFetcher uses: `id`, `rateLimit`, `has`, `markets`, `currencies`,
+    `load_markets`, `set_markets`, `fetch_ticker`, `fetch_tickers` and `fetch_order_book`.
+
+    Every request sleeps for a lognormal latency and fails with `error_rate` /
+    `throttle_rate` probability, like a real exchange would. Ticker timestamps are
+    taken halfway through the latency (when the exchange would have built its response),
+    so they can be used to measure tick-to-display latency downstream. With
+    `batch=False` the exchange only serves fetch_ticker, like the exchanges in
+    SINGLE_TICKER_FETCH_EXCHANGES. Counts its requests and errors for reports.
+    """
+    def __init__(self, exchange_id, market_count=FAKE_MARKET_COUNT, batch=True, latency_ms=FAKE_LATENCY_MS,
+                 latency_sigma=FAKE_LATENCY_SIGMA, per_symbol_ms=FAKE_PER_SYMBOL_MS, error_rate=FAKE_ERROR_RATE,
+                 throttle_rate=FAKE_THROTTLE_RATE, rate_limit_ms=FAKE_RATE_LIMIT_MS, seed=0):
+        self.id = exchange_id
+        self.rateLimit = rate_limit_ms
+        self.has = {'fetchTicker': True, 'fetchTickers': batch, 'fetchOrderBook': True}
+        self.market_count = market_count
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.per_symbol_ms = per_symbol_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.rng = random.Random(f"{seed}:{exchange_id}")
+        self.lock = threading.Lock() # Requests come from the fetcher's request pool threads
+        self.markets = {}
+        self.currencies = {}
+        self.prices = {} # {symbol: (base price, wave period in seconds, phase, this exchange's offset)}
+        self.requests = 0
+        self.errors = 0
+
+    def _build_markets(self):
+        markets = {}
+        for base in fake_bases(self.market_count):
+            symbol = f"{base}/{FAKE_QUOTE}"
+            markets[symbol] = {'id': f"{base}{FAKE_QUOTE}", 'symbol': symbol, 'base': base, 'quote': FAKE_QUOTE,
+                               'spot': True, 'active': True, 'type': 'spot'}
+            market_rng = random.Random(f"{self.seed}:{symbol}") # Shared by every fake exchange
+            self.prices[symbol] = (10 ** market_rng.uniform(-2, 4), market_rng.uniform(30, 300),
+                                   market_rng.uniform(0, 2 * math.pi), self.rng.gauss(0, FAKE_PRICE_DISPERSION))
+        return markets
+
+    def load_markets(self, reload=False):
+        if not self.markets or reload:
+            self.set_markets(self._build_markets())
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies or {}
+
+    def _latency(self, symbols=1):
+        """Seconds the next request takes, and whether (and how) it fails."""
+        with self.lock:
+            self.requests += 1
+            latency_ms = self.latency_ms * math.exp(self.latency_sigma * self.rng.gauss(0, 1)) + self.per_symbol_ms * symbols
+            draw = self.rng.random()
+            error = None
+            if draw < self.throttle_rate:
+                error = ccxt.RateLimitExceeded(f"{self.id} fake 429 Too Many Requests")
+            elif draw < self.throttle_rate + self.error_rate:
+                error = ccxt.NetworkError(f"{self.id} fake connection reset")
+            if error is not None:
+                self.errors += 1
+        return latency_ms / 1000, error
+
+    def _ticker(self, symbol, now_ms):
+        if symbol not in self.markets:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol}")
+        base_price, period, phase, offset = self.prices[symbol]
+        mid = base_price * (1 + 0.01 * math.sin(now_ms / 1000 / period + phase)) * (1 + offset)
+        return {'symbol': symbol, 'timestamp': now_ms, 'bid': mid * (1 - FAKE_HALF_SPREAD),
+                'ask': mid * (1 + FAKE_HALF_SPREAD), 'last': mid}
+
+    def _order_book(self, symbol, limit, now_ms):
+        ticker = self._ticker(symbol, now_ms)
+        levels = limit or 20
+        amounts = [random.Random(f"{self.id}:{symbol}:{i}").uniform(0.1, 10) for i in range(levels)]
+        return {'symbol': symbol, 'timestamp': now_ms,
+                'bids': [[ticker['bid'] * (1 - FAKE_HALF_SPREAD * i), amount] for i, amount in enumerate(amounts)],
+                'asks': [[ticker['ask'] * (1 + FAKE_HALF_SPREAD * i), amount] for i, amount in enumerate(amounts)]}
+
+    def _respond(self, build, symbols=1):
+        latency, error = self._latency(symbols)
+        time.sleep(latency / 2)
+        if error is not None:
+            raise error
+        response = build(time.time_ns() // 1_000_000)
+        time.sleep(latency / 2)
+        return response
+
+    def fetch_ticker(self, symbol, params={}):
+        return self._respond(lambda now_ms: self._ticker(symbol, now_ms))
+
+    def fetch_tickers(self, symbols=None, params={}):
+        if not self.has['fetchTickers']:
+            raise ccxt.NotSupported(f"{self.id} fetchTickers() is not supported yet")
+        symbols = list(self.markets) if symbols is None else symbols
+        return self._respond(lambda now_ms: {symbol: self._ticker(symbol, now_ms) for symbol in symbols}, len(symbols))
+
+    def fetch_order_book(self, symbol, limit=None, params={}):
+        return self._respond(lambda now_ms: self._order_book(symbol, limit, now_ms))
+
+
+class AsyncFakeExchange(FakeExchange):
+    """FakeExchange with the ccxt.async_support interface AsyncExchangeWorker uses (coroutines and `close`)."""
+    async def load_markets(self, reload=False):
+        return FakeExchange.load_markets(self, reload)
+
+    async def _respond(self, build, symbols=1):
+        latency, error = self._latency(symbols)
+        await asyncio.sleep(latency / 2)
+        if error is not None:
+            raise error
+        response = build(time.time_ns() // 1_000_000)
+        await asyncio.sleep(latency / 2)
+        return response
+
+    async def fetch_ticker(self, symbol, params={}):
+        return await self._respond(lambda now_ms: self._ticker(symbol, now_ms))
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        if not self.has['fetchTickers']:
+            raise ccxt.NotSupported(f"{self.id} fetchTickers() is not supported yet")
+        symbols = list(self.markets) if symbols is None else symbols
+        return await self._respond(lambda now_ms: {symbol: self._ticker(symbol, now_ms) for symbol in symbols}, len(symbols))
+
+    async def fetch_order_book(self, symbol, limit=None, params={}):
+        return await self._respond(lambda now_ms: self._order_book(symbol, limit, now_ms))
+
+    async def close(self):
+        pass
+
+
+def fake_exchange_factory(asynchronous=False, single_ticker=(), **options):
+    """
+    Returns an `exchange_factory` for ArbitrageCore (asynchronous=True for the asyncio
+    engine) that builds fake exchanges with `options` (see FakeExchange). Exchanges
+    whose id is in `single_ticker` don't serve fetch_tickers. Every exchange built is
+    also kept in the factory's `exchanges` dict, for request and error counts.
+    """
+    exchange_class = AsyncFakeExchange if asynchronous else FakeExchange
+    exchanges = {}
+
+    def factory(exchange_id):
+        exchange = exchange_class(exchange_id, batch=exchange_id not in single_ticker, **options)
+        exchanges[exchange_id] = exchange
+        return exchange
+    factory.exchanges = exchanges
+    return factory
@@ -0,0 +1,50 @@
+# --- Configuration ---
+
+# Fee rates are fractions of the traded notional (0.001 = 0.1%)
+DEFAULT_FEES = {'maker': 0.001, 'taker': 0.001} # For markets (and exchanges) without fee information
+# Fee paid on each leg of a net spread. The spreads buy at the ask and sell at the bid,
+# i.e. both legs take liquidity, so 'taker' unless you post limit orders on both sides.
+NET_SPREAD_FEE_ROLE = 'taker'
+# User overrides, e.g. for VIP tiers or fee-token discounts
+EXCHANGE_FEE_OVERRIDES = {} # {exchange_id: {'maker': 0.0002, 'taker': 0.00075}}
+MARKET_FEE_OVERRIDES = {} # {(exchange_id, symbol): {'maker': ..., 'taker': ...}}, wins over EXCHANGE_FEE_OVERRIDES
+
+
+def market_fee(exchange, symbol, role):
+    """
+    The `role` ('maker' or 'taker') fee of a market of a loaded ccxt exchange: the market's
+    own fee, else the exchange's default trading fee, else DEFAULT_FEES.
+    """
+    fee = exchange.markets.get(symbol, {}).get(role)
+    if fee is None:
+        fee = ((getattr(exchange, 'fees', None) or {}).get('trading') or {}).get(role)
+    return float(fee) if fee is not None else DEFAULT_FEES[role]
+
+
+class FeeSchedule:
+    """
+    Resolves the fee rate per leg used for net spreads: the user overrides first, then
+    the market fees the fetchers publish in 'market_fees' messages (see
+    arbitrage_core.publish_market_fees). Only consulted when fees arrive; the spread
+    engine keeps the result in arrays (see spread_engine.SpreadMatrix.set_fees).
+    """
+    def __init__(self, role=NET_SPREAD_FEE_ROLE, exchange_overrides=None, market_overrides=None):
+        if role not in DEFAULT_FEES:
+            raise ValueError(f"Unknown fee role {role!r}, expected one of {list(DEFAULT_FEES)}")
+        self.role = role
+        self.exchange_overrides = exchange_overrides if exchange_overrides is not None else EXCHANGE_FEE_OVERRIDES
+        self.market_overrides = market_overrides if market_overrides is not None else MARKET_FEE_OVERRIDES
+
+    def exchange_fee(self, exchange_id):
+        """Fee of `exchange_id` until its market fees are known."""
+        return self.exchange_overrides.get(exchange_id, {}).get(self.role, DEFAULT_FEES[self.role])
+
+    def fee(self, exchange_id, symbol, market_fee):
+        override = self.market_overrides.get((exchange_id, symbol), {}).get(self.role)
+        if override is None:
+            override = self.exchange_overrides.get(exchange_id, {}).get(self.role)
+        return market_fee if override is None else override
+
+    def fees_for(self, message):
+        """Fee of every market in a 'market_fees' message, in message order."""
+        return [self.fee(message['id'], symbol, fee) for symbol, fee in zip(message['symbols'], message[self.role])]
@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import sys
+import time
+
+from arbitrage_core import ArbitrageCore, DEFAULT_FETCH_INTERVAL, QUOTE_TTL_SECONDS, SPREADS_TOP_K, all_available_exchanges
+from metrics import METRICS_PORT
+from order_book import DEPTH_MAX_CANDIDATES, DEPTH_SPREAD_THRESHOLD_PCT, DepthTracker
+from scheduler import COLD_REFRESH_SECONDS, HOT_REFRESH_SECONDS, HOT_SET_SIZE, SymbolPriority
+from tick_recorder import TICK_RECORD_DIR, TickRecorder
+from triangular import TRIANGULAR_MIN_PROFIT_PCT, TriangularTracker
+
+logger = logging.getLogger(__name__)
+
+# --- Headless arbitrage watcher ---
+# Runs the same fetchers and spread engine as the Tk GUI (okl6.py) without a display
+# and writes JSON lines to stdout or a file. Logs go to stderr.
+#
+#   python headless.py --exchanges binance kraken mexc
+#   python headless.py --exchanges binance kraken --emit-interval 5 --no-quotes --output spreads.jsonl
+#
+# Line types:
+#   {"type": "quote", "time": ms, "exchange": ..., "crypto": ..., "symbol": ..., "bid": ..., "ask": ...,
+#    "timestamp": ms or null, "error": code}                       (one per crypto per fetch cycle)
+#   {"type": "spread", "time": ms, "rank": 1, "crypto": ..., "buy_exchange": ..., "buy_ask": ...,
+#    "sell_exchange": ..., "sell_bid": ..., "spread_pct": ...,
+#    "net_spread_pct": ...}                                        (top-K by net spread, whenever it changed)
+#   {"type": "executable", "time": ms, "crypto": ..., "buy_exchange": ..., "buy_vwap": ..., "sell_exchange": ...,
+#    "sell_vwap": ..., "spread_pct": ..., "max_size": ..., "notional": ..., "profit": ...}
+#                                                                  (--depth only, whenever they changed)
+#   {"type": "triangular", "time": ms, "exchange": ..., "currencies": [a, b, c], "symbols": [...],
+#    "sides": ["buy" or "sell", ...], "prices": [...], "profit_pct": ...}
+#                                                                  (--triangular only, whenever they changed)
+#   {"type": "latency", "time": ms, "exchange": ..., "endpoint": ..., "count": n, "mean": ms, "p50": ms, "p90": ms,
+#    "p99": ms, "max": ms}                                         (per exchange and endpoint, every --metrics-interval)
+#   {"type": "staleness", "time": ms, "exchange": ..., "count": n, "mean": ms, ...}
+#                                                                  (quote age on arrival, every --metrics-interval)
+
+DEFAULT_EMIT_INTERVAL = 1.0 # Seconds between queue drains / spread snapshots
+DEFAULT_METRICS_INTERVAL = 10.0 # Seconds between latency / staleness snapshots
+
+
+class JsonLinesEmitter:
+    """
+    Writes quotes and spread snapshots from an ArbitrageCore as JSON lines, plus latency
+    and staleness percentiles every `metrics_interval` seconds (0 = never).
+    """
+    def __init__(self, stream, include_quotes=True, top_k=SPREADS_TOP_K, metrics_interval=0):
+        self.stream = stream
+        self.include_quotes = include_quotes
+        self.top_k = top_k
+        self.metrics_interval_ms = int(metrics_interval * 1000)
+        self.next_metrics_ms = None
+        self.emitted_version = None # spread_tracker.version of the last spread snapshot
+        self.emitted_depth_version = None # depth_tracker.version of the last executable snapshot
+        self.emitted_triangular_version = None # triangular_tracker.version of the last cycle snapshot
+
+    def _write(self, record):
+        self.stream.write(json.dumps(record) + "\n")
+
+    def emit_batch(self, message, now_ms):
+        """One 'quote' line per crypto of a 'price_batch' message."""
+        for i, base_crypto in enumerate(message['base_cryptos']):
+            self._write({
+                'type': 'quote',
+                'time': now_ms,
+                'exchange': message['id'],
+                'crypto': base_crypto,
+                'symbol': message['symbols'][i],
+                'bid': message['bids'][i],
+                'ask': message['asks'][i],
+                'timestamp': message['timestamps'][i],
+                'error': message['errors'][i],
+            })
+
+    def emit_spreads(self, core, now_ms):
+        """Writes the top-K opportunities if they changed since the last snapshot."""
+        if core.spread_tracker.version == self.emitted_version:
+            return
+        self.emitted_version = core.spread_tracker.version
+        for rank, opportunity in enumerate(core.best_opportunities(self.top_k), start=1):
+            self._write(dict(type='spread', time=now_ms, rank=rank, **opportunity._asdict()))
+
+    def emit_executable(self, core, now_ms):
+        """Depth mode: writes the executable spread of every crypto with crossing order books, if they changed."""
+        if core.depth_tracker is None or core.depth_tracker.version == self.emitted_depth_version:
+            return
+        self.emitted_depth_version = core.depth_tracker.version
+        for executable in sorted(core.depth_tracker.executable.values(), key=lambda e: e.profit, reverse=True):
+            self._write(dict(type='executable', time=now_ms, **executable._asdict()))
+
+    def emit_triangular(self, core, now_ms):
+        """Triangular mode: writes the profitable cycles of every exchange, if they changed."""
+        if core.triangular_tracker is None or core.triangular_tracker.version == self.emitted_triangular_version:
+            return
+        self.emitted_triangular_version = core.triangular_tracker.version
+        for cycle in core.triangular_tracker.top():
+            self._write(dict(type='triangular', time=now_ms, **cycle._asdict()))
+
+    def emit_latency(self, core, now_ms):
+        """Writes the request latency and quote staleness percentiles of every exchange."""
+        for exchange_id, metrics in core.latency_summary().items():
+            for endpoint, summary in metrics['requests'].items():
+                self._write(dict(type='latency', time=now_ms, exchange=exchange_id, endpoint=endpoint, **summary))
+            if metrics['staleness'] is not None:
+                self._write(dict(type='staleness', time=now_ms, exchange=exchange_id, **metrics['staleness']))
+
+    def emit(self, core, messages, now_ms=None):
+        """Writes the lines for `messages` and the current spreads, stamped `now_ms` (default: the wall clock)."""
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        if self.include_quotes:
+            for message in messages:
+                if message['type'] == 'price_batch':
+                    self.emit_batch(message, now_ms)
+        self.emit_spreads(core, now_ms)
+        self.emit_executable(core, now_ms)
+        self.emit_triangular(core, now_ms)
+        if self.metrics_interval_ms > 0:
+            if self.next_metrics_ms is None:
+                self.next_metrics_ms = now_ms + self.metrics_interval_ms
+            elif now_ms >= self.next_metrics_ms:
+                self.emit_latency(core, now_ms)
+                self.next_metrics_ms = now_ms + self.metrics_interval_ms
+        self.stream.flush()
+
+
+def run_headless(core, emitter, emit_interval=DEFAULT_EMIT_INTERVAL, duration=None):
+    """Drains the core's queue every `emit_interval` seconds until `duration` elapses or Ctrl+C."""
+    deadline = None if duration is None else time.monotonic() + duration
+    next_emit = time.monotonic()
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            next_emit += emit_interval
+            tick_start = time.perf_counter()
+            messages = core.poll()
+            emitter.emit(core, messages)
+            core.pipeline_metrics.observe_tick(time.perf_counter() - tick_start, len(messages))
+            time.sleep(max(0.0, next_emit - time.monotonic()))
+    except KeyboardInterrupt:
+        logger.info("Interrupted, stopping fetchers.")
+    finally:
+        core.stop()
+        emitter.emit(core, core.poll()) # Flush whatever arrived while stopping
+
+
+def parse_args():
+    known_ids = [ex['id'] for ex in all_available_exchanges]
+    parser = argparse.ArgumentParser(description="Run the arbitrage watcher without a GUI, emitting JSON lines.")
+    parser.add_argument('--exchanges', nargs='+', required=True, metavar='ID',
+                        help=f"Exchange IDs to watch (at least two). Known: {', '.join(known_ids)}")
+    parser.add_argument('--output', default=None, help="File to append JSON lines to (default: stdout).")
+    parser.add_argument('--emit-interval', type=float, default=DEFAULT_EMIT_INTERVAL,
+                        help=f"Seconds between output snapshots (default: {DEFAULT_EMIT_INTERVAL}).")
+    parser.add_argument('--fetch-interval', type=float, default=DEFAULT_FETCH_INTERVAL,
+                        help=f"Minimum seconds between fetch cycles per exchange; the rate limit "
+                             f"scheduler may space them further (default: {DEFAULT_FETCH_INTERVAL}).")
+    parser.add_argument('--engine', choices=['threads', 'asyncio'], default=None,
+                        help="Fetch engine (default: FETCH_ENGINE in arbitrage_core.py).")
+    parser.add_argument('--top-k', type=int, default=SPREADS_TOP_K,
+                        help=f"Number of best opportunities per spread snapshot (default: {SPREADS_TOP_K}).")
+    parser.add_argument('--hot-set-size', type=int, default=HOT_SET_SIZE,
+                        help=f"Cryptos refreshed as hot on single-ticker exchanges (default: {HOT_SET_SIZE}).")
+    parser.add_argument('--hot-refresh', type=float, default=HOT_REFRESH_SECONDS,
+                        help=f"Target quote age of hot cryptos in seconds (default: {HOT_REFRESH_SECONDS}).")
+    parser.add_argument('--cold-refresh', type=float, default=COLD_REFRESH_SECONDS,
+                        help=f"Target quote age of the other cryptos in seconds (default: {COLD_REFRESH_SECONDS}).")
+    parser.add_argument('--quote-ttl', type=float, default=QUOTE_TTL_SECONDS,
+                        help=f"Seconds after which a quote is dropped from the spreads, 0 = never (default: {QUOTE_TTL_SECONDS}).")
+    parser.add_argument('--depth', action='store_true',
+                        help="Fetch order books of wide spreads and emit VWAP-based executable spreads.")
+    parser.add_argument('--depth-threshold', type=float, default=DEPTH_SPREAD_THRESHOLD_PCT,
+                        help=f"Top-of-book net spread (%%, after fees) from which order books are fetched (default: {DEPTH_SPREAD_THRESHOLD_PCT}).")
+    parser.add_argument('--depth-candidates', type=int, default=DEPTH_MAX_CANDIDATES,
+                        help=f"Max cryptos whose order books are fetched (default: {DEPTH_MAX_CANDIDATES}).")
+    parser.add_argument('--triangular', action='store_true',
+                        help="Fetch every ticker of each exchange and emit profitable 3-market cycles within it.")
+    parser.add_argument('--triangular-min-profit', type=float, default=TRIANGULAR_MIN_PROFIT_PCT,
+                        help=f"Cycle profit (%%, after fees) from which cycles are emitted (default: {TRIANGULAR_MIN_PROFIT_PCT}).")
+    parser.add_argument('--record', default=TICK_RECORD_DIR, metavar='DIR',
+                        help="Also append every quote to memory-mapped tick files in DIR (read them with tick_recorder.TickReader).")
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help=f"Seconds between latency/staleness percentile lines, 0 to disable (default: {DEFAULT_METRICS_INTERVAL}).")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics (default: CRYPTO_ARB_METRICS_PORT, off).")
+    parser.add_argument('--no-quotes', action='store_true', help="Only emit spread snapshots.")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after this many seconds.")
+    args = parser.parse_args()
+
+    unknown = [ex_id for ex_id in args.exchanges if ex_id not in known_ids]
+    if unknown:
+        parser.error(f"Unknown exchange(s): {', '.join(unknown)}")
+    if len(args.exchanges) < 2:
+        parser.error("Select at least two exchanges to enable spread calculation.")
+    if args.emit_interval <= 0 or args.fetch_interval <= 0 or args.hot_refresh <= 0 or args.cold_refresh <= 0:
+        parser.error("Intervals must be positive.")
+    if args.metrics_interval < 0:
+        parser.error("--metrics-interval can't be negative.")
+    if args.quote_ttl < 0:
+        parser.error("--quote-ttl can't be negative.")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    priority = SymbolPriority(hot_set_size=args.hot_set_size, hot_refresh=args.hot_refresh, cold_refresh=args.cold_refresh)
+    depth = DepthTracker(threshold_pct=args.depth_threshold, max_candidates=args.depth_candidates) if args.depth else None
+    core = ArbitrageCore(fetch_interval=args.fetch_interval, engine=args.engine, top_k=args.top_k,
+                         symbol_priority=priority, depth_tracker=depth,
+                         recorder=TickRecorder(args.record) if args.record else None, metrics_port=args.metrics_port,
+                         quote_ttl=args.quote_ttl,
+                         triangular_tracker=TriangularTracker(min_profit_pct=args.triangular_min_profit) if args.triangular else None)
+    if not core.load_exchanges(args.exchanges):
+        logger.error("No common cryptocurrencies found for the selected exchanges; re-run exchange3.py or pick other exchanges.")
+        sys.exit(1)
+
+    output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+    try:
+        emitter = JsonLinesEmitter(output, include_quotes=not args.no_quotes, top_k=args.top_k,
+                                   metrics_interval=args.metrics_interval)
+        run_headless(core, emitter, emit_interval=args.emit_interval, duration=args.duration)
+    finally:
+        if output is not sys.stdout:
+            output.close()
@@ -0,0 +1,172 @@
+import ccxt
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Bump this whenever the layout of a cache entry changes; older entries are then ignored.
+MARKET_CACHE_VERSION = 1
+
+# Directory holding one JSON file per exchange with its load_markets() result.
+MARKET_CACHE_DIR = os.environ.get(
+    'CRYPTO_ARB_MARKET_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.crypto_arbitrage', 'market_cache')
+)
+
+# How long (in seconds) a cached market set stays valid before the network is used again.
+MARKET_CACHE_TTL = 6 * 60 * 60 # 6 hours
+
+
+def markets_digest(markets):
+    """Hex SHA-1 of an exchange's spot market set (symbol, base and quote of every spot market)."""
+    digest = hashlib.sha1()
+    for symbol in sorted(symbol for symbol, market in markets.items() if market.get('spot')):
+        market = markets[symbol]
+        digest.update(f"\n{symbol}|{market.get('base')}|{market.get('quote')}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MarketCache:
+    """
+    Persistent on-disk cache for ccxt `load_markets()` results.
+    Shared by the support catalog (exchange3.py) and the live price fetchers (arbitrage_core.py),
+    so a warm start can hand an exchange its markets without touching the network.
+
+    Each exchange is stored as a separate JSON file containing the cache version,
+    the ccxt version that produced it, the time it was saved, the markets, the currencies
+    and the digest of the spot market set (see markets_digest). A small `<id>.digest`
+    file next to it repeats everything but the markets and currencies, so the digest can
+    be checked without parsing megabytes of markets.
+    An entry is treated as a miss when it is missing, expired, unreadable, or was
+    written by a different cache version or ccxt version.
+    """
+    def __init__(self, cache_dir=MARKET_CACHE_DIR, ttl=MARKET_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, exchange_id):
+        return os.path.join(self.cache_dir, f"{exchange_id}.json")
+
+    def _digest_path(self, exchange_id):
+        return os.path.join(self.cache_dir, f"{exchange_id}.digest")
+
+    def get(self, exchange_id):
+        """
+        Returns the cached entry for `exchange_id` as a dict with 'markets',
+        'currencies' and 'saved_at' keys, or None if there is no valid entry.
+        """
+        return self._read(self._path(exchange_id), exchange_id)
+
+    def _read(self, path, exchange_id):
+        """Reads an entry (or its digest file), or None if it is missing, unreadable, stale or of another version."""
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable market cache for {exchange_id}: {type(e).__name__} - {str(e)}")
+            return None
+
+        if entry.get('version') != MARKET_CACHE_VERSION or entry.get('ccxt_version') != ccxt.__version__:
+            logger.info(f"Market cache for {exchange_id} was written by another version, ignoring it.")
+            return None
+
+        age = time.time() - entry.get('saved_at', 0)
+        if age > self.ttl:
+            logger.info(f"Market cache for {exchange_id} expired ({age / 3600:.1f} h old).")
+            return None
+
+        return entry
+
+    def put(self, exchange_id, markets, currencies=None):
+        """Writes the markets (and currencies) of `exchange_id`, then its digest file, to disk atomically."""
+        header = {
+            'version': MARKET_CACHE_VERSION,
+            'ccxt_version': ccxt.__version__,
+            'exchange_id': exchange_id,
+            'saved_at': time.time(),
+            'digest': markets_digest(markets),
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # The old digest file must not outlive the entry it describes if writing the new one fails
+            try:
+                os.remove(self._digest_path(exchange_id))
+            except FileNotFoundError:
+                pass
+            self._write(exchange_id, self._path(exchange_id), dict(header, markets=markets, currencies=currencies))
+            self._write(exchange_id, self._digest_path(exchange_id), header)
+        except OSError as e:
+            logger.warning(f"Failed to write market cache for {exchange_id}: {type(e).__name__} - {str(e)}")
+
+    def _write(self, exchange_id, path, entry):
+        # Write to a temporary file first so readers never see a half-written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{exchange_id}.", suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, path)
+
+    def digest(self, exchange_id):
+        """
+        Digest of the cached spot market set of `exchange_id` (see markets_digest), or None
+        if there is no valid entry or it predates digests. Lets callers tell whether the
+        markets they derived something from are still current without loading them, from
+        the entry's small digest file.
+        """
+        if not os.path.exists(self._path(exchange_id)):
+            return None
+        header = self._read(self._digest_path(exchange_id), exchange_id)
+        return header.get('digest') if header is not None else None
+
+    def invalidate(self, exchange_id=None):
+        """Removes the cache entry for `exchange_id`, or every entry when no id is given."""
+        if exchange_id is not None:
+            paths = [self._path(exchange_id), self._digest_path(exchange_id)]
+        elif os.path.isdir(self.cache_dir):
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                     if name.endswith(('.json', '.digest'))]
+        else:
+            paths = []
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        logger.info(f"Invalidated market cache for {exchange_id if exchange_id else 'all exchanges'}.")
+
+    def load_markets(self, exchange, reload=False):
+        """
+        Drop-in replacement for `exchange.load_markets()`.
+        Uses the cached markets when available, otherwise loads them from the
+        exchange and stores the result for the next run.
+        """
+        entry = None if reload else self.get(exchange.id)
+        if entry is not None:
+            exchange.set_markets(entry['markets'], entry['currencies'])
+            logger.info(f"Markets for {exchange.id} loaded from cache ({len(exchange.markets)} markets).")
+            return exchange.markets
+
+        markets = exchange.load_markets(reload)
+        self.put(exchange.id, markets, exchange.currencies)
+        return markets
+
+    async def load_markets_async(self, exchange, reload=False):
+        """Same as load_markets(), for exchanges created from ccxt.async_support."""
+        entry = None if reload else self.get(exchange.id)
+        if entry is not None:
+            exchange.set_markets(entry['markets'], entry['currencies'])
+            logger.info(f"Markets for {exchange.id} loaded from cache ({len(exchange.markets)} markets).")
+            return exchange.markets
+
+        markets = await exchange.load_markets(reload)
+        self.put(exchange.id, markets, exchange.currencies)
+        return markets
@@ -0,0 +1,76 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MarketIndex:
+    """
+    Index of an exchange's spot markets: base currency -> {quote currency -> symbol}.
+    Built with a single scan over ccxt's loaded `markets`, using each market's
+    'base', 'quote' and 'spot' fields rather than guessing symbol formats, so
+    markets whose symbols don't follow the BASE/QUOTE pattern are still found.
+    """
+    def __init__(self, exchange_id=None):
+        self.exchange_id = exchange_id
+        self.by_base = {} # {base: {quote: symbol}}
+        self.symbol_to_base = {} # {symbol: base}
+
+    @classmethod
+    def from_markets(cls, markets, exchange_id=None):
+        """Builds the index from an exchange's loaded markets ({symbol: market})."""
+        index = cls(exchange_id)
+        for symbol, market in markets.items():
+            if not market.get('spot'): # Only spot markets are relevant for arbitrage
+                continue
+            base = market.get('base')
+            quote = market.get('quote')
+            if not base or not quote:
+                continue
+            quotes = index.by_base.setdefault(base, {})
+            if quote not in quotes: # Keep the first market seen for a pair
+                quotes[quote] = symbol
+                index.symbol_to_base[symbol] = base
+        logger.debug(f"Indexed {len(index.symbol_to_base)} spot markets over {len(index.by_base)} bases for {exchange_id}")
+        return index
+
+    def __contains__(self, base):
+        return base in self.by_base
+
+    def __len__(self):
+        return len(self.by_base)
+
+    def quotes_for(self, base):
+        """Returns the quote currencies that have a spot market against `base`."""
+        return list(self.by_base.get(base, {}))
+
+    def symbol_for(self, base, quote_priority):
+        """
+        Returns the spot symbol for `base` against the first available quote
+        in `quote_priority` (e.g. ['USDT', 'USD', 'USDC']), or None.
+        """
+        quotes = self.by_base.get(base)
+        if not quotes:
+            return None
+        for quote in quote_priority:
+            symbol = quotes.get(quote)
+            if symbol is not None:
+                return symbol
+        return None
+
+    def bases_with_quotes(self, quotes):
+        """Returns the set of bases that trade against at least one of `quotes`."""
+        quotes = set(quotes)
+        return {base for base, base_quotes in self.by_base.items() if not quotes.isdisjoint(base_quotes)}
+
+    def support_bits(self, crypto_index, quotes):
+        """
+        Returns an integer bitset over `crypto_index` ({crypto: bit position}, as in
+        SupportMatrix.crypto_index) with a bit set for every crypto that trades
+        against at least one of `quotes`.
+        """
+        bits = 0
+        for base in self.bases_with_quotes(quotes):
+            position = crypto_index.get(base)
+            if position is not None:
+                bits |= 1 << position
+        return bits
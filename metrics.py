@@ -0,0 +1,319 @@
+import http.server
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+HISTOGRAM_SIGNIFICANT_DIGITS = 2 # Values are kept to within 10^-2 (1%) of their size
+HISTOGRAM_MAX_MS = 3_600_000 # Larger values are counted in one overflow bucket (and still in max)
+PERCENTILES = (50, 90, 99)
+
+# Endpoints whose whole batch comes from one request: its duration is recorded once, not per quote
+SHARED_DURATION_ENDPOINTS = ('fetch_tickers',)
+# Streamed batches carry the age of each update as their "duration", which is not a request latency
+STREAM_ENDPOINTS = ('stream',)
+
+# Prometheus endpoint, served from a background thread when a port is set (e.g. CRYPTO_ARB_METRICS_PORT=9464)
+METRICS_HOST = '127.0.0.1' # Local only
+METRICS_PORT = int(os.environ.get('CRYPTO_ARB_METRICS_PORT') or 0) or None
+METRICS_PREFIX = 'crypto_arb'
+# Upper bounds (ms) of the Prometheus histogram buckets the HDR histograms are folded into at scrape time
+PROMETHEUS_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _bucket_edges(max_value, digits):
+    """
+    Upper bounds of the histogram buckets, HDR style: 1 ms wide up to 10^(digits + 1) ms,
+    then each decade split into 9 * 10^digits equal buckets, up to `max_value`.
+    """
+    edges = [np.arange(1, 10 ** (digits + 1) + 1)]
+    width = 10
+    while edges[-1][-1] < max_value:
+        low = edges[-1][-1]
+        edges.append(np.arange(low + width, low * 10 + 1, width))
+        width *= 10
+    return np.concatenate(edges).astype(float)
+
+
+BUCKET_EDGES = _bucket_edges(HISTOGRAM_MAX_MS, HISTOGRAM_SIGNIFICANT_DIGITS)
+BUCKET_LOWS = np.concatenate(([0.0], BUCKET_EDGES)) # Lowest value of each bucket, the last one being the overflow
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of millisecond values (HDR-style): constant relative precision
+    over the whole range, fixed memory, and percentiles that don't need the samples.
+    Negative values (e.g. a quote timestamped ahead of the local clock) count as 0.
+    """
+    def __init__(self):
+        self.counts = np.zeros(len(BUCKET_LOWS), dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, values):
+        """Records one value or a sequence of values (ms)."""
+        values = np.maximum(np.asarray(values, dtype=float).reshape(-1), 0.0)
+        if not len(values):
+            return
+        self.counts += np.bincount(np.searchsorted(BUCKET_EDGES, values, side='right'), minlength=len(self.counts))
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, q):
+        """Lowest value of the bucket holding the q-th percentile (None when empty)."""
+        if not self.count:
+            return None
+        rank = max(1, int(np.ceil(q / 100 * self.count)))
+        return float(min(BUCKET_LOWS[np.searchsorted(np.cumsum(self.counts), rank)], self.max))
+
+    def summary(self):
+        """{'count': n, 'mean': ms, 'p50': ms, 'p90': ms, 'p99': ms, 'max': ms} (values None when empty)."""
+        summary = {'count': self.count, 'mean': self.total / self.count if self.count else None}
+        summary.update((f"p{q}", self.percentile(q)) for q in PERCENTILES)
+        summary['max'] = self.max if self.count else None
+        return summary
+
+
+class LatencyMetrics:
+    """
+    Request latency per exchange and endpoint ('fetch_tickers', 'fetch_ticker',
+    'fetch_order_book') and quote staleness per exchange: how old each quote was
+    (by the exchange's ticker timestamp) when its batch reached the queue.
+    ArbitrageCore feeds it every queue message; `version` changes with every update.
+    """
+    def __init__(self):
+        self.requests = {} # {(exchange_id, endpoint): LatencyHistogram}
+        self.staleness = {} # {exchange_id: LatencyHistogram}
+        self.version = 0
+
+    def clear(self):
+        self.requests.clear()
+        self.staleness.clear()
+        self.version += 1
+
+    def clear_exchange(self, exchange_id):
+        for key in [key for key in self.requests if key[0] == exchange_id]:
+            del self.requests[key]
+        self.staleness.pop(exchange_id, None)
+        self.version += 1
+
+    def _request_histogram(self, exchange_id, endpoint):
+        histogram = self.requests.get((exchange_id, endpoint))
+        if histogram is None:
+            histogram = self.requests[(exchange_id, endpoint)] = LatencyHistogram()
+        return histogram
+
+    def observe_batch(self, message):
+        """Records the request durations and quote ages of a 'price_batch' message."""
+        exchange_id = message['id']
+        endpoint = message.get('endpoint')
+        if endpoint is not None and endpoint not in STREAM_ENDPOINTS:
+            durations = [duration for duration in message['durations'] if duration is not None]
+            if durations:
+                self._request_histogram(exchange_id, endpoint).record(durations[:1] if endpoint in SHARED_DURATION_ENDPOINTS else durations)
+        timestamps = [timestamp for timestamp in message['timestamps'] if timestamp is not None]
+        if timestamps:
+            staleness = self.staleness.get(exchange_id)
+            if staleness is None:
+                staleness = self.staleness[exchange_id] = LatencyHistogram()
+            staleness.record(message['received_at'] - np.array(timestamps, dtype=float))
+        self.version += 1
+
+    def observe_order_book(self, message):
+        if message.get('duration') is not None:
+            self._request_histogram(message['id'], 'fetch_order_book').record(message['duration'])
+            self.version += 1
+
+    def summary(self):
+        """{exchange_id: {'requests': {endpoint: LatencyHistogram.summary()}, 'staleness': summary or None}}"""
+        summary = {}
+        for (exchange_id, endpoint), histogram in sorted(self.requests.items()):
+            summary.setdefault(exchange_id, {'requests': {}, 'staleness': None})['requests'][endpoint] = histogram.summary()
+        for exchange_id, histogram in sorted(self.staleness.items()):
+            summary.setdefault(exchange_id, {'requests': {}, 'staleness': None})['staleness'] = histogram.summary()
+        return summary
+
+
+class PipelineMetrics:
+    """
+    Counters and histograms of the fetch -> queue -> spread -> display pipeline that
+    LatencyMetrics doesn't cover. Fetcher threads count their requests (and failures,
+    by ccxt exception class); the consumer counts batches and quotes and times the
+    spread engine and each GUI/headless tick. Updates are a few dict operations under
+    one lock; nothing is rendered until render_prometheus() is called by a scrape.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {} # {(exchange_id, endpoint): n}
+        self.request_errors = {} # {(exchange_id, endpoint, exception class name): n}
+        self.batches = {} # {exchange_id: n}
+        self.quotes = {} # {(exchange_id, 'ok' or 'failed'): n}
+        self.order_books = {} # {exchange_id: n}
+        self.expired_quotes = {} # {exchange_id: n}, quotes dropped after their TTL
+        self.spread_update_us = LatencyHistogram() # Spread engine time per price batch (microseconds)
+        self.tick_us = LatencyHistogram() # Time per GUI tick / headless emit (microseconds, ticks are often sub-ms)
+        self.tick_messages = 0 # Messages drained by those ticks
+
+    def count_request(self, exchange_id, endpoint, error=None):
+        """Called by the fetchers after every REST request; `error` is the exception it raised, if any."""
+        with self.lock:
+            self.requests[(exchange_id, endpoint)] = self.requests.get((exchange_id, endpoint), 0) + 1
+            if error is not None:
+                key = (exchange_id, endpoint, type(error).__name__)
+                self.request_errors[key] = self.request_errors.get(key, 0) + 1
+
+    def count_batch(self, message, ok_quotes):
+        exchange_id = message['id']
+        with self.lock:
+            self.batches[exchange_id] = self.batches.get(exchange_id, 0) + 1
+            self.quotes[(exchange_id, 'ok')] = self.quotes.get((exchange_id, 'ok'), 0) + ok_quotes
+            failed = len(message['base_cryptos']) - ok_quotes
+            self.quotes[(exchange_id, 'failed')] = self.quotes.get((exchange_id, 'failed'), 0) + failed
+
+    def count_order_book(self, exchange_id):
+        with self.lock:
+            self.order_books[exchange_id] = self.order_books.get(exchange_id, 0) + 1
+
+    def count_expired(self, exchange_counts):
+        """`exchange_counts` is {exchange_id: quotes dropped by one expiry sweep}."""
+        with self.lock:
+            for exchange_id, count in exchange_counts.items():
+                self.expired_quotes[exchange_id] = self.expired_quotes.get(exchange_id, 0) + count
+
+    def observe_spread_update(self, seconds):
+        with self.lock:
+            self.spread_update_us.record(seconds * 1e6)
+
+    def observe_tick(self, seconds, messages):
+        """Called by the front-end after each queue drain (update_prices_gui or a headless emit)."""
+        with self.lock:
+            self.tick_us.record(seconds * 1e6)
+            self.tick_messages += messages
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _prometheus_histogram(lines, name, histogram, unit_seconds, **labels):
+    """Appends `histogram` (recorded in units of `unit_seconds`) as a Prometheus histogram in seconds."""
+    cumulative = np.cumsum(histogram.counts)
+    for bound_ms in PROMETHEUS_BUCKETS_MS:
+        bound = bound_ms / 1000 / unit_seconds # In the histogram's unit
+        index = np.searchsorted(BUCKET_EDGES, bound, side='right') - 1 # Last bucket entirely below the bound
+        count = int(cumulative[index]) if index >= 0 else 0
+        lines.append(f"{name}_bucket{_labels(**labels, le=f'{bound_ms / 1000:g}')} {count}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total * unit_seconds:g}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def render_prometheus(pipeline, latency, queue_depth, request_rates):
+    """
+    Prometheus text exposition (version 0.0.4) of the pipeline and latency metrics, the
+    current queue depth and each exchange's allowed request rate ({exchange_id: req/s}).
+    """
+    p = METRICS_PREFIX
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} {kind}")
+
+    with pipeline.lock:
+        requests = dict(pipeline.requests)
+        request_errors = dict(pipeline.request_errors)
+        batches = dict(pipeline.batches)
+        quotes = dict(pipeline.quotes)
+        order_books = dict(pipeline.order_books)
+        expired_quotes = dict(pipeline.expired_quotes)
+
+    family('queue_depth', 'gauge', "Messages waiting in the data queue.")
+    lines.append(f"{p}_queue_depth {queue_depth}")
+    family('allowed_request_rate', 'gauge', "Request rate the rate-limit scheduler currently allows (requests per second).")
+    for exchange_id, rate in sorted(request_rates.items()):
+        lines.append(f"{p}_allowed_request_rate{_labels(exchange=exchange_id)} {rate:g}")
+    family('requests_total', 'counter', "REST requests sent to the exchanges.")
+    for (exchange_id, endpoint), count in sorted(requests.items()):
+        lines.append(f"{p}_requests_total{_labels(exchange=exchange_id, endpoint=endpoint)} {count}")
+    family('request_errors_total', 'counter', "Failed REST requests, by ccxt exception class.")
+    for (exchange_id, endpoint, error), count in sorted(request_errors.items()):
+        lines.append(f"{p}_request_errors_total{_labels(exchange=exchange_id, endpoint=endpoint, error=error)} {count}")
+    family('batches_total', 'counter', "Price batches applied to the core state.")
+    for exchange_id, count in sorted(batches.items()):
+        lines.append(f"{p}_batches_total{_labels(exchange=exchange_id)} {count}")
+    family('quotes_total', 'counter', "Quotes applied to the core state, by outcome.")
+    for (exchange_id, status), count in sorted(quotes.items()):
+        lines.append(f"{p}_quotes_total{_labels(exchange=exchange_id, status=status)} {count}")
+    family('order_books_total', 'counter', "Order books applied to the depth tracker.")
+    for exchange_id, count in sorted(order_books.items()):
+        lines.append(f"{p}_order_books_total{_labels(exchange=exchange_id)} {count}")
+    family('quotes_expired_total', 'counter', "Quotes dropped from the spreads because they outlived their exchange's TTL.")
+    for exchange_id, count in sorted(expired_quotes.items()):
+        lines.append(f"{p}_quotes_expired_total{_labels(exchange=exchange_id)} {count}")
+
+    family('request_duration_seconds', 'histogram', "Duration of REST requests.")
+    for (exchange_id, endpoint), histogram in sorted(list(latency.requests.items())):
+        _prometheus_histogram(lines, f"{p}_request_duration_seconds", histogram, 1e-3, exchange=exchange_id, endpoint=endpoint)
+    family('quote_staleness_seconds', 'histogram', "Age of quotes (by the exchange's timestamp) when their batch was queued.")
+    for exchange_id, histogram in sorted(list(latency.staleness.items())):
+        _prometheus_histogram(lines, f"{p}_quote_staleness_seconds", histogram, 1e-3, exchange=exchange_id)
+    with pipeline.lock:
+        family('spread_update_seconds', 'histogram', "Spread engine time per price batch.")
+        _prometheus_histogram(lines, f"{p}_spread_update_seconds", pipeline.spread_update_us, 1e-6)
+        family('tick_seconds', 'histogram', "Time per GUI tick (update_prices_gui) or headless emit.")
+        _prometheus_histogram(lines, f"{p}_tick_seconds", pipeline.tick_us, 1e-6)
+        family('tick_messages_total', 'counter', "Queue messages drained by GUI ticks / headless emits.")
+        lines.append(f"{p}_tick_messages_total {pipeline.tick_messages}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    Serves `render()` (Prometheus text) at http://host:port/metrics from a daemon thread.
+    Nothing is computed between scrapes.
+    """
+    def __init__(self, render, host=METRICS_HOST, port=METRICS_PORT):
+        self.render = render
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        render = self.render
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request: {format % args}")
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True).start()
+        logger.info(f"Serving metrics at http://{self.host}:{self.server.server_address[1]}/metrics")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
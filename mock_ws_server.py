@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import ccxt
+
+try:
+    import websockets
+except ImportError: # Optional dependency, only needed for the mock streaming setup
+    websockets = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+MOCK_WS_HOST = '127.0.0.1'
+MOCK_WS_PORT = 8765
+
+# Protocol (JSON text frames):
+#   client -> server: {"op": "subscribe", "symbols": ["BTC/USDT", ...]}
+#   server -> client: {"symbol": "BTC/USDT", "bid": 1.0, "ask": 1.1, "timestamp": 1700000000000}
+# Frames are replayed from a JSON-lines file (one frame per line), or generated as
+# a random walk when no file is given. Only frames for subscribed symbols are sent.
+
+
+def _load_frames(replay_path):
+    frames = []
+    with open(replay_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frames.append(json.loads(line))
+    logger.info(f"Loaded {len(frames)} ticker frames from {replay_path}")
+    return frames
+
+
+def _synthetic_frames(symbols, count=1000, seed=42):
+    """Generates a deterministic random walk of ticker frames for `symbols`."""
+    rng = random.Random(seed)
+    mids = {symbol: rng.uniform(1, 1000) for symbol in symbols}
+    frames = []
+    for _ in range(count):
+        symbol = rng.choice(symbols)
+        mids[symbol] *= 1 + rng.gauss(0, 0.0005)
+        half_spread = mids[symbol] * rng.uniform(0.0001, 0.001)
+        frames.append({'symbol': symbol, 'bid': mids[symbol] - half_spread, 'ask': mids[symbol] + half_spread})
+    return frames
+
+
+class MockTickerServer:
+    """
+    Local websocket server that replays ticker frames to subscribed clients.
+    Used to exercise StreamingPriceFetcher (arbitrage_core.py) without a real exchange,
+    including its reconnect logic via `drop_after`.
+    """
+    def __init__(self, frames=None, host=MOCK_WS_HOST, port=MOCK_WS_PORT, interval=0.05, drop_after=None, loop_frames=True):
+        if websockets is None:
+            raise ImportError("The 'websockets' package is required for the mock websocket server.")
+        self.frames = frames
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.drop_after = drop_after # Close each connection after this many frames (tests reconnects)
+        self.loop_frames = loop_frames
+        self.server = None
+
+    async def _handle(self, connection, *args):
+        subscribed = set()
+        sent = 0
+        try:
+            message = json.loads(await connection.recv())
+            if message.get('op') == 'subscribe':
+                subscribed.update(message.get('symbols', []))
+            logger.info(f"Client subscribed to {len(subscribed)} symbols")
+
+            frames = self.frames or _synthetic_frames(sorted(subscribed))
+            while True:
+                for frame in frames:
+                    if frame['symbol'] not in subscribed:
+                        continue
+                    frame = dict(frame, timestamp=int(time.time() * 1000))
+                    await connection.send(json.dumps(frame))
+                    sent += 1
+                    if self.drop_after is not None and sent >= self.drop_after:
+                        logger.info(f"Dropping client after {sent} frames")
+                        await connection.close()
+                        return
+                    await asyncio.sleep(self.interval)
+                if not self.loop_frames:
+                    break
+        except websockets.ConnectionClosed:
+            pass
+
+    async def start(self):
+        self.server = await websockets.serve(self._handle, self.host, self.port)
+        logger.info(f"Mock ticker server listening on ws://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        await asyncio.Future()
+
+
+class MockWsExchange:
+    """
+    Minimal ccxt.pro-style client for MockTickerServer. Implements the parts of
+    the ccxt.pro interface StreamingPriceFetcher uses: `has`, `set_markets`,
+    `watch_tickers` and `close`. Connection failures surface as ccxt.NetworkError,
+    just like a real ccxt.pro exchange.
+    """
+    def __init__(self, exchange_id, url=f"ws://{MOCK_WS_HOST}:{MOCK_WS_PORT}"):
+        if websockets is None:
+            raise ImportError("The 'websockets' package is required for the mock websocket client.")
+        self.id = exchange_id
+        self.url = url
+        self.has = {'watchTickers': True, 'watchTicker': False}
+        self.markets = {}
+        self.currencies = {}
+        self.connection = None
+        self.subscribed = None
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies or {}
+
+    async def watch_tickers(self, symbols):
+        """Waits for the next frame and returns it as {symbol: ticker}."""
+        try:
+            if self.connection is None or self.subscribed != list(symbols):
+                await self.close()
+                self.connection = await websockets.connect(self.url)
+                await self.connection.send(json.dumps({'op': 'subscribe', 'symbols': list(symbols)}))
+                self.subscribed = list(symbols)
+            frame = json.loads(await self.connection.recv())
+        except (OSError, websockets.WebSocketException) as e:
+            self.connection = None
+            raise ccxt.NetworkError(f"{self.id} mock websocket: {type(e).__name__} - {str(e)}")
+        return {frame['symbol']: frame}
+
+    async def close(self):
+        if self.connection is not None:
+            try:
+                await self.connection.close()
+            finally:
+                self.connection = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay ticker frames over a local websocket for testing streaming mode.")
+    parser.add_argument('--replay', help="JSON-lines file of ticker frames to replay. Synthetic frames are used if omitted.")
+    parser.add_argument('--host', default=MOCK_WS_HOST)
+    parser.add_argument('--port', type=int, default=MOCK_WS_PORT)
+    parser.add_argument('--interval', type=float, default=0.05, help="Seconds between frames.")
+    parser.add_argument('--drop-after', type=int, default=None, help="Close each connection after N frames to test reconnects.")
+    args = parser.parse_args()
+
+    server = MockTickerServer(
+        frames=_load_frames(args.replay) if args.replay else None,
+        host=args.host, port=args.port, interval=args.interval, drop_after=args.drop_after,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        logger.info("Mock ticker server stopped.")
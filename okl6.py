@@ -1,412 +1,19 @@
-import ccxt
-import time
 from datetime import datetime, UTC
 import logging
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
 import queue
-import collections
-import pandas as pd
-import os
-
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-# --- Configuration ---
-
-# Path to the Excel file containing crypto support data
-EXCEL_FILE_PATH = r"C:\Users\Automatic\Desktop\arbitrageapp\crypto_exchange_support.xlsx"
-
-# All possible exchanges CCXT supports (a subset for demonstration)
-# This list is used to populate the initial exchange selection dropdowns
-all_available_exchanges = [
-    {'id': 'binance', 'name': 'Binance', 'type': 'cex'},
-    {'id': 'coinbase', 'name': 'Coinbase', 'type': 'cex'},
-    {'id': 'kraken', 'name': 'Kraken', 'type': 'cex'},
-    {'id': 'bitget', 'name': 'Bitget', 'type': 'cex'},
-    {'id': 'bybit', 'name': 'Bybit', 'type': 'cex'},
-    {'id': 'kucoin', 'name': 'KuCoin', 'type': 'cex'},
-    {'id': 'bitfinex', 'name': 'Bitfinex', 'type': 'cex'},
-    {'id': 'cryptocom', 'name': 'Crypto.com', 'type': 'cex'},
-    {'id': 'gateio', 'name': 'Gate.io', 'type': 'cex'},
-    {'id': 'huobi', 'name': 'Huobi', 'type': 'cex'},
-    {'id': 'mexc', 'name': 'MEXC', 'type': 'cex'},
-    {'id': 'bitstamp', 'name': 'Bitstamp', 'type': 'cex'},
-    {'id': 'lbank', 'name': 'LBank', 'type': 'cex'},
-    {'id': 'coinex', 'name': 'CoinEx', 'type': 'cex'},
-    {'id': 'ascendex', 'name': 'AscendEX', 'type': 'cex'},
-    {'id': 'digifinex', 'name': 'DigiFineFinex', 'type': 'cex'},
-    {'id': 'fmfwio', 'name': 'FMFW.io', 'type': 'cex'},
-    {'id': 'hitbtc', 'name': 'HitBTC', 'type': 'cex'},
-    {'id': 'phemex', 'name': 'Phemex', 'type': 'cex'},
-    {'id': 'probit', 'name': 'ProBit Global', 'type': 'cex'},
-    {'id': 'whitebit', 'name': 'WhiteBIT', 'type': 'cex'},
-    {'id': 'woo', 'name': 'WOO X', 'type': 'cex'},
-    {'id': 'poloniex', 'name': 'Poloniex', 'type': 'cex'},
-    {'id': 'bitrue', 'name': 'Bitrue', 'type': 'cex'},
-    {'id': 'tokocrypto', 'name': 'Tokocrypto', 'type': 'cex'},
-    {'id': 'indodax', 'name': 'Indodax', 'type': 'cex'},
-    {'id': 'upbit', 'name': 'Upbit', 'type': 'cex'},
-]
-
-# List of exchanges that do not support fetch_tickers with multiple symbols
-# This is used by ExchangePriceFetcher to determine fetch strategy
-SINGLE_TICKER_FETCH_EXCHANGES = ['cryptocom', 'bitfinex']
-
-
-def load_and_filter_cryptos_from_excel(excel_path, selected_exchange_ids):
-    """
-    Loads the crypto support data from the Excel file and filters
-    cryptocurrencies that are supported by ALL selected exchanges.
-
-    Args:
-        excel_path (str): The full path to the crypto_exchange_support.xlsx file.
-        selected_exchange_ids (list): A list of exchange IDs (e.g., ['binance', 'mexc'])
-                                      that the user has selected.
-
-    Returns:
-        list: A sorted list of cryptocurrency symbols (e.g., ['BTC', 'ETH'])
-              that are supported by all specified exchanges.
-    """
-    if not os.path.exists(excel_path):
-        messagebox.showerror("File Not Found", f"The Excel file was not found at: {excel_path}\n"
-                                             "Please ensure the file exists at the specified location.")
-        logger.error(f"Excel file not found at {excel_path}")
-        return []
-
-    try:
-        # Read the Excel file. The 'Crypto' column is the index.
-        df = pd.read_excel(excel_path, sheet_name='Crypto Support', index_col='Crypto')
-
-        # Map display names from Excel columns back to CCXT IDs for filtering
-        # This assumes the Excel columns are the 'name' from all_available_exchanges
-        # and we need to convert them to 'id' for filtering.
-        exchange_name_to_id_map = {ex['name']: ex['id'] for ex in all_available_exchanges}
-        
-        # Filter df columns to only include the selected exchanges' names
-        # Need to convert selected_exchange_ids to their corresponding names in the DataFrame
-        selected_exchange_names = [ex['name'] for ex in all_available_exchanges if ex['id'] in selected_exchange_ids]
-        
-        # Check if all selected exchange names exist as columns in the DataFrame
-        missing_columns = [name for name in selected_exchange_names if name not in df.columns]
-        if missing_columns:
-            messagebox.showwarning("Missing Exchange Data", 
-                                   f"The Excel file is missing data for the following selected exchanges: {', '.join(missing_columns)}\n"
-                                   "These exchanges will be excluded from filtering.")
-            # Filter out the missing columns from selected_exchange_names
-            selected_exchange_names = [name for name in selected_exchange_names if name in df.columns]
-
-        if not selected_exchange_names:
-            logger.warning("No valid exchange columns found in Excel for the selected exchanges.")
-            return []
-
-        df_filtered = df[selected_exchange_names]
-
-        # Convert '✅' to True and '❌' to False for boolean logic
-        # Explicitly call .infer_objects(copy=False) to address FutureWarning
-        df_filtered = df_filtered.replace({'✅': True, '❌': False}).infer_objects(copy=False)
-
-        # Find cryptos where ALL selected exchanges have 'True' (i.e., '✅')
-        # Use .all(axis=1) to check if all values in a row are True
-        common_cryptos = df_filtered[df_filtered.all(axis=1)].index.tolist()
-
-        logger.info(f"Filtered {len(common_cryptos)} common cryptocurrencies for selected exchanges: {selected_exchange_ids}")
-        return sorted(common_cryptos)
-
-    except FileNotFoundError:
-        # This case is handled by the initial os.path.exists check
-        return []
-    except Exception as e:
-        messagebox.showerror("Error Reading Excel", f"An error occurred while reading the Excel file: {e}")
-        logger.error(f"Error reading Excel file {excel_path}: {type(e).__name__} - {str(e)}")
-        return []
-
-
-class ExchangePriceFetcher(threading.Thread):
-    """
-    A dedicated thread to continuously fetch prices for a single exchange.
-    This version uses fetch_tickers for efficiency across multiple cryptocurrencies,
-    but falls back to individual fetch_ticker calls for exchanges that don't support it.
-    It now takes a dynamic list of `supported_cryptos_to_fetch`.
-    """
-    def __init__(self, exchange_id, exchange_type, data_queue, latest_prices_ref, 
-                 supported_cryptos_to_fetch, interval=2):
-        super().__init__()
-        self.exchange_id = exchange_id
-        self.exchange_type = exchange_type
-        self.data_queue = data_queue
-        self.latest_prices_ref = latest_prices_ref
-        self.supported_cryptos_to_fetch = supported_cryptos_to_fetch # Dynamic list
-        self.interval = interval
-        self.running = True
-        self.daemon = True
-        self.last_fetch_time = 0
-        self.exchange = None
-        self.markets_loaded = False
-        self.supported_symbols_on_exchange = {} # {base_crypto: actual_symbol_on_exchange}
-        self.single_ticker_fetch_exchanges = SINGLE_TICKER_FETCH_EXCHANGES
-
-    def _initialize_exchange(self):
-        """Initializes the CCXT exchange instance and loads markets for CEXs."""
-        try:
-            exchange_class = getattr(ccxt, self.exchange_id)
-            self.exchange = exchange_class({
-                'enableRateLimit': True,
-                'timeout': 30000, # 30 seconds timeout
-            })
-            self.exchange.load_markets()
-            self.markets_loaded = True
-            logger.info(f"Markets loaded for CEX {self.exchange_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to initialize or load markets for CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
-            self.data_queue.put({
-                'type': 'price_update',
-                'id': self.exchange_id,
-                'base_crypto': None,
-                'symbol': None,
-                'bid_price': None,
-                'ask_price': None,
-                'duration': None,
-                'error': f"Initialization failed: {str(e)}"
-            })
-            return False
-
-    def _determine_actual_symbol(self, base_crypto):
-        """
-        Determines the actual trading symbol for a given base_crypto on the CEX exchange.
-        Caches results for efficiency. Tries multiple common stablecoin suffixes.
-        Prioritizes spot markets.
-        """
-        if base_crypto in self.supported_symbols_on_exchange:
-            return self.supported_symbols_on_exchange[base_crypto]
-
-        # Common stablecoin suffixes to try
-        suffixes_to_try = ['/USDT', '/USD', '/USDC', '-USDT', '-USD', '-USDC', '_USDT', '_USD', '_USDC']
-        
-        unique_suffixes = []
-        for s in suffixes_to_try:
-            if s not in unique_suffixes:
-                unique_suffixes.append(s)
-
-        for suffix in unique_suffixes:
-            symbol_candidate = f"{base_crypto}{suffix}"
-            if symbol_candidate in self.exchange.markets:
-                market = self.exchange.markets[symbol_candidate]
-                if market['spot']: # Ensure it's a spot market
-                    self.supported_symbols_on_exchange[base_crypto] = symbol_candidate
-                    return symbol_candidate
-        
-        logger.debug(f"No suitable SPOT market symbol found for {base_crypto} on {self.exchange_id}. Tried suffixes: {unique_suffixes}")
-        return None
-
-    def _fetch_all_supported_crypto_prices(self):
-        """
-        Fetches prices for all `supported_cryptos_to_fetch` using fetch_tickers for efficiency (CEX),
-        or individual fetch_ticker calls (CEX).
-        Now fetching highest bid and lowest ask.
-        """
-        if not self.markets_loaded:
-            if not self._initialize_exchange():
-                return
-
-        start_time_ns = time.time_ns()
-        fetched_base_cryptos_in_batch = set()
-
-        if self.exchange_id in self.single_ticker_fetch_exchanges:
-            for base_crypto in self.supported_cryptos_to_fetch:
-                actual_symbol = self._determine_actual_symbol(base_crypto)
-                if actual_symbol:
-                    try:
-                        ticker = self.exchange.fetch_ticker(actual_symbol)
-                        bid_price = ticker.get('bid')
-                        ask_price = ticker.get('ask')
-                        duration_ms = (time.time_ns() - start_time_ns) // 1_000_000
-
-                        self.data_queue.put({
-                            'type': 'price_update',
-                            'id': self.exchange_id,
-                            'base_crypto': base_crypto,
-                            'symbol': actual_symbol,
-                            'bid_price': bid_price,
-                            'ask_price': ask_price,
-                            'duration': duration_ms,
-                            'error': None
-                        })
-                        fetched_base_cryptos_in_batch.add(base_crypto)
-                        logger.debug(f"Fetched {base_crypto} from CEX {self.exchange_id} individually.")
-
-                    except Exception as e:
-                        logger.error(f"Error fetching {base_crypto} from CEX {self.exchange_id} individually: {type(e).__name__} - {str(e)}")
-                        self.data_queue.put({
-                            'type': 'price_update',
-                            'id': self.exchange_id,
-                            'base_crypto': base_crypto,
-                            'symbol': actual_symbol,
-                            'bid_price': None,
-                            'ask_price': None,
-                            'duration': None,
-                            'error': f"Individual fetch failed: {str(e)}"
-                        })
-                else:
-                    self.data_queue.put({
-                        'type': 'price_update',
-                        'id': self.exchange_id,
-                        'base_crypto': base_crypto,
-                        'symbol': None,
-                        'bid_price': None,
-                        'ask_price': None,
-                        'duration': None,
-                        'error': 'No suitable market found'
-                    })
-        else:
-            symbols_to_fetch_unique = set()
-            for base_crypto in self.supported_cryptos_to_fetch:
-                actual_symbol = self._determine_actual_symbol(base_crypto)
-                if actual_symbol:
-                    symbols_to_fetch_unique.add(actual_symbol)
-                else:
-                    self.data_queue.put({
-                        'type': 'price_update',
-                        'id': self.exchange_id,
-                        'base_crypto': base_crypto,
-                        'symbol': None,
-                        'bid_price': None,
-                        'ask_price': None,
-                        'duration': None,
-                        'error': 'No suitable market found'
-                    })
-            
-            symbols_to_fetch = list(symbols_to_fetch_unique)
-
-            if not symbols_to_fetch:
-                logger.warning(f"No symbols to fetch for CEX {self.exchange_id} in this cycle.")
-                return
-
-            try:
-                tickers = self.exchange.fetch_tickers(symbols_to_fetch)
-                end_time_ns = time.time_ns()
-                duration_ms = (end_time_ns - start_time_ns) // 1_000_000
-
-                for symbol, ticker in tickers.items():
-                    base_crypto = symbol.split('/')[0].split('-')[0].split('_')[0]
-                    bid_price = ticker.get('bid')
-                    ask_price = ticker.get('ask')
-
-                    self.data_queue.put({
-                        'type': 'price_update',
-                        'id': self.exchange_id,
-                        'base_crypto': base_crypto,
-                        'symbol': symbol,
-                        'bid_price': bid_price,
-                        'ask_price': ask_price,
-                        'duration': duration_ms,
-                        'error': None
-                    })
-                    fetched_base_cryptos_in_batch.add(base_crypto)
-
-                logger.info(f"Successfully fetched {len(tickers)} tickers from CEX {self.exchange_id} in {duration_ms} ms")
-
-            except ccxt.ExchangeNotAvailable as e:
-                logger.error(f"CEX {self.exchange_id} is not available: {str(e)}")
-            except ccxt.NetworkError as e:
-                logger.error(f"Network error with CEX {self.exchange_id}: {str(e)}")
-            except ccxt.DDoSProtection as e:
-                logger.error(f"DDoS Protection for CEX {self.exchange_id}: {str(e)}")
-            except ccxt.RequestTimeout as e:
-                logger.error(f"Request Timeout for CEX {self.exchange_id}: {str(e)}")
-            except Exception as e:
-                logger.error(f"An unexpected error occurred fetching tickers from CEX {self.exchange_id}: {type(e).__name__} - {str(e)}")
-            
-            # Ensure all `supported_cryptos_to_fetch` send an update, even if not found in fetch_tickers
-            for base_crypto in self.supported_cryptos_to_fetch:
-                if base_crypto not in fetched_base_cryptos_in_batch:
-                    self.data_queue.put({
-                        'type': 'price_update',
-                        'id': self.exchange_id,
-                        'base_crypto': base_crypto,
-                        'symbol': None,
-                        'bid_price': None,
-                        'ask_price': None,
-                        'duration': None,
-                        'error': 'Not found or failed in batch fetch'
-                    })
-
-    def run(self):
-        if not self._initialize_exchange():
-            return
-
-        while self.running:
-            current_time = time.time()
-            if current_time - self.last_fetch_time >= self.interval:
-                self._fetch_all_supported_crypto_prices()
-                self.last_fetch_time = current_time
-            time.sleep(0.1)
-
-    def stop(self):
-        self.running = False
-        logger.info(f"Stopped fetching for {self.exchange_id}")
-
-    def force_fetch(self):
-        """Forces an immediate fetch for this specific exchange."""
-        self.last_fetch_time = 0
-        logger.info(f"Forcing immediate fetch for {self.exchange_id}")
-
+import time
 
-class ExchangeManager:
-    """
-    Manages active exchange threads and their configurations.
-    Now dynamically receives `supported_cryptos_list`.
-    """
-    def __init__(self, data_queue, latest_prices_ref, supported_cryptos_list, fetch_interval=2, exchange_intervals=None):
-        self.data_queue = data_queue
-        self.latest_prices_ref = latest_prices_ref
-        self.supported_cryptos_list = supported_cryptos_list # The dynamically filtered list
-        self.fetch_interval = fetch_interval
-        self.exchange_intervals = exchange_intervals if exchange_intervals is not None else {}
-        self.active_exchanges = {} 
-
-    def add_exchange(self, exchange_id, exchange_type):
-        if exchange_id not in self.active_exchanges:
-            logger.info(f"Adding {exchange_type} exchange: {exchange_id}")
-            interval = self.exchange_intervals.get(exchange_id, self.fetch_interval)
-            fetcher_thread = ExchangePriceFetcher(
-                exchange_id, exchange_type, self.data_queue, self.latest_prices_ref,
-                self.supported_cryptos_list, interval # Pass the filtered crypto list
-            )
-            fetcher_thread.start()
-            self.active_exchanges[exchange_id] = {
-                'thread': fetcher_thread,
-                'type': exchange_type
-            }
-            # Fix: Changed 'ex_type' to 'exchange_type' to resolve NameError
-            self.data_queue.put({'type': 'add_exchange_row', 'id': exchange_id, 'ex_type': exchange_type})
-        else:
-            logger.warning(f"Exchange {exchange_id} is already active.")
-
-    def remove_exchange(self, exchange_id):
-        if exchange_id in self.active_exchanges:
-            logger.info(f"Removing exchange: {exchange_id}")
-            self.active_exchanges[exchange_id]['thread'].stop()
-            self.active_exchanges[exchange_id]['thread'].join(timeout=1)
-            del self.active_exchanges[exchange_id]
-            self.data_queue.put({'type': 'remove_exchange_row', 'id': exchange_id})
-        else:
-            logger.warning(f"Exchange {exchange_id} is not active.")
+from arbitrage_core import (
+    ArbitrageCore, PRICE_EXPIRED, PRICE_NO_MARKET, SPREADS_TOP_K, all_available_exchanges,
+)
+from table_view import KeyedTreeView, SortedRowModel
 
-    def force_refresh_all(self):
-        for exchange_data in self.active_exchanges.values():
-            exchange_data['thread'].force_fetch()
+logger = logging.getLogger(__name__)
 
-    def stop_all(self):
-        for exchange_data in self.active_exchanges.values():
-            exchange_data['thread'].stop()
-        
-        for exchange_data in self.active_exchanges.values():
-            exchange_data['thread'].join(timeout=1)
-        logger.info("All exchange fetcher threads stopped.")
+# Tk front-end of the arbitrage watcher. Fetching, prices and spread math live in
+# arbitrage_core.py; headless.py runs the same core without a display.
 
 
 class CryptoPriceApp:
@@ -428,53 +35,75 @@ class CryptoPriceApp:
         self.style.configure("TMenubutton", font=('Inter', 11))
         self.style.configure("TCheckbutton", font=('Inter', 11)) # For exchange selection
 
-        self.data_queue = queue.Queue()
-        self.latest_prices = collections.defaultdict(lambda: collections.defaultdict(dict))
-        self.previous_prices = collections.defaultdict(dict)
+        # Optional minimum seconds between fetch cycles per exchange, e.g. {'bitfinex': 5}.
+        # Without an entry each exchange runs as fast as its ccxt rateLimit allows (see scheduler.py).
+        self.specific_exchange_intervals = {}
 
-        self.specific_exchange_intervals = {
-            'binance': 2,
-            'mexc': 3,
-            'bitfinex': 5,
-            'kraken': 3,
+        # Max in-flight requests per single-ticker exchange (default: DEFAULT_REQUEST_CONCURRENCY in arbitrage_core.py)
+        self.specific_exchange_concurrency = {
+            'bitfinex': 2,
+            'cryptocom': 8,
         }
 
-        self.selected_exchange_ids = [] # Stores IDs of exchanges selected by the user
-        self.filtered_supported_cryptos = [] # Dynamically updated list of cryptos to scrape
+        # Fetchers, prices, scrape stats and spreads; the GUI only renders them
+        self.core = ArbitrageCore(exchange_intervals=self.specific_exchange_intervals,
+                                  exchange_concurrency=self.specific_exchange_concurrency,
+                                  notify=self._show_message)
+        self.rendered_spreads_state = None # (tracker version, displayed crypto) last shown on the spreads tab
+        self.rendered_latency_version = None # latency_metrics.version last shown on the latency tab
+        self.rendered_triangular_version = None # triangular_tracker.version last shown on the triangular tab
+
         # Set initial value to 'BTC'
         self.current_crypto_base = tk.StringVar(value='BTC') 
 
-        # Initialize ExchangeManager with empty lists initially
-        self.exchange_manager = ExchangeManager(self.data_queue, self.latest_prices, 
-                                                self.filtered_supported_cryptos, # Pass reference to dynamic list
-                                                fetch_interval=2, 
-                                                exchange_intervals=self.specific_exchange_intervals)
-        
-        self.exchange_scrape_stats = {} # Populated after exchanges are loaded
-
         self.sort_orders = {
             "main_table": {
                 "Bid Price": "desc",
                 "Scrape Duration (ms)": "asc",
                 "Avg Scrape (ms)": "asc"
             },
-            "spreads_table_buy_sell": { # New key for the first spreads table
-                "Crypto (Buy)": "asc", 
-                "Exchange1 Bid (Buy)": "desc", 
-                "Exchange2 Ask (Sell)": "desc",
-                "Spread (Ex2 Ask - Ex1 Bid) (%)": "desc",
+            "spreads_table_best": { # Best opportunity per crypto across all selected exchanges
+                "Crypto": "asc",
+                "Buy Ask": "desc",
+                "Sell Bid": "desc",
+                "Spread (%)": "desc",
+                "Net Spread (%)": "desc", # Best spreads after fees on top until a heading is clicked
+                "Exec Spread (%)": "desc", # Depth mode only
+                "Max Size ($)": "desc",
+            },
+            "spreads_table_pairs": { # Every exchange pair for the displayed crypto
+                "Buy Ask": "desc",
+                "Sell Bid": "desc",
+                "Spread (%)": "desc",
+                "Net Spread (%)": "desc",
+            },
+            "latency_table": { # Request latency per exchange and endpoint
+                "Requests": "desc",
+                "p50 (ms)": "desc",
+                "p90 (ms)": "desc",
+                "p99 (ms)": "desc", # Slowest tails on top
+                "Max (ms)": "desc",
             },
-            "spreads_table_sell_buy": { # New key for the second spreads table
-                "Crypto (Sell)": "asc", 
-                "Exchange2 Bid (Buy)": "desc",
-                "Exchange1 Ask (Sell)": "desc",
-                "Spread (Ex1 Ask - Ex2 Bid) (%)": "desc",
+            "staleness_table": { # Quote age on arrival per exchange
+                "Quotes": "desc",
+                "p50 (ms)": "desc",
+                "p90 (ms)": "desc",
+                "p99 (ms)": "desc",
+                "Max (ms)": "desc",
+            },
+            "triangular_table": { # Triangular mode only: cycles within one exchange
+                "Exchange": "asc",
+                "Cycle": "asc",
+                "Profit (%)": "desc",
             }
         }
         self.current_main_sort_col = "Bid Price"
-        # Default sort columns for the new spreads tables
-        self.current_spreads_sort_col_buy_sell = "Crypto (Buy)" 
-        self.current_spreads_sort_col_sell_buy = "Crypto (Sell)"
+        # Default sort columns for the spreads tables
+        self.current_spreads_sort_col_best = "Net Spread (%)"
+        self.current_spreads_sort_col_pairs = "Net Spread (%)"
+        self.current_latency_sort_col = "p99 (ms)"
+        self.current_staleness_sort_col = "p99 (ms)"
+        self.current_triangular_sort_col = "Profit (%)"
         
         self.create_widgets()
         self.tree.tag_configure("rising", background="#e0ffe0")
@@ -484,6 +113,13 @@ class CryptoPriceApp:
         self.update_prices_gui()
         self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def _show_message(self, level, title, message):
+        """notify callback for ArbitrageCore: shows support-data problems in a dialog."""
+        if level == 'error':
+            messagebox.showerror(title, message)
+        else:
+            messagebox.showwarning(title, message)
+
     def create_widgets(self):
         # Main container frame for overall layout
         main_container = ttk.Frame(self.master, padding=10)
@@ -548,7 +184,7 @@ class CryptoPriceApp:
         self.crypto_dropdown.grid(row=1, column=1, sticky="ew", pady=5)
         self.crypto_dropdown.config(state="disabled") # Disable until cryptos are loaded
 
-        refresh_button = ttk.Button(main_controls_frame, text="Refresh All", command=self.exchange_manager.force_refresh_all)
+        refresh_button = ttk.Button(main_controls_frame, text="Refresh All", command=lambda: self.core.exchange_manager.force_refresh_all())
         refresh_button.grid(row=2, column=0, columnspan=2, sticky="ew", pady=5)
         
         self.view_spreads_button = ttk.Button(main_controls_frame, text="View Spreads", command=self.toggle_spreads_view)
@@ -585,8 +221,10 @@ class CryptoPriceApp:
         self.tree.column("Avg Scrape (ms)", width=120, anchor=tk.E)
 
         main_scrollbar = ttk.Scrollbar(self.main_prices_tab, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=main_scrollbar.set)
         main_scrollbar.grid(row=0, column=1, sticky="ns") # Place scrollbar next to treeview
+        # One row per exchange, keyed by exchange id
+        self.main_table_model = SortedRowModel(columns, self.current_main_sort_col, self.sort_orders["main_table"][self.current_main_sort_col] == "desc")
+        self.main_table_view = KeyedTreeView(self.tree, main_scrollbar)
 
         # Tab 2: Arbitrage Spreads
         self.spreads_tab = ttk.Frame(self.notebook, padding=10)
@@ -595,63 +233,117 @@ class CryptoPriceApp:
         self.spreads_tab.columnconfigure(1, weight=1) # Make second column (table 2) expandable
         self.spreads_tab.rowconfigure(0, weight=1) # Make row expandable for both tables
 
-        # Frame for Buy on Ex1, Sell on Ex2 table
-        spreads_frame_buy_sell = ttk.LabelFrame(self.spreads_tab, text="Buy on Ex1, Sell on Ex2", padding=5)
-        spreads_frame_buy_sell.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
-        spreads_frame_buy_sell.columnconfigure(0, weight=1)
-        spreads_frame_buy_sell.rowconfigure(0, weight=1)
-
-        # Columns for the first arbitrage table
-        columns_buy_sell = (
-            "Crypto (Buy)", 
-            "Ex1 Bid (Buy)", 
-            "Ex2 Ask (Sell)", 
-            "Spread (Ex2 Ask - Ex1 Bid) (%)"
-        )
-        self.spreads_tree_buy_sell = ttk.Treeview(spreads_frame_buy_sell, columns=columns_buy_sell, show="headings")
-        self.spreads_tree_buy_sell.grid(row=0, column=0, sticky="nsew")
-        
-        for col in columns_buy_sell:
-            self.spreads_tree_buy_sell.heading(col, text=col, anchor=tk.W)
-            self.spreads_tree_buy_sell.column(col, width=120, anchor=tk.W)
-            if "Spread" in col:
-                self.spreads_tree_buy_sell.column(col, width=200, anchor=tk.E)
+        # Frame for the best opportunity per crypto (all selected exchanges)
+        spreads_frame_best = ttk.LabelFrame(self.spreads_tab, text=f"Best Opportunity per Crypto (Top {SPREADS_TOP_K})", padding=5)
+        spreads_frame_best.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
+        spreads_frame_best.columnconfigure(0, weight=1)
+        spreads_frame_best.rowconfigure(0, weight=1)
+
+        # Buy on the exchange with the lowest ask, sell on the one with the highest bid.
+        # In depth mode: VWAP spread and buy-side notional of the most profitable fill from the order books
+        columns_best = ("Crypto", "Buy On", "Buy Ask", "Sell On", "Sell Bid", "Spread (%)", "Net Spread (%)")
+        if self.core.depth_tracker is not None:
+            columns_best += ("Exec Spread (%)", "Max Size ($)")
+        self.spreads_tree_best = ttk.Treeview(spreads_frame_best, columns=columns_best, show="headings")
+        self.spreads_tree_best.grid(row=0, column=0, sticky="nsew")
+
+        for col in columns_best:
+            self.spreads_tree_best.heading(col, text=col, anchor=tk.W)
+            self.spreads_tree_best.column(col, width=100, anchor=tk.W)
+            if "Spread" in col or "Size" in col:
+                self.spreads_tree_best.column(col, width=120, anchor=tk.E)
             elif "Bid" in col or "Ask" in col:
-                self.spreads_tree_buy_sell.column(col, width=150, anchor=tk.E)
-            self.spreads_tree_buy_sell.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_buy_sell, "spreads_table_buy_sell"))
-
-        scrollbar_buy_sell = ttk.Scrollbar(spreads_frame_buy_sell, orient="vertical", command=self.spreads_tree_buy_sell.yview)
-        self.spreads_tree_buy_sell.configure(yscrollcommand=scrollbar_buy_sell.set)
-        scrollbar_buy_sell.grid(row=0, column=1, sticky="ns")
-
-        # Frame for Buy on Ex2, Sell on Ex1 table
-        spreads_frame_sell_buy = ttk.LabelFrame(self.spreads_tab, text="Buy on Ex2, Sell on Ex1", padding=5)
-        spreads_frame_sell_buy.grid(row=0, column=1, sticky="nsew", padx=(5, 0))
-        spreads_frame_sell_buy.columnconfigure(0, weight=1)
-        spreads_frame_sell_buy.rowconfigure(0, weight=1)
-
-        # Columns for the second arbitrage table
-        columns_sell_buy = (
-            "Crypto (Sell)", 
-            "Ex2 Bid (Buy)", 
-            "Ex1 Ask (Sell)", 
-            "Spread (Ex1 Ask - Ex2 Bid) (%)"
-        )
-        self.spreads_tree_sell_buy = ttk.Treeview(spreads_frame_sell_buy, columns=columns_sell_buy, show="headings")
-        self.spreads_tree_sell_buy.grid(row=0, column=0, sticky="nsew")
-
-        for col in columns_sell_buy:
-            self.spreads_tree_sell_buy.heading(col, text=col, anchor=tk.W)
-            self.spreads_tree_sell_buy.column(col, width=120, anchor=tk.W)
+                self.spreads_tree_best.column(col, width=130, anchor=tk.E)
+            self.spreads_tree_best.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_best, "spreads_table_best"))
+
+        scrollbar_best = ttk.Scrollbar(spreads_frame_best, orient="vertical")
+        scrollbar_best.grid(row=0, column=1, sticky="ns")
+        # Keyed by crypto; only the visible rows exist in the Treeview, so large top-K stays cheap
+        self.spreads_model_best = SortedRowModel(columns_best, self.current_spreads_sort_col_best, self.sort_orders["spreads_table_best"][self.current_spreads_sort_col_best] == "desc")
+        self.spreads_view_best = KeyedTreeView(self.spreads_tree_best, scrollbar_best, virtual=True)
+
+        # Frame for every exchange pair of the displayed crypto (pairwise matrix, computed on demand)
+        self.spreads_frame_pairs = ttk.LabelFrame(self.spreads_tab, text="All Exchange Pairs", padding=5)
+        self.spreads_frame_pairs.grid(row=0, column=1, sticky="nsew", padx=(5, 0))
+        self.spreads_frame_pairs.columnconfigure(0, weight=1)
+        self.spreads_frame_pairs.rowconfigure(0, weight=1)
+
+        columns_pairs = ("Buy On", "Buy Ask", "Sell On", "Sell Bid", "Spread (%)", "Net Spread (%)")
+        self.spreads_tree_pairs = ttk.Treeview(self.spreads_frame_pairs, columns=columns_pairs, show="headings")
+        self.spreads_tree_pairs.grid(row=0, column=0, sticky="nsew")
+
+        for col in columns_pairs:
+            self.spreads_tree_pairs.heading(col, text=col, anchor=tk.W)
+            self.spreads_tree_pairs.column(col, width=100, anchor=tk.W)
             if "Spread" in col:
-                self.spreads_tree_sell_buy.column(col, width=200, anchor=tk.E)
+                self.spreads_tree_pairs.column(col, width=120, anchor=tk.E)
             elif "Bid" in col or "Ask" in col:
-                self.spreads_tree_sell_buy.column(col, width=150, anchor=tk.E)
-            self.spreads_tree_sell_buy.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_sell_buy, "spreads_table_sell_buy"))
-
-        scrollbar_sell_buy = ttk.Scrollbar(spreads_frame_sell_buy, orient="vertical", command=self.spreads_tree_sell_buy.yview)
-        self.spreads_tree_sell_buy.configure(yscrollcommand=scrollbar_sell_buy.set)
-        scrollbar_sell_buy.grid(row=0, column=1, sticky="ns")
+                self.spreads_tree_pairs.column(col, width=130, anchor=tk.E)
+            self.spreads_tree_pairs.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_pairs, "spreads_table_pairs"))
+
+        scrollbar_pairs = ttk.Scrollbar(self.spreads_frame_pairs, orient="vertical", command=self.spreads_tree_pairs.yview)
+        scrollbar_pairs.grid(row=0, column=1, sticky="ns")
+        # Keyed by "buy>sell" exchange ids
+        self.spreads_model_pairs = SortedRowModel(columns_pairs, self.current_spreads_sort_col_pairs, self.sort_orders["spreads_table_pairs"][self.current_spreads_sort_col_pairs] == "desc")
+        self.spreads_view_pairs = KeyedTreeView(self.spreads_tree_pairs, scrollbar_pairs)
+
+        # Tab 3: Latency (request latency histograms and quote staleness, see metrics.py)
+        self.latency_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.latency_tab, text="Latency")
+        self.latency_tab.columnconfigure(0, weight=3)
+        self.latency_tab.columnconfigure(1, weight=2)
+        self.latency_tab.rowconfigure(0, weight=1)
+
+        latency_frame = ttk.LabelFrame(self.latency_tab, text="Request Latency", padding=5)
+        latency_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
+        latency_frame.columnconfigure(0, weight=1)
+        latency_frame.rowconfigure(0, weight=1)
+        columns_latency = ("Exchange", "Endpoint", "Requests", "p50 (ms)", "p90 (ms)", "p99 (ms)", "Max (ms)")
+        self.latency_tree = ttk.Treeview(latency_frame, columns=columns_latency, show="headings")
+        self.latency_tree.grid(row=0, column=0, sticky="nsew")
+
+        staleness_frame = ttk.LabelFrame(self.latency_tab, text="Quote Staleness (age on arrival)", padding=5)
+        staleness_frame.grid(row=0, column=1, sticky="nsew", padx=(5, 0))
+        staleness_frame.columnconfigure(0, weight=1)
+        staleness_frame.rowconfigure(0, weight=1)
+        columns_staleness = ("Exchange", "Quotes", "p50 (ms)", "p90 (ms)", "p99 (ms)", "Max (ms)")
+        self.staleness_tree = ttk.Treeview(staleness_frame, columns=columns_staleness, show="headings")
+        self.staleness_tree.grid(row=0, column=0, sticky="nsew")
+
+        for tree_widget, table_type in ((self.latency_tree, "latency_table"), (self.staleness_tree, "staleness_table")):
+            for col in tree_widget["columns"]:
+                tree_widget.heading(col, text=col, anchor=tk.W)
+                tree_widget.column(col, width=90, anchor=tk.E if col not in ("Exchange", "Endpoint") else tk.W)
+                tree_widget.heading(col, command=lambda c=col, t=tree_widget, tt=table_type: self.sort_column(c, t, tt))
+
+        scrollbar_latency = ttk.Scrollbar(latency_frame, orient="vertical", command=self.latency_tree.yview)
+        scrollbar_latency.grid(row=0, column=1, sticky="ns")
+        scrollbar_staleness = ttk.Scrollbar(staleness_frame, orient="vertical", command=self.staleness_tree.yview)
+        scrollbar_staleness.grid(row=0, column=1, sticky="ns")
+        # Keyed by "exchange:endpoint" and by exchange id
+        self.latency_model = SortedRowModel(columns_latency, self.current_latency_sort_col, True)
+        self.latency_view = KeyedTreeView(self.latency_tree, scrollbar_latency)
+        self.staleness_model = SortedRowModel(columns_staleness, self.current_staleness_sort_col, True)
+        self.staleness_view = KeyedTreeView(self.staleness_tree, scrollbar_staleness)
+
+        # Tab 4 (triangular mode only): profitable 3-market cycles within each exchange, see triangular.py
+        if self.core.triangular_tracker is not None:
+            self.triangular_tab = ttk.Frame(self.notebook, padding=10)
+            self.notebook.add(self.triangular_tab, text="Triangular")
+            self.triangular_tab.columnconfigure(0, weight=1)
+            self.triangular_tab.rowconfigure(0, weight=1)
+            columns_triangular = ("Exchange", "Cycle", "Legs", "Profit (%)")
+            self.triangular_tree = ttk.Treeview(self.triangular_tab, columns=columns_triangular, show="headings")
+            self.triangular_tree.grid(row=0, column=0, sticky="nsew")
+            for col in columns_triangular:
+                self.triangular_tree.heading(col, text=col, anchor=tk.W)
+                self.triangular_tree.column(col, width=120 if col != "Legs" else 420, anchor=tk.W if col != "Profit (%)" else tk.E)
+                self.triangular_tree.heading(col, command=lambda c=col: self.sort_column(c, self.triangular_tree, "triangular_table"))
+            scrollbar_triangular = ttk.Scrollbar(self.triangular_tab, orient="vertical", command=self.triangular_tree.yview)
+            scrollbar_triangular.grid(row=0, column=1, sticky="ns")
+            # Keyed by exchange and markets of the cycle
+            self.triangular_model = SortedRowModel(columns_triangular, self.current_triangular_sort_col, True)
+            self.triangular_view = KeyedTreeView(self.triangular_tree, scrollbar_triangular)
         
         # --- Status Bar (Bottom of main_container) ---
         status_info_frame = ttk.LabelFrame(main_container, text="Status", padding=10)
@@ -665,13 +357,22 @@ class CryptoPriceApp:
         self.avg_total_scrape_time_label = ttk.Label(status_info_frame, text="Avg scrape time (all exchanges, last cycle): N/A", font=('Inter', 11))
         self.avg_total_scrape_time_label.grid(row=0, column=1, sticky="e")
         
-        self.exchange_rows = {} # Stores {'exchange_id': 'treeview_item_id'}
+        # (row model, diff renderer) of the tables, by table type (as used in sort_orders)
+        self.tables = {
+            "main_table": (self.main_table_model, self.main_table_view),
+            "spreads_table_best": (self.spreads_model_best, self.spreads_view_best),
+            "spreads_table_pairs": (self.spreads_model_pairs, self.spreads_view_pairs),
+            "latency_table": (self.latency_model, self.latency_view),
+            "staleness_table": (self.staleness_model, self.staleness_view),
+        }
+        if self.core.triangular_tracker is not None:
+            self.tables["triangular_table"] = (self.triangular_model, self.triangular_view)
         self.current_view = "main" # Keep track of the current view (though notebook handles visibility)
 
 
     def load_selected_exchanges_and_cryptos(self):
         """
-        Loads selected exchanges and filters cryptocurrencies based on the Excel file.
+        Loads selected exchanges and filters cryptocurrencies based on the support matrix.
         This method is called when the user clicks the "Load Selected Exchanges & Cryptos" button.
         """
         selected_exchanges = []
@@ -683,31 +384,25 @@ class CryptoPriceApp:
             messagebox.showwarning("Selection Error", "Please select at least two exchanges to enable spread calculation.")
             return
 
-        self.selected_exchange_ids = selected_exchanges
-        logger.info(f"User selected exchanges: {self.selected_exchange_ids}")
-
-        # Stop any currently running exchange threads
-        self.exchange_manager.stop_all()
-
-        # Clear existing data in GUI and internal states
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        for item in self.spreads_tree_buy_sell.get_children(): # Clear first spreads table
-            self.spreads_tree_buy_sell.delete(item)
-        for item in self.spreads_tree_sell_buy.get_children(): # Clear second spreads table
-            self.spreads_tree_sell_buy.delete(item)
-
-        self.exchange_rows.clear()
-        self.exchange_scrape_stats.clear()
-        self.latest_prices.clear()
-        self.previous_prices.clear()
-        self.exchange_manager.active_exchanges.clear() # Ensure manager's active exchanges are clear
-
-        # Load and filter cryptos based on selected exchanges
-        self.filtered_supported_cryptos = load_and_filter_cryptos_from_excel(EXCEL_FILE_PATH, self.selected_exchange_ids)
-
-        if not self.filtered_supported_cryptos:
-            messagebox.showwarning("No Common Cryptos", "No common cryptocurrencies found across the selected exchanges in the Excel file. Please choose different exchanges or update the Excel file.")
+        logger.info(f"User selected exchanges: {selected_exchanges}")
+
+        # Clear existing data in GUI
+        self.main_table_model.clear()
+        self.spreads_model_best.clear() # Clear best-opportunity table
+        self.spreads_model_pairs.clear() # Clear exchange-pairs table
+        self.latency_model.clear()
+        self.staleness_model.clear()
+        self.rendered_spreads_state = None
+        self.rendered_latency_version = None
+        if self.core.triangular_tracker is not None:
+            self.triangular_model.clear()
+            self.rendered_triangular_version = None
+
+        # Stops the running fetchers, filters the common cryptos and starts fetching them
+        filtered_supported_cryptos = self.core.load_exchanges(selected_exchanges)
+
+        if not filtered_supported_cryptos:
+            messagebox.showwarning("No Common Cryptos", "No common cryptocurrencies found across the selected exchanges in the support matrix. Please choose different exchanges or re-run exchange3.py.")
             self.status_label.config(text="No common cryptos found. Please re-select exchanges.")
             self.crypto_dropdown.config(state="disabled")
             self.current_crypto_base.set('N/A')
@@ -715,32 +410,18 @@ class CryptoPriceApp:
 
         # --- Set BTC as default crypto if available ---
         default_crypto = 'N/A'
-        if 'BTC' in self.filtered_supported_cryptos:
+        if 'BTC' in self.core.filtered_supported_cryptos:
             default_crypto = 'BTC'
-        elif self.filtered_supported_cryptos:
-            default_crypto = self.filtered_supported_cryptos[0]
+        elif self.core.filtered_supported_cryptos:
+            default_crypto = self.core.filtered_supported_cryptos[0]
         
         self.current_crypto_base.set(default_crypto)
         # Update the crypto dropdown with the filtered list and the selected default
-        self.crypto_dropdown.set_menu(self.current_crypto_base.get(), *self.filtered_supported_cryptos)
+        self.crypto_dropdown.set_menu(self.current_crypto_base.get(), *self.core.filtered_supported_cryptos)
         self.crypto_dropdown.config(state="normal")
         self.master.title(f"Advanced Live {self.current_crypto_base.get()} Price Watcher")
 
-        # Re-initialize ExchangeManager with the selected exchanges and filtered cryptos
-        # The ExchangeManager will now use this specific list for all its fetchers
-        self.exchange_manager = ExchangeManager(self.data_queue, self.latest_prices, 
-                                                self.filtered_supported_cryptos, # Pass the filtered list
-                                                fetch_interval=2, 
-                                                exchange_intervals=self.specific_exchange_intervals)
-        
-        # Add selected exchanges to the manager, which will start their threads
-        for ex_id in self.selected_exchange_ids:
-            ex_type = next((ex['type'] for ex in all_available_exchanges if ex['id'] == ex_id), 'cex') # Default to cex
-            self.exchange_manager.add_exchange(ex_id, ex_type)
-            self.exchange_scrape_stats[ex_id] = {'total_duration': 0, 'count': 0, 'average': 0}
-
-
-        self.status_label.config(text=f"Loaded {len(self.selected_exchange_ids)} exchanges and {len(self.filtered_supported_cryptos)} common cryptos.")
+        self.status_label.config(text=f"Loaded {len(self.core.selected_exchange_ids)} exchanges and {len(self.core.filtered_supported_cryptos)} common cryptos.")
         logger.info("Exchanges and cryptos loaded successfully.")
 
 
@@ -758,71 +439,41 @@ class CryptoPriceApp:
         self.master.title(f"Advanced Live {new_crypto_base} Price Watcher")
         
         # Clear main table and re-populate with current data for the new crypto
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        self.exchange_rows.clear() # Clear existing rows
+        self.main_table_model.clear()
         
         # Re-add rows for active exchanges, showing "N/A" initially for the new crypto
-        for ex_id in self.exchange_manager.active_exchanges:
-            ex_type = self.exchange_manager.active_exchanges[ex_id]['type']
+        for ex_id in self.core.exchange_manager.active_exchanges:
+            ex_type = self.core.exchange_manager.active_exchanges[ex_id]['type']
             # We don't have the exact symbol here, so we use a placeholder for display
             self._add_exchange_row_to_tree(ex_id, ex_type, f"{new_crypto_base}/USDT") 
         
         logger.info(f"Successfully changed displayed crypto base to {new_crypto_base}")
 
 
-    def get_sort_value(self, value, col):
-        """
-        Helper function to convert string values from Treeview cells into sortable types.
-        Handles "N/A" and "Failed to fetch" for numerical columns, placing them at the end.
-        """
-        if col in ["Bid Price", "Ask Price", "Scrape Duration (ms)", "Avg Scrape (ms)"] or \
-           "Bid" in col or "Ask" in col or "Spread" in col: # Generic check for price/spread columns
-            if isinstance(value, str):
-                value = value.replace('$', '').replace(',', '').replace(' ms', '').replace(' %', '').strip()
-            try:
-                return float(value)
-            except ValueError:
-                return float('inf') # Places non-numeric values at the end when sorting numerically
-        return value
-
     def _apply_sort(self, col, tree_widget, table_type, sort_order):
         """
-        Applies sorting to the Treeview by reordering existing items.
+        Sorts the table's row model by `col` (a no-op unless the column or order changed)
+        and renders it through the table's KeyedTreeView, which does nothing if the model
+        hasn't changed and otherwise only moves rows whose rank changed.
         """
-        l = []
-        for k in tree_widget.get_children(''):
-            item_values = tree_widget.item(k, 'values')
-            try:
-                col_index = tree_widget["columns"].index(col)
-                value_to_sort = item_values[col_index]
-            except (ValueError, IndexError):
-                value_to_sort = "N/A" # Default if column not found or index out of bounds
-
-            sort_value = self.get_sort_value(value_to_sort, col)
-            l.append((sort_value, k))
-
-        l.sort(key=lambda x: x[0], reverse=(sort_order == "desc"))
-
-        for index, (val, k) in enumerate(l):
-            tree_widget.move(k, '', index)
+        model, view = self.tables[table_type]
+        columns = tree_widget["columns"]
+        model.set_sort(col, sort_order == "desc")
+        view.render_model(model)
 
         # Update heading text to show sort order
         display_text = col
         if col in ["Bid Price", "Ask Price"] or "Bid" in col or "Ask" in col:
             display_text += " (High)" if sort_order == "desc" else " (Low)"
-        elif col in ["Scrape Duration (ms)", "Avg Scrape (ms)"]:
+        elif col.endswith("(ms)"):
             display_text += " (Fastest)" if sort_order == "asc" else " (Slowest)"
-        elif "Spread" in col:
+        elif "Spread" in col or "Profit" in col:
             display_text += " (High)" if sort_order == "desc" else " (Low)"
-        elif col.startswith("Crypto"): # Now 'Crypto (Buy)' or 'Crypto (Sell)'
+        elif col.startswith("Crypto"):
             display_text += " (Z-A)" if sort_order == "desc" else " (A-Z)"
         
-        # Reset all headings first
-        for c in tree_widget["columns"]:
-            tree_widget.heading(c, text=c)
-        # Then set the active column's heading
-        tree_widget.heading(col, text=display_text)
+        # Only the active column's heading carries the sort order
+        view.set_headings({c: display_text if c == col else c for c in columns})
 
 
     def sort_column(self, col, tree_widget, table_type):
@@ -836,37 +487,33 @@ class CryptoPriceApp:
         # Update the correct current sort column based on which tree_widget was clicked
         if table_type == "main_table":
             self.current_main_sort_col = col
-        elif table_type == "spreads_table_buy_sell":
-            self.current_spreads_sort_col_buy_sell = col
-        elif table_type == "spreads_table_sell_buy":
-            self.current_spreads_sort_col_sell_buy = col
+        elif table_type == "spreads_table_best":
+            self.current_spreads_sort_col_best = col
+        elif table_type == "spreads_table_pairs":
+            self.current_spreads_sort_col_pairs = col
+        elif table_type == "latency_table":
+            self.current_latency_sort_col = col
+        elif table_type == "staleness_table":
+            self.current_staleness_sort_col = col
+        elif table_type == "triangular_table":
+            self.current_triangular_sort_col = col
 
         self._apply_sort(col, tree_widget, table_type, new_sort_order)
 
 
     def _add_exchange_row_to_tree(self, exchange_id, ex_type, symbol):
         """Helper to add a new row to the Treeview."""
-        if exchange_id not in self.exchange_rows:
+        if exchange_id not in self.main_table_model:
             display_name = f"{exchange_id.capitalize()} ({ex_type.upper()})"
-            item_id = self.tree.insert("", "end", iid=exchange_id, values=(display_name, symbol, "N/A", "N/A", "N/A", "N/A"))
-            self.exchange_rows[exchange_id] = item_id
-            self.exchange_scrape_stats[exchange_id] = {'total_duration': 0, 'count': 0, 'average': 0}
+            self.main_table_model.set_row(exchange_id, (display_name, symbol, "N/A", "N/A", "N/A", "N/A"),
+                                          (display_name, symbol, None, None, None, None))
+            self.core.scrape_stats[exchange_id] = {'total_duration': 0, 'count': 0, 'average': 0}
 
 
     def _remove_exchange_row_from_tree(self, exchange_id):
-        """Helper to remove a row from the Treeview."""
-        if exchange_id in self.exchange_rows:
-            self.tree.delete(self.exchange_rows[exchange_id])
-            del self.exchange_rows[exchange_id]
-            if exchange_id in self.exchange_scrape_stats:
-                del self.exchange_scrape_stats[exchange_id]
-            # Also clean up from latest_prices and previous_prices for all cryptos
-            for crypto_prices in self.latest_prices.values():
-                if exchange_id in crypto_prices:
-                    del crypto_prices[exchange_id]
-            for crypto_prices in self.previous_prices.values():
-                if exchange_id in crypto_prices:
-                    del crypto_prices[exchange_id]
+        """Helper to remove a row from the Treeview. Its prices are dropped by ArbitrageCore.process_message."""
+        if exchange_id in self.main_table_model:
+            self.main_table_model.remove_row(exchange_id)
 
 
     def toggle_spreads_view(self):
@@ -892,16 +539,12 @@ class CryptoPriceApp:
 
     def update_spreads_table(self):
         """
-        Updates the spreads table with calculated spreads between selected exchanges.
-        This now dynamically handles any two selected exchanges, showing two types of spreads.
+        Updates the spreads tables from the opportunity tracker: the top SPREADS_TOP_K
+        cryptos by best buy/sell exchange pair across all selected exchanges, and every
+        exchange pair for the currently displayed crypto. Skipped when no quote changed
+        a best opportunity and the displayed crypto is the same.
         """
-        # Clear existing entries for both tables
-        for item in self.spreads_tree_buy_sell.get_children():
-            self.spreads_tree_buy_sell.delete(item)
-        for item in self.spreads_tree_sell_buy.get_children():
-            self.spreads_tree_sell_buy.delete(item)
-
-        if len(self.selected_exchange_ids) < 2:
+        if len(self.core.selected_exchange_ids) < 2:
             # If less than two exchanges are selected, show a message and switch back to main table
             self.status_label.config(text="Select at least two exchanges to view spreads.")
             # Switch back to Live Prices tab if currently on Spreads tab
@@ -910,284 +553,276 @@ class CryptoPriceApp:
                 self.view_spreads_button.config(text="View Spreads")
             return
 
-        # Use the first two selected exchanges for spread calculation
-        ex_id1 = self.selected_exchange_ids[0]
-        ex_id2 = self.selected_exchange_ids[1]
-
-        # Get display names for the selected exchanges
-        ex_name1 = next((ex['name'] for ex in all_available_exchanges if ex['id'] == ex_id1), ex_id1.capitalize())
-        ex_name2 = next((ex['name'] for ex in all_available_exchanges if ex['id'] == ex_id2), ex_id2.capitalize())
+        current_crypto = self.current_crypto_base.get()
+        depth_version = self.core.depth_tracker.version if self.core.depth_tracker is not None else None
+        state = (self.core.spread_tracker.version, depth_version, current_crypto)
+        if state == self.rendered_spreads_state:
+            return
+        self.rendered_spreads_state = state
+
+        # Spreads are (sell bid - buy ask) / buy ask, net spreads the same after the fee of each
+        # leg (see fees.py); the tracker keeps them ordered by net spread.
+        # Rows are keyed by crypto so unchanged rows are left untouched in the Treeview.
+        rows_best = []
+        for opportunity in self.core.spread_tracker.top():
+            symbol_display = self.core.latest_prices.get(opportunity.crypto, {}).get(opportunity.buy_exchange, {}).get('symbol', f"{opportunity.crypto}/?")
+            buy_name = self._exchange_display_name(opportunity.buy_exchange)
+            sell_name = self._exchange_display_name(opportunity.sell_exchange)
+            values = (
+                symbol_display,
+                buy_name,
+                f"${opportunity.buy_ask:.6f}",
+                sell_name,
+                f"${opportunity.sell_bid:.6f}",
+                f"{opportunity.spread_pct:.2f} %",
+                f"{opportunity.net_spread_pct:.2f} %"
+            )
+            sort_values = (symbol_display, buy_name, opportunity.buy_ask, sell_name, opportunity.sell_bid, opportunity.spread_pct,
+                           opportunity.net_spread_pct)
+            if self.core.depth_tracker is not None:
+                executable = self.core.depth_tracker.get(opportunity.crypto)
+                if executable is None: # No order books yet, or the books don't cross
+                    values += ("", "")
+                    sort_values += (None, None)
+                else:
+                    values += (f"{executable.spread_pct:.2f} %", f"${executable.notional:,.2f}")
+                    sort_values += (executable.spread_pct, executable.notional)
+            rows_best.append((opportunity.crypto, values, sort_values, ()))
+
+        # Full pairwise matrix only for the crypto shown on the Live Prices tab
+        self.spreads_frame_pairs.config(text=f"All Exchange Pairs: {current_crypto}")
+        rows_pairs = []
+        for opportunity in self.core.spread_tracker.matrix.pair_opportunities(current_crypto):
+            buy_name = self._exchange_display_name(opportunity.buy_exchange)
+            sell_name = self._exchange_display_name(opportunity.sell_exchange)
+            rows_pairs.append((f"{opportunity.buy_exchange}>{opportunity.sell_exchange}", (
+                buy_name,
+                f"${opportunity.buy_ask:.6f}",
+                sell_name,
+                f"${opportunity.sell_bid:.6f}",
+                f"{opportunity.spread_pct:.2f} %",
+                f"{opportunity.net_spread_pct:.2f} %"
+            ), (buy_name, opportunity.buy_ask, sell_name, opportunity.sell_bid, opportunity.spread_pct,
+                opportunity.net_spread_pct), ()))
+
+        # Only rows whose sort value changed are re-ranked
+        self.spreads_model_best.replace_rows(rows_best)
+        self.spreads_model_pairs.replace_rows(rows_pairs)
 
-        # Define columns for the first spreads table (Buy on Ex1, Sell on Ex2)
-        columns_buy_sell = (
-            "Crypto (Buy)", 
-            f"{ex_name1} Bid (Buy)", 
-            f"{ex_name2} Ask (Sell)", 
-            f"Spread ({ex_name2} Ask - {ex_name1} Bid) (%)"
-        )
-        self.spreads_tree_buy_sell["columns"] = columns_buy_sell
-        for col in columns_buy_sell:
-            self.spreads_tree_buy_sell.heading(col, text=col, anchor=tk.W)
-            if "Spread" in col:
-                self.spreads_tree_buy_sell.column(col, width=200, anchor=tk.E)
-            elif "Bid" in col or "Ask" in col:
-                self.spreads_tree_buy_sell.column(col, width=150, anchor=tk.E)
-            elif col.startswith("Crypto"):
-                self.spreads_tree_buy_sell.column(col, width=100, anchor=tk.W)
-            else:
-                self.spreads_tree_buy_sell.column(col, width=100, anchor=tk.W)
-            self.spreads_tree_buy_sell.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_buy_sell, "spreads_table_buy_sell"))
-
-        # Define columns for the second spreads table (Buy on Ex2, Sell on Ex1)
-        columns_sell_buy = (
-            "Crypto (Sell)", 
-            f"{ex_name2} Bid (Buy)", 
-            f"{ex_name1} Ask (Sell)", 
-            f"Spread ({ex_name1} Ask - {ex_name2} Bid) (%)"
-        )
-        self.spreads_tree_sell_buy["columns"] = columns_sell_buy
-        for col in columns_sell_buy:
-            self.spreads_tree_sell_buy.heading(col, text=col, anchor=tk.W)
-            if "Spread" in col:
-                self.spreads_tree_sell_buy.column(col, width=200, anchor=tk.E)
-            elif "Bid" in col or "Ask" in col:
-                self.spreads_tree_sell_buy.column(col, width=150, anchor=tk.E)
-            elif col.startswith("Crypto"):
-                self.spreads_tree_sell_buy.column(col, width=100, anchor=tk.W)
-            else:
-                self.spreads_tree_sell_buy.column(col, width=100, anchor=tk.W)
-            self.spreads_tree_sell_buy.heading(col, command=lambda c=col: self.sort_column(c, self.spreads_tree_sell_buy, "spreads_table_sell_buy"))
-        
-        spread_data_to_display = []
-
-        for crypto_base in self.filtered_supported_cryptos: # 'crypto_base' refers to BTC, ETH etc.
-            ex1_prices = self.latest_prices.get(crypto_base, {}).get(ex_id1)
-            ex2_prices = self.latest_prices.get(crypto_base, {}).get(ex_id2)
-
-            # Only proceed if both exchanges have data for the crypto
-            if ex1_prices and ex2_prices:
-                ex1_bid = ex1_prices.get('bid')
-                ex1_ask = ex1_prices.get('ask')
-                ex2_bid = ex2_prices.get('bid')
-                ex2_ask = ex2_prices.get('ask')
-                
-                # Get the symbol for the crypto from one of the exchanges (assuming consistent symbols)
-                symbol_display = ex1_prices.get('symbol', f"{crypto_base}/?") 
-
-                # Only proceed if all required prices are available (not None)
-                if all(p is not None for p in [ex1_bid, ex1_ask, ex2_bid, ex2_ask]):
-                    spread1_percentage = "N/A"
-                    spread2_percentage = "N/A"
-                    
-                    # Calculate Spread 1: (Ex2 Ask - Ex1 Bid) / Ex1 Bid
-                    # This represents buying on Ex1 (at its bid) and selling on Ex2 (at its ask)
-                    if ex1_bid > 0: # Ensure no division by zero
-                        spread1_percentage = ((ex2_ask - ex1_bid) / ex1_bid) * 100
-                    
-                    # Calculate Spread 2: (Ex1 Ask - Ex2 Bid) / Ex2 Bid
-                    # This represents buying on Ex2 (at its bid) and selling on Ex1 (at its ask)
-                    if ex2_bid > 0: # Ensure no division by zero
-                        spread2_percentage = ((ex1_ask - ex2_bid) / ex2_bid) * 100
-                        
-                    spread_data_to_display.append({
-                        'crypto_base': crypto_base, # Keep original crypto base for internal use
-                        'symbol_display': symbol_display, # This is the new 'Crypto' column content
-                        'ex1_bid': ex1_bid,
-                        'ex1_ask': ex1_ask,
-                        'spread1': spread1_percentage,
-                        'ex2_bid': ex2_bid,
-                        'ex2_ask': ex2_ask,
-                        'spread2': spread2_percentage
-                    })
-
-        # Apply sorting to the spread data before inserting into the treeview
-        # Sort for Buy on Ex1, Sell on Ex2 table
-        sort_col_buy_sell = self.current_spreads_sort_col_buy_sell
-        sort_order_buy_sell = self.sort_orders["spreads_table_buy_sell"].get(sort_col_buy_sell, "asc") 
-
-        def get_spread_sort_key_buy_sell(item):
-            if sort_col_buy_sell == "Crypto (Buy)":
-                return item['symbol_display']
-            elif sort_col_buy_sell == f"{ex_name1} Bid (Buy)":
-                return item['ex1_bid'] if item['ex1_bid'] is not None else float('-inf')
-            elif sort_col_buy_sell == f"{ex_name2} Ask (Sell)":
-                return item['ex2_ask'] if item['ex2_ask'] is not None else float('-inf')
-            elif sort_col_buy_sell == f"Spread ({ex_name2} Ask - {ex_name1} Bid) (%)":
-                return item['spread1'] if item['spread1'] != "N/A" else float('-inf')
-            return 0
-
-        spread_data_to_display_copy1 = list(spread_data_to_display) # Create a copy for independent sorting
-        spread_data_to_display_copy1.sort(key=get_spread_sort_key_buy_sell, reverse=(sort_order_buy_sell == "desc"))
-
-        for item in spread_data_to_display_copy1:
-            self.spreads_tree_buy_sell.insert("", "end", values=(
-                item['symbol_display'], # First 'Crypto (Buy)' column content
-                f"${item['ex1_bid']:.6f}" if item['ex1_bid'] is not None else "N/A", # Ex1 Bid
-                f"${item['ex2_ask']:.6f}" if item['ex2_ask'] is not None else "N/A", # Ex2 Ask
-                f"{item['spread1']:.2f} %" if item['spread1'] != "N/A" else "N/A"
-            ))
-
-        # Sort for Buy on Ex2, Sell on Ex1 table
-        sort_col_sell_buy = self.current_spreads_sort_col_sell_buy
-        sort_order_sell_buy = self.sort_orders["spreads_table_sell_buy"].get(sort_col_sell_buy, "asc") 
-
-        def get_spread_sort_key_sell_buy(item):
-            if sort_col_sell_buy == "Crypto (Sell)":
-                return item['symbol_display']
-            elif sort_col_sell_buy == f"{ex_name2} Bid (Buy)":
-                return item['ex2_bid'] if item['ex2_bid'] is not None else float('-inf')
-            elif sort_col_sell_buy == f"{ex_name1} Ask (Sell)":
-                return item['ex1_ask'] if item['ex1_ask'] is not None else float('-inf')
-            elif sort_col_sell_buy == f"Spread ({ex_name1} Ask - {ex_name2} Bid) (%)":
-                return item['spread2'] if item['spread2'] != "N/A" else float('-inf')
-            return 0
-
-        spread_data_to_display_copy2 = list(spread_data_to_display) # Create another copy for independent sorting
-        spread_data_to_display_copy2.sort(key=get_spread_sort_key_sell_buy, reverse=(sort_order_sell_buy == "desc"))
-
-        for item in spread_data_to_display_copy2:
-            self.spreads_tree_sell_buy.insert("", "end", values=(
-                item['symbol_display'], # Second 'Crypto (Sell)' column content
-                f"${item['ex2_bid']:.6f}" if item['ex2_bid'] is not None else "N/A", # Ex2 Bid
-                f"${item['ex1_ask']:.6f}" if item['ex1_ask'] is not None else "N/A", # Ex1 Ask
-                f"{item['spread2']:.2f} %" if item['spread2'] != "N/A" else "N/A"
-            ))
-
-        # Ensure the initial sort is applied after populating.
         self._apply_sort(
-            self.current_spreads_sort_col_buy_sell,
-            self.spreads_tree_buy_sell,
-            "spreads_table_buy_sell",
-            self.sort_orders["spreads_table_buy_sell"][self.current_spreads_sort_col_buy_sell]
+            self.current_spreads_sort_col_best,
+            self.spreads_tree_best,
+            "spreads_table_best",
+            self.sort_orders["spreads_table_best"].get(self.current_spreads_sort_col_best, "asc")
         )
         self._apply_sort(
-            self.current_spreads_sort_col_sell_buy,
-            self.spreads_tree_sell_buy,
-            "spreads_table_sell_buy",
-            self.sort_orders["spreads_table_sell_buy"][self.current_spreads_sort_col_sell_buy]
+            self.current_spreads_sort_col_pairs,
+            self.spreads_tree_pairs,
+            "spreads_table_pairs",
+            self.sort_orders["spreads_table_pairs"].get(self.current_spreads_sort_col_pairs, "asc")
         )
 
 
+    def update_latency_tables(self):
+        """
+        Updates the latency tab from the core's histograms: p50/p90/p99/max request latency
+        per exchange and endpoint, and how old quotes were when they arrived. Skipped
+        when nothing was recorded since the last update.
+        """
+        if self.core.latency_metrics.version == self.rendered_latency_version:
+            return
+        self.rendered_latency_version = self.core.latency_metrics.version
+
+        def percentile_cells(summary):
+            values = [summary[key] for key in ("p50", "p90", "p99", "max")]
+            return tuple("N/A" if v is None else f"{v:.0f}" for v in values), tuple(values)
+
+        rows_latency, rows_staleness = [], []
+        for exchange_id, metrics in self.core.latency_summary().items():
+            name = self._exchange_display_name(exchange_id)
+            for endpoint, summary in metrics['requests'].items():
+                cells, sort_values = percentile_cells(summary)
+                rows_latency.append((f"{exchange_id}:{endpoint}", (name, endpoint, summary['count']) + cells,
+                                     (name, endpoint, summary['count']) + sort_values, ()))
+            if metrics['staleness'] is not None:
+                cells, sort_values = percentile_cells(metrics['staleness'])
+                count = metrics['staleness']['count']
+                rows_staleness.append((exchange_id, (name, count) + cells, (name, count) + sort_values, ()))
+
+        self.latency_model.replace_rows(rows_latency)
+        self.staleness_model.replace_rows(rows_staleness)
+        self._apply_sort(self.current_latency_sort_col, self.latency_tree, "latency_table",
+                         self.sort_orders["latency_table"].get(self.current_latency_sort_col, "asc"))
+        self._apply_sort(self.current_staleness_sort_col, self.staleness_tree, "staleness_table",
+                         self.sort_orders["staleness_table"].get(self.current_staleness_sort_col, "asc"))
+
+
+    def update_triangular_table(self):
+        """Updates the triangular tab with the latest cycles of every exchange; skipped when they didn't change."""
+        tracker = self.core.triangular_tracker
+        if tracker is None or tracker.version == self.rendered_triangular_version:
+            return
+        self.rendered_triangular_version = tracker.version
+
+        rows = []
+        for cycle in tracker.top():
+            name = self._exchange_display_name(cycle.exchange)
+            path = " > ".join(cycle.currencies + cycle.currencies[:1])
+            legs = ", ".join(f"{side} {symbol} @ {price:.8g}" for side, symbol, price in zip(cycle.sides, cycle.symbols, cycle.prices))
+            rows.append((f"{cycle.exchange}:{'|'.join(cycle.symbols)}:{cycle.currencies[0]}",
+                         (name, path, legs, f"{cycle.profit_pct:.3f} %"), (name, path, legs, cycle.profit_pct), ()))
+        self.triangular_model.replace_rows(rows)
+        self._apply_sort(self.current_triangular_sort_col, self.triangular_tree, "triangular_table",
+                         self.sort_orders["triangular_table"].get(self.current_triangular_sort_col, "asc"))
+
+
+    def _exchange_display_name(self, exchange_id):
+        return next((ex['name'] for ex in all_available_exchanges if ex['id'] == exchange_id), exchange_id.capitalize())
+
+
+    def _update_main_table_row(self, exchange_id, base_crypto, symbol, bid_price, ask_price, duration, error_code, previous_bid_price):
+        """Updates the main table row of `exchange_id` with its latest quote for the displayed crypto."""
+        current_avg_scrape = self.core.scrape_stats[exchange_id]['average'] if exchange_id in self.core.scrape_stats else 0
+        
+        ex_type = self.core.exchange_manager.active_exchanges.get(exchange_id, {}).get('type', '')
+        display_name = f"{exchange_id.capitalize()} ({ex_type.upper()})"
+
+        tags = ()
+        if bid_price is not None and previous_bid_price is not None:
+            if bid_price > previous_bid_price:
+                tags = ("rising",)
+            elif bid_price < previous_bid_price:
+                tags = ("falling",)
+            else:
+                tags = ("no_change",)
+        elif previous_bid_price is not None and bid_price is None:
+            tags = ("falling",)
+        elif previous_bid_price is None and bid_price is not None:
+            tags = ("rising",)
+
+        formatted_bid_price = "N/A"
+        formatted_ask_price = "N/A"
+
+        if bid_price is not None:
+            if bid_price < 1:
+                formatted_bid_price = f"${bid_price:,.5f}" 
+            elif bid_price < 10:
+                formatted_bid_price = f"${bid_price:,.4f}"
+            elif bid_price < 100:
+                formatted_bid_price = f"${bid_price:,.3f}"
+            else:
+                formatted_bid_price = f"${bid_price:,.2f}"
+        
+        if ask_price is not None:
+            if ask_price < 1:
+                formatted_ask_price = f"${ask_price:,.5f}" 
+            elif ask_price < 10:
+                formatted_ask_price = f"${ask_price:,.4f}"
+            elif ask_price < 100:
+                formatted_ask_price = f"${ask_price:,.3f}"
+            else:
+                formatted_ask_price = f"${ask_price:,.2f}"
+
+        avg_scrape_sort_value = current_avg_scrape if current_avg_scrape > 0 else None
+
+        if bid_price is not None or ask_price is not None:
+            self.main_table_model.set_row(exchange_id, (
+                display_name,
+                symbol,
+                formatted_bid_price,
+                formatted_ask_price,
+                f"{duration:.2f}" if duration is not None else "N/A",
+                f"{current_avg_scrape:.2f}" if current_avg_scrape > 0 else "N/A"
+            ), (display_name, symbol, bid_price, ask_price, duration, avg_scrape_sort_value), tags)
+        else:
+            # Display "N/A" if the error specifically indicates no suitable market,
+            # "Expired" for a quote dropped after its TTL, otherwise "Failed to fetch".
+            if error_code == PRICE_NO_MARKET:
+                display_status = "N/A"
+            elif error_code == PRICE_EXPIRED:
+                display_status = "Expired"
+            else:
+                display_status = "Failed to fetch"
+            display_symbol = symbol if symbol else f"{base_crypto}/?"
+            self.main_table_model.set_row(exchange_id, (
+                display_name,
+                display_symbol,
+                display_status,
+                display_status,
+                "N/A",
+                f"{current_avg_scrape:.2f}" if current_avg_scrape > 0 else "N/A"
+            ), (display_name, display_symbol, None, None, None, avg_scrape_sort_value),
+            ("falling",)) # Use falling tag for any non-successful fetch
+
     def update_prices_gui(self):
         """
         Checks the queue for new data and updates the GUI.
         This method is called periodically via master.after().
         """
+        tick_start = time.perf_counter()
+        drained = 0
         total_durations_this_cycle = []
+        updated = False
         try:
             while True:
-                item = self.data_queue.get_nowait()
+                item = self.core.data_queue.get_nowait()
+                drained += 1
                 
-                if item['type'] == 'price_update':
+                if item['type'] == 'price_batch':
                     exchange_id = item['id']
-                    bid_price = item['bid_price']
-                    ask_price = item['ask_price']
-                    symbol = item['symbol']
-                    duration = item['duration']
-                    base_crypto = item['base_crypto']
-                    error_message = item['error'] # Get the error message from the item
-
-                    # Update latest prices for spread calculation (for all cryptos)
-                    # Store the symbol along with bid/ask prices
-                    self.latest_prices[base_crypto][exchange_id] = {'bid': bid_price, 'ask': ask_price, 'symbol': symbol}
-
-                    # Get previous price for highlighting (using bid price for comparison)
-                    previous_bid_price = self.previous_prices[base_crypto].get(exchange_id)
-                    
-                    if duration is not None:
-                        total_durations_this_cycle.append(duration)
-                        if exchange_id in self.exchange_scrape_stats:
-                            self.exchange_scrape_stats[exchange_id]['total_duration'] += duration
-                            self.exchange_scrape_stats[exchange_id]['count'] += 1
-                            if self.exchange_scrape_stats[exchange_id]['count'] > 0:
-                                self.exchange_scrape_stats[exchange_id]['average'] = \
-                                    self.exchange_scrape_stats[exchange_id]['total_duration'] / \
-                                    self.exchange_scrape_stats[exchange_id]['count']
-                    
-                    # Only update the main table if the price update is for the currently selected crypto
-                    if base_crypto == self.current_crypto_base.get() and exchange_id in self.exchange_rows:
-                        item_id = self.exchange_rows[exchange_id]
-                        current_avg_scrape = self.exchange_scrape_stats[exchange_id]['average'] if exchange_id in self.exchange_scrape_stats else 0
-                        
-                        ex_type = self.exchange_manager.active_exchanges.get(exchange_id, {}).get('type', '')
-                        display_name = f"{exchange_id.capitalize()} ({ex_type.upper()})"
-
-                        tags = ()
-                        if bid_price is not None and previous_bid_price is not None:
-                            if bid_price > previous_bid_price:
-                                tags = ("rising",)
-                            elif bid_price < previous_bid_price:
-                                tags = ("falling",)
-                            else:
-                                tags = ("no_change",)
-                        elif previous_bid_price is not None and bid_price is None:
-                            tags = ("falling",)
-                        elif previous_bid_price is None and bid_price is not None:
-                            tags = ("rising",)
-
-                        formatted_bid_price = "N/A"
-                        formatted_ask_price = "N/A"
-
-                        if bid_price is not None:
-                            if bid_price < 1:
-                                formatted_bid_price = f"${bid_price:,.5f}" 
-                            elif bid_price < 10:
-                                formatted_bid_price = f"${bid_price:,.4f}"
-                            elif bid_price < 100:
-                                formatted_bid_price = f"${bid_price:,.3f}"
-                            else:
-                                formatted_bid_price = f"${bid_price:,.2f}"
-                        
-                        if ask_price is not None:
-                            if ask_price < 1:
-                                formatted_ask_price = f"${ask_price:,.5f}" 
-                            elif ask_price < 10:
-                                formatted_ask_price = f"${ask_price:,.4f}"
-                            elif ask_price < 100:
-                                formatted_ask_price = f"${ask_price:,.3f}"
-                            else:
-                                formatted_ask_price = f"${ask_price:,.2f}"
-
-                        if bid_price is not None or ask_price is not None:
-                            self.tree.item(item_id, values=(
-                                display_name,
-                                symbol,
-                                formatted_bid_price,
-                                formatted_ask_price,
-                                f"{duration:.2f}" if duration is not None else "N/A",
-                                f"{current_avg_scrape:.2f}" if current_avg_scrape > 0 else "N/A"
-                            ), tags=tags)
-                        else:
-                            # Display "N/A" if the error specifically indicates no suitable market,
-                            # otherwise display "Failed to fetch" for other errors.
-                            display_status = "N/A" if error_message == 'No suitable market found' else "Failed to fetch"
-                            self.tree.item(item_id, values=(
-                                display_name,
-                                symbol if symbol else f"{base_crypto}/?",
-                                display_status,
-                                display_status,
-                                "N/A",
-                                f"{current_avg_scrape:.2f}" if current_avg_scrape > 0 else "N/A"
-                            ), tags=("falling",)) # Use falling tag for any non-successful fetch
-
-                    self.previous_prices[base_crypto][exchange_id] = bid_price
+
+                    # Get previous price of the displayed crypto for highlighting, before the batch replaces it
+                    current_crypto = self.current_crypto_base.get()
+                    previous_bid_price = self.core.previous_prices[current_crypto].get(exchange_id)
+
+                    # Update latest prices, scrape stats and spreads (for all cryptos) in one step
+                    total_durations_this_cycle.extend(self.core.process_message(item))
+
+                    # Only update the main table if the batch contains the currently selected crypto
+                    if exchange_id in self.main_table_model and current_crypto in item['base_cryptos']:
+                        i = item['base_cryptos'].index(current_crypto)
+                        self._update_main_table_row(
+                            exchange_id, current_crypto, item['symbols'][i], item['bids'][i], item['asks'][i],
+                            item['durations'][i], item['errors'][i], previous_bid_price
+                        )
                 
                 elif item['type'] == 'add_exchange_row':
                     # This is called when an exchange thread starts.
                     # Only add a row if the currently selected crypto is being displayed.
-                    if item['id'] in self.selected_exchange_ids and self.current_crypto_base.get() != 'N/A':
+                    if item['id'] in self.core.selected_exchange_ids and self.current_crypto_base.get() != 'N/A':
                         symbol_for_display = f"{self.current_crypto_base.get()}/USDT"
                         self._add_exchange_row_to_tree(item['id'], item['ex_type'], symbol_for_display)
                 
                 elif item['type'] == 'remove_exchange_row':
+                    self.core.process_message(item)
                     self._remove_exchange_row_from_tree(item['id'])
-                
-                current_time = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')
-                self.status_label.config(text=f"Last GUI update: {current_time}")
+
+                elif item['type'] == 'order_book': # Depth mode; shown on the spreads tab
+                    self.core.process_message(item)
+
+                elif item['type'] in ('market_fees', 'fetch_pace'): # Sent once per exchange when its markets are loaded
+                    self.core.process_message(item)
+
+                elif item['type'] == 'triangular': # Triangular mode; shown on the triangular tab
+                    self.core.process_message(item)
+
+                elif item['type'] == 'expire_quotes': # Quotes older than their exchange's TTL
+                    self.core.process_message(item)
+                    current_crypto = self.current_crypto_base.get()
+                    for base_crypto, exchange_id, _ in item['quotes']:
+                        if (base_crypto == current_crypto and exchange_id in self.main_table_model
+                                and exchange_id not in self.core.latest_prices.get(current_crypto, {})):
+                            self._update_main_table_row(exchange_id, current_crypto, None, None, None,
+                                                        None, PRICE_EXPIRED, None)
+                updated = True
 
         except queue.Empty:
             pass
 
+        if updated:
+            current_time = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')
+            self.status_label.config(text=f"Last GUI update: {current_time}")
+
         if total_durations_this_cycle:
             avg_scrape_time_overall = sum(total_durations_this_cycle) / len(total_durations_this_cycle)
             self.avg_total_scrape_time_label.config(text=f"Avg scrape time (all exchanges, last cycle): {avg_scrape_time_overall:.2f} ms")
@@ -1204,20 +839,13 @@ class CryptoPriceApp:
                 self.sort_orders["main_table"][self.current_main_sort_col]
             )
         elif current_tab_text == "Arbitrage Spreads":
-            # Apply sorting to both spreads tables independently
-            self.update_spreads_table() 
-            self._apply_sort(
-                self.current_spreads_sort_col_buy_sell,
-                self.spreads_tree_buy_sell,
-                "spreads_table_buy_sell",
-                self.sort_orders["spreads_table_buy_sell"][self.current_spreads_sort_col_buy_sell]
-            )
-            self._apply_sort(
-                self.current_spreads_sort_col_sell_buy,
-                self.spreads_tree_sell_buy,
-                "spreads_table_sell_buy",
-                self.sort_orders["spreads_table_sell_buy"][self.current_spreads_sort_col_sell_buy]
-            )
+            self.update_spreads_table() # Rebuilds and sorts both spreads tables
+        elif current_tab_text == "Latency":
+            self.update_latency_tables()
+        elif current_tab_text == "Triangular":
+            self.update_triangular_table()
+
+        self.core.pipeline_metrics.observe_tick(time.perf_counter() - tick_start, drained)
 
         self.master.after(200, self.update_prices_gui)
 
@@ -1225,7 +853,7 @@ class CryptoPriceApp:
         """
         Handles the window closing event to stop all background threads.
         """
-        self.exchange_manager.stop_all()
+        self.core.stop()
         self.master.destroy()
 
 # --- Main Application Entry Point ---
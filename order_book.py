@@ -0,0 +1,177 @@
+import collections
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+DEPTH_LEVELS = 20 # Order book levels fetched per side
+DEPTH_SPREAD_THRESHOLD_PCT = 0.5 # Top-of-book net spread (%, after fees) from which a crypto's books are fetched
+DEPTH_MAX_CANDIDATES = 10 # At most this many cryptos (the widest spreads) have their books fetched
+DEPTH_REFRESH_SECONDS = 5.0 # Minimum seconds between two fetches of the same book
+DEPTH_MAX_BOOK_AGE = 3 * DEPTH_REFRESH_SECONDS # Older books are ignored in executable spreads
+
+# Best executable opportunity of a crypto from its order books, net of the fee of both
+# legs. Sizes are in the base currency, the VWAPs are quoted prices, `notional` and
+# `profit` are in the quote currency (cost of the buy leg and revenue minus cost at the
+# maximum profitable size, fees included); `spread_pct` is profit / notional.
+ExecutableSpread = collections.namedtuple('ExecutableSpread', [
+    'crypto', 'buy_exchange', 'buy_vwap', 'sell_exchange', 'sell_vwap',
+    'spread_pct', 'max_size', 'notional', 'profit',
+])
+
+
+def book_side(levels, depth=DEPTH_LEVELS):
+    """Converts ccxt order book levels ([[price, amount, ...], ...], best first) to an (n, 2) float array."""
+    side = np.array([level[:2] for level in levels[:depth]], dtype=float).reshape(-1, 2)
+    return side[side[:, 1] > 0]
+
+
+def max_profitable_fill(asks, bids, buy_factor=1.0, sell_factor=1.0):
+    """
+    Walks the buy side's asks against the sell side's bids (both (n, 2) arrays of
+    [price, amount], best first) and returns (size, cost, revenue) of the largest
+    fill where every unit is bought below the price it is sold at, or None if even
+    the best levels don't cross. Prices are taken net of fees: buying at an ask costs
+    ask * buy_factor, selling at a bid yields bid * sell_factor (see
+    spread_engine.SpreadMatrix), and so do the returned cost and revenue. Both books
+    are split at every level boundary of either side; each segment is profitable iff
+    its net bid level is above its net ask level.
+    """
+    if len(asks) == 0 or len(bids) == 0 or bids[0, 0] * sell_factor <= asks[0, 0] * buy_factor:
+        return None
+    ask_cum = np.cumsum(asks[:, 1])
+    bid_cum = np.cumsum(bids[:, 1])
+    ends = np.union1d(ask_cum, bid_cum)
+    ends = ends[ends <= min(ask_cum[-1], bid_cum[-1])]
+    starts = np.concatenate(([0.0], ends[:-1]))
+    ask_prices = asks[np.searchsorted(ask_cum, starts, side='right'), 0] * buy_factor
+    bid_prices = bids[np.searchsorted(bid_cum, starts, side='right'), 0] * sell_factor
+    profitable = bid_prices > ask_prices
+    n = len(profitable) if profitable.all() else int(np.argmin(profitable)) # Segments up to the first loss
+    lengths = ends[:n] - starts[:n]
+    return float(ends[n - 1]), float(lengths @ ask_prices[:n]), float(lengths @ bid_prices[:n])
+
+
+class DepthTracker:
+    """
+    Optional depth mode: order books of the cryptos whose top-of-book net spread crosses
+    `threshold_pct`, and their VWAP-based executable spreads.
+
+    ArbitrageCore calls update_candidates() after every price batch and
+    apply_order_book() for every 'order_book' message, and passes on the fee rates it
+    gives the spread engine (set_exchange_fee, set_fees), so the books are walked net of
+    the same fees the candidates were picked by. The fetchers call due(exchange_id)
+    each cycle to learn which books to fetch; only the buy and sell exchange of the
+    `max_candidates` widest spreads are asked, each book at most every `refresh` seconds,
+    so the extra request volume stays bounded.
+    """
+    def __init__(self, threshold_pct=DEPTH_SPREAD_THRESHOLD_PCT, max_candidates=DEPTH_MAX_CANDIDATES,
+                 levels=DEPTH_LEVELS, refresh=DEPTH_REFRESH_SECONDS, max_book_age=DEPTH_MAX_BOOK_AGE, clock=time.monotonic):
+        self.threshold_pct = threshold_pct
+        self.max_candidates = max_candidates
+        self.levels = levels
+        self.refresh = refresh
+        self.max_book_age = max_book_age
+        self.clock = clock
+        self.candidates = {} # {exchange_id: frozenset of cryptos}, replaced as a whole (read by fetcher threads)
+        self.last_request = {} # {(exchange_id, crypto): clock time}, written by the fetcher of that exchange
+        self.books = {} # {crypto: {exchange_id: (received clock time, bids, asks)}}
+        self.executable = {} # {crypto: ExecutableSpread}
+        self.exchange_fees = {} # {exchange_id: fee rate per leg until its market fees are known}
+        self.fees = {} # {(exchange_id, crypto): fee rate per leg}
+        self.version = 0 # Bumped whenever an executable spread changes
+
+    def clear(self):
+        self.candidates = {}
+        self.last_request.clear()
+        self.books.clear()
+        self.executable.clear()
+        self.exchange_fees.clear()
+        self.fees.clear()
+        self.version += 1
+
+    def fee(self, exchange_id, crypto):
+        return self.fees.get((exchange_id, crypto), self.exchange_fees.get(exchange_id, 0.0))
+
+    def set_exchange_fee(self, exchange_id, fee):
+        """Sets the fee rate of an exchange's markets without a market fee of their own."""
+        self.exchange_fees[exchange_id] = fee
+        for crypto, books in list(self.books.items()):
+            if exchange_id in books:
+                self._recompute(crypto)
+
+    def set_fees(self, exchange_id, base_cryptos, fees):
+        """Sets the fee rate of the markets of `base_cryptos` on an exchange (parallel lists)."""
+        for crypto, fee in zip(base_cryptos, fees):
+            if self.fees.get((exchange_id, crypto)) == fee:
+                continue
+            self.fees[(exchange_id, crypto)] = fee
+            if exchange_id in self.books.get(crypto, {}):
+                self._recompute(crypto)
+
+    def update_candidates(self, spread_tracker):
+        """Picks the cryptos (and their buy/sell exchanges) whose top-of-book net spread crosses the threshold."""
+        candidates = collections.defaultdict(set)
+        for opportunity in spread_tracker.top(self.max_candidates):
+            if opportunity.net_spread_pct < self.threshold_pct:
+                break
+            candidates[opportunity.buy_exchange].add(opportunity.crypto)
+            candidates[opportunity.sell_exchange].add(opportunity.crypto)
+        candidates = {exchange_id: frozenset(cryptos) for exchange_id, cryptos in candidates.items()}
+        if candidates != self.candidates:
+            self.candidates = candidates
+
+    def due(self, exchange_id):
+        """Candidate cryptos of `exchange_id` whose book should be fetched now; marks them as requested."""
+        now = self.clock()
+        cryptos = []
+        for crypto in self.candidates.get(exchange_id, ()):
+            if now - self.last_request.get((exchange_id, crypto), -self.refresh) >= self.refresh:
+                self.last_request[(exchange_id, crypto)] = now
+                cryptos.append(crypto)
+        return cryptos
+
+    def apply_order_book(self, message):
+        """Stores an 'order_book' message and recomputes the executable spread of its crypto."""
+        crypto = message['base_crypto']
+        self.books.setdefault(crypto, {})[message['id']] = (self.clock(), message['bids'], message['asks'])
+        self._recompute(crypto)
+
+    def clear_exchange(self, exchange_id):
+        for crypto, books in self.books.items():
+            if books.pop(exchange_id, None) is not None:
+                self._recompute(crypto)
+
+    def _recompute(self, crypto):
+        """Best (most profitable, after fees) executable opportunity over every exchange pair with fresh books."""
+        now = self.clock()
+        books = {exchange_id: book for exchange_id, book in self.books.get(crypto, {}).items()
+                 if now - book[0] <= self.max_book_age}
+        best = None
+        for buy_exchange, (_, _, asks) in books.items():
+            for sell_exchange, (_, bids, _) in books.items():
+                if buy_exchange == sell_exchange:
+                    continue
+                buy_factor = 1 + self.fee(buy_exchange, crypto)
+                sell_factor = 1 - self.fee(sell_exchange, crypto)
+                fill = max_profitable_fill(asks, bids, buy_factor, sell_factor)
+                if fill is None:
+                    continue
+                size, cost, revenue = fill
+                if best is None or revenue - cost > best.profit:
+                    best = ExecutableSpread(crypto, buy_exchange, cost / size / buy_factor, sell_exchange,
+                                            revenue / size / sell_factor, (revenue - cost) / cost * 100,
+                                            size, cost, revenue - cost)
+        if self.executable.get(crypto) != best:
+            if best is None:
+                del self.executable[crypto]
+            else:
+                self.executable[crypto] = best
+            self.version += 1
+
+    def get(self, crypto):
+        return self.executable.get(crypto)
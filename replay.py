@@ -0,0 +1,252 @@
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from arbitrage_core import PRICE_OK, SPREADS_TOP_K, ArbitrageCore, all_available_exchanges
+from headless import JsonLinesEmitter
+from tick_recorder import TickReader
+
+logger = logging.getLogger(__name__)
+
+# --- Replay of recorded or synthetic quotes ---
+# Feeds 'price_batch' messages through ArbitrageCore.process_message, the path live
+# fetcher messages take in the GUI and headless.py, and writes the same JSON lines
+# as headless.py. Replay time comes from the messages only, so the output of a
+# replay is deterministic.
+#
+#   python replay.py --ticks ticks/ --no-quotes                         (as fast as possible)
+#   python replay.py --ticks ticks/ --start 2025-01-01T00:00 --end 2025-01-02T00:00 --speed 60
+#   python replay.py --synthetic --hours 24 --num-exchanges 10 --num-cryptos 100 --seed 1 --no-quotes
+
+DEFAULT_EMIT_INTERVAL = 1.0 # Seconds of replay time between spread snapshots
+SYNTHETIC_INTERVAL = 2.0 # Seconds between two synthetic batches of the same exchange
+SYNTHETIC_VOLATILITY = 0.0005 # Std. dev. of the relative mid-price move per batch
+SYNTHETIC_DISPERSION = 0.002 # Std. dev. of an exchange's relative deviation from the common mid
+SYNTHETIC_HALF_SPREAD = 0.0005 # Relative half bid/ask spread on every exchange
+
+
+def replay_message(exchange_id, time_ms, base_cryptos, bids, asks):
+    """A 'price_batch' message (see arbitrage_core.PriceBatch) for replayed quotes received at `time_ms`."""
+    n = len(base_cryptos)
+    return {
+        'type': 'price_batch',
+        'id': exchange_id,
+        'received_at': time_ms,
+        'base_cryptos': base_cryptos,
+        'symbols': [None] * n,
+        'bids': bids,
+        'asks': asks,
+        'timestamps': [time_ms] * n,
+        'durations': [None] * n,
+        'errors': [PRICE_OK] * n,
+        'error': None,
+        'endpoint': None,
+    }
+
+
+def recorded_batches(reader, start_ms=None, end_ms=None, cryptos=None, exchanges=None):
+    """
+    Yields the quotes of a tick recording (TickReader) as 'price_batch' messages in
+    recorded order, one per recorded (time, exchange) batch. Missing bids/asks
+    (NaN in the recording) become None again.
+    """
+    crypto_names = np.array(reader.cryptos, dtype=object)
+    for records in reader.iter_read(start_ms, end_ms, cryptos, exchanges):
+        if len(records) == 0:
+            continue
+        times = records['time_ms']
+        exchange_indexes = records['exchange']
+        breaks = np.flatnonzero((times[1:] != times[:-1]) | (exchange_indexes[1:] != exchange_indexes[:-1])) + 1
+        starts = np.concatenate(([0], breaks)).tolist()
+        ends = np.concatenate((breaks, [len(records)])).tolist()
+        names = crypto_names[records['crypto']].tolist()
+        bids = records['bid'].astype(object)
+        bids[np.isnan(records['bid'])] = None
+        asks = records['ask'].astype(object)
+        asks[np.isnan(records['ask'])] = None
+        bids, asks = bids.tolist(), asks.tolist()
+        for start, end in zip(starts, ends):
+            yield replay_message(reader.exchanges[exchange_indexes[start]], int(times[start]),
+                                 names[start:end], bids[start:end], asks[start:end])
+
+
+def synthetic_batches(exchange_ids, cryptos, start_ms, duration, interval=SYNTHETIC_INTERVAL, seed=0,
+                      volatility=SYNTHETIC_VOLATILITY, dispersion=SYNTHETIC_DISPERSION, half_spread=SYNTHETIC_HALF_SPREAD):
+    """
+    Yields a deterministic synthetic quote stream for `duration` seconds: every
+    exchange publishes all `cryptos` every `interval` seconds (exchanges staggered
+    evenly). Mids follow a common geometric random walk; each exchange deviates from
+    it by a mean-reverting relative offset, which is what creates spreads.
+    """
+    rng = np.random.default_rng(seed)
+    n_exchanges, n_cryptos = len(exchange_ids), len(cryptos)
+    mids = 10 ** rng.uniform(-2, 4, n_cryptos)
+    offsets = rng.normal(0, dispersion, (n_exchanges, n_cryptos))
+    step_volatility = volatility / np.sqrt(n_exchanges) # Per staggered step, so the per-interval move is `volatility`
+    for step in range(int(duration / interval)):
+        for j, exchange_id in enumerate(exchange_ids):
+            mids *= np.exp(rng.normal(0, step_volatility, n_cryptos))
+            offsets[j] = 0.9 * offsets[j] + rng.normal(0, dispersion * np.sqrt(1 - 0.9 ** 2), n_cryptos)
+            exchange_mids = mids * (1 + offsets[j])
+            time_ms = start_ms + int((step + j / n_exchanges) * interval * 1000)
+            yield replay_message(exchange_id, time_ms, cryptos,
+                                 (exchange_mids * (1 - half_spread)).tolist(), (exchange_mids * (1 + half_spread)).tolist())
+
+
+class ReplayEngine:
+    """
+    Drives an ArbitrageCore from a message stream instead of live fetchers. Each
+    message goes through `sink` (default: core.process_message). With `speed` set,
+    replay time runs `speed` times faster than the wall clock; with speed None or 0
+    messages are fed as fast as possible. An optional JsonLinesEmitter gets a snapshot
+    every `emit_interval` seconds of replay time, stamped with the replay time.
+
+    With `coalesce`, the batches of each exchange within one emit interval are merged
+    (the latest quote of each crypto wins) before they reach the sink. Spread
+    snapshots stay exactly the same, because they only see the state at the end of
+    each interval, but the core does far less work when exchanges publish faster than
+    snapshots are taken. Quote lines are still written for every original batch.
+    """
+    def __init__(self, core, speed=None, emitter=None, emit_interval=DEFAULT_EMIT_INTERVAL, sink=None,
+                 coalesce=False, clock=time.monotonic, sleep=time.sleep):
+        self.core = core
+        self.speed = speed
+        self.emitter = emitter
+        self.emit_interval_ms = int(emit_interval * 1000)
+        self.sink = sink if sink is not None else core.process_message
+        self.coalesce = coalesce
+        self.coalesced = {} # {exchange_id: merged message of the current interval}
+        self.clock = clock
+        self.sleep = sleep
+
+    def _feed(self, message):
+        if not self.coalesce:
+            self.sink(message)
+            return
+        older = self.coalesced.pop(message['id'], None) # Re-inserted last, so flushing keeps arrival order
+        if older is not None and older['base_cryptos'] != message['base_cryptos']:
+            quotes = dict(zip(older['base_cryptos'], zip(older['bids'], older['asks'])))
+            quotes.update(zip(message['base_cryptos'], zip(message['bids'], message['asks'])))
+            message = replay_message(message['id'], message['received_at'], list(quotes),
+                                     [bid for bid, _ in quotes.values()], [ask for _, ask in quotes.values()])
+        self.coalesced[message['id']] = message
+
+    def _flush(self):
+        for message in self.coalesced.values():
+            self.sink(message)
+        self.coalesced = {}
+
+    def run(self, messages):
+        """Replays `messages` (in time order). Returns {'messages', 'quotes', 'replay_seconds', 'wall_seconds'}."""
+        wall_start = self.clock()
+        first_ms = last_ms = next_emit_ms = None
+        pending = [] # Messages since the last snapshot
+        count = quotes = 0
+        for message in messages:
+            time_ms = message['received_at']
+            if first_ms is None:
+                first_ms = time_ms
+                next_emit_ms = time_ms + self.emit_interval_ms
+            last_ms = time_ms
+            if self.speed:
+                wait = wall_start + (time_ms - first_ms) / 1000 / self.speed - self.clock()
+                if wait > 0:
+                    self.sleep(wait)
+            if time_ms >= next_emit_ms:
+                self._flush()
+                if self.emitter is not None:
+                    self.emitter.emit(self.core, pending, now_ms=next_emit_ms)
+                pending = []
+                next_emit_ms += (time_ms - next_emit_ms) // self.emit_interval_ms * self.emit_interval_ms + self.emit_interval_ms
+            self._feed(message)
+            pending.append(message)
+            count += 1
+            quotes += len(message['base_cryptos'])
+        self._flush()
+        if self.emitter is not None and first_ms is not None:
+            self.emitter.emit(self.core, pending, now_ms=last_ms)
+        return {
+            'messages': count,
+            'quotes': quotes,
+            'replay_seconds': 0.0 if first_ms is None else (last_ms - first_ms) / 1000,
+            'wall_seconds': self.clock() - wall_start,
+        }
+
+
+def _parse_time(value):
+    """Milliseconds since the epoch, from a number of ms or an ISO date/time (UTC unless it has an offset)."""
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded or synthetic quotes through the spread engine, emitting JSON lines.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ticks', metavar='DIR', help="Tick recording directory (tick_recorder.py) to replay.")
+    source.add_argument('--synthetic', action='store_true', help="Replay a deterministic synthetic quote stream.")
+    parser.add_argument('--start', default=None, help="First tick time (ms or ISO date/time, UTC) of a recording.")
+    parser.add_argument('--end', default=None, help="End tick time (exclusive) of a recording.")
+    parser.add_argument('--exchanges', nargs='+', default=None, metavar='ID', help="Only replay these exchanges (recording) / their names (synthetic).")
+    parser.add_argument('--cryptos', nargs='+', default=None, metavar='CRYPTO', help="Only replay these cryptos (recording) / their names (synthetic).")
+    parser.add_argument('--num-exchanges', type=int, default=10, help="Synthetic: number of exchanges (default: 10).")
+    parser.add_argument('--num-cryptos', type=int, default=100, help="Synthetic: number of cryptos (default: 100).")
+    parser.add_argument('--hours', type=float, default=24, help="Synthetic: hours of quotes (default: 24).")
+    parser.add_argument('--seed', type=int, default=0, help="Synthetic: random seed (default: 0).")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="Replay speed multiplier, e.g. 60 = one hour per minute (default: 0 = as fast as possible).")
+    parser.add_argument('--emit-interval', type=float, default=DEFAULT_EMIT_INTERVAL,
+                        help=f"Seconds of replay time between spread snapshots (default: {DEFAULT_EMIT_INTERVAL}).")
+    parser.add_argument('--top-k', type=int, default=SPREADS_TOP_K,
+                        help=f"Number of best opportunities per spread snapshot (default: {SPREADS_TOP_K}).")
+    parser.add_argument('--coalesce', action='store_true',
+                        help="Merge each exchange's batches per emit interval before the spread engine (same snapshots, much faster).")
+    parser.add_argument('--no-quotes', action='store_true', help="Only emit spread snapshots.")
+    parser.add_argument('--output', default=None, help="File to write JSON lines to (default: stdout).")
+    args = parser.parse_args()
+    if args.speed < 0 or args.emit_interval <= 0:
+        parser.error("--speed must be >= 0 and --emit-interval positive.")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.synthetic:
+        exchange_ids = args.exchanges or [ex['id'] for ex in all_available_exchanges][:args.num_exchanges]
+        exchange_ids += [f"synthetic{i}" for i in range(len(exchange_ids), args.num_exchanges)]
+        cryptos = args.cryptos or [f"SYN{i}" for i in range(args.num_cryptos)]
+        start_ms = _parse_time(args.start) if args.start else 0
+        messages = synthetic_batches(exchange_ids, cryptos, start_ms, args.hours * 3600, seed=args.seed)
+    else:
+        reader = TickReader(args.ticks)
+        exchange_ids = [ex_id for ex_id in reader.exchanges if args.exchanges is None or ex_id in args.exchanges]
+        cryptos = [crypto for crypto in reader.cryptos if args.cryptos is None or crypto in args.cryptos]
+        messages = recorded_batches(reader, _parse_time(args.start), _parse_time(args.end), args.cryptos, args.exchanges)
+    if len(exchange_ids) < 2 or not cryptos:
+        logger.error("Nothing to replay: need at least two exchanges and one crypto.")
+        sys.exit(1)
+
+    # Never record the replayed quotes (they would be written back into the recording being read),
+    # whatever CRYPTO_ARB_TICK_DIR says, and don't serve metrics
+    core = ArbitrageCore(top_k=args.top_k, recorder=False, metrics_port=0)
+    core.load_universe(exchange_ids, cryptos)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        emitter = JsonLinesEmitter(output, include_quotes=not args.no_quotes, top_k=args.top_k)
+        stats = ReplayEngine(core, speed=args.speed or None, emitter=emitter, emit_interval=args.emit_interval,
+                             coalesce=args.coalesce).run(messages)
+    finally:
+        core.stop()
+        if output is not sys.stdout:
+            output.close()
+    logger.info(f"Replayed {stats['messages']} batches ({stats['quotes']} quotes, {stats['replay_seconds']:.0f} s of "
+                f"quotes) in {stats['wall_seconds']:.2f} s")
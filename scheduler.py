@@ -0,0 +1,234 @@
+import heapq
+import logging
+import math
+import time
+
+import ccxt
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Share of the exchange's documented rate (1000 / ccxt `rateLimit` requests per second)
+# the fetchers may use, leaving headroom for market loading and other clients on the same IP.
+RATE_LIMIT_UTILIZATION = 0.8
+BURST_SECONDS = 1.0 # Bucket capacity, in seconds of requests at the full rate
+
+BACKOFF_MIN_DELAY = 1 # seconds, doubled after every consecutive throttling error
+BACKOFF_MAX_DELAY = 60
+MIN_RATE_MULTIPLIER = 0.05 # Throttling halves the rate, but never below 5% of the sustainable rate
+RATE_RECOVERY_STEP = 0.1 # Share of the sustainable rate regained after each successful cycle
+
+# Errors that mean "slow down" (RateLimitExceeded is HTTP 429; since ccxt 4 it is not a DDoSProtection).
+THROTTLE_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection, ccxt.RequestTimeout)
+
+# Symbol priority for exchanges fetched one ticker at a time (SINGLE_TICKER_FETCH_EXCHANGES)
+HOT_SET_SIZE = 10 # Cryptos with the highest heat (spread + volatility) count as hot
+HOT_REFRESH_SECONDS = 2.0 # Target age of a hot crypto's quote
+COLD_REFRESH_SECONDS = 30.0 # Target age of any other crypto's quote
+VOLATILITY_EWMA_ALPHA = 0.2 # Weight of the newest mid-price move in the volatility average
+VOLATILITY_WEIGHT = 1.0 # Heat = best spread (%) + VOLATILITY_WEIGHT * average mid move (%)
+
+
+class AdaptiveRateScheduler:
+    """
+    Paces the fetch cycles of one exchange with a token bucket that refills at the
+    exchange's sustainable request rate (from its ccxt `rateLimit`). A cycle costs
+    one token per REST request it makes; a cycle larger than the bucket runs into
+    debt that is paid off before the next one may start.
+
+    Throttling errors (THROTTLE_ERRORS) halve the rate and block the exchange for an
+    exponentially growing backoff delay; every successful cycle ramps the rate back
+    up additively and resets the backoff. `delay()` tells the caller how long to
+    sleep until the next eligible slot.
+    """
+    def __init__(self, exchange_id, rate_limit_ms, min_interval=0.0, clock=time.monotonic):
+        self.exchange_id = exchange_id
+        self.clock = clock
+        self.min_interval = min_interval # Optional floor between cycle starts (seconds)
+        self.sustainable_rate = RATE_LIMIT_UTILIZATION * 1000.0 / max(rate_limit_ms or 1, 1) # requests per second
+        self.capacity = max(1.0, self.sustainable_rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.multiplier = 1.0
+        self.backoff_delay = 0.0
+        self.blocked_until = 0.0
+        self.last_refill = clock()
+        self.last_cycle_start = None
+
+    @property
+    def rate(self):
+        """Current allowed request rate (requests per second)."""
+        return self.sustainable_rate * self.multiplier
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def delay(self, cost=1, ignore_interval=False):
+        """
+        Seconds until a cycle of `cost` requests may start (0 = now). `ignore_interval`
+        skips the min_interval floor (used for forced refreshes); the token budget
+        and any backoff still apply.
+        """
+        now = self.clock()
+        self._refill(now)
+        needed = min(cost, self.capacity)
+        waits = [self.blocked_until - now]
+        if self.tokens < needed:
+            waits.append((needed - self.tokens) / self.rate)
+        if not ignore_interval and self.last_cycle_start is not None:
+            waits.append(self.last_cycle_start + self.min_interval - now)
+        return max(0.0, *waits)
+
+    def start_cycle(self, cost=1):
+        """Spends the tokens for a cycle of `cost` requests that starts now."""
+        self.charge(cost)
+        self.last_cycle_start = self.last_refill
+
+    def charge(self, cost):
+        """Spends the tokens of `cost` extra requests made within the current cycle."""
+        self._refill(self.clock())
+        self.tokens -= cost
+
+    def blocked(self):
+        """True while backing off after a throttling error."""
+        return self.clock() < self.blocked_until
+
+    def on_success(self):
+        """Called after a cycle completed without throttling errors."""
+        self.backoff_delay = 0.0
+        if self.multiplier < 1.0:
+            self.multiplier = min(1.0, self.multiplier + RATE_RECOVERY_STEP)
+
+    def on_throttle(self, error):
+        """Called on a throttling error. Errors during an active backoff don't back off further."""
+        now = self.clock()
+        if now < self.blocked_until:
+            return
+        self._refill(now)
+        self.multiplier = max(MIN_RATE_MULTIPLIER, self.multiplier / 2)
+        self.backoff_delay = min(BACKOFF_MAX_DELAY, max(BACKOFF_MIN_DELAY, self.backoff_delay * 2))
+        self.blocked_until = now + self.backoff_delay
+        logger.warning(f"{self.exchange_id} throttled ({type(error).__name__}): backing off {self.backoff_delay:.0f} s, "
+                       f"rate now {self.rate:.2f} req/s ({self.multiplier:.0%} of sustainable)")
+
+
+class SymbolPriority:
+    """
+    Shared heat scores of the cryptos (how wide their best cross-exchange spread is
+    and how much their mid price moves between quotes) plus the hot/cold refresh
+    policy. ArbitrageCore feeds it from every price batch; the fetcher threads of
+    single-ticker exchanges read it through their SymbolPriorityScheduler. Scores are
+    replaced item by item, so readers on other threads never see a torn value.
+    """
+    def __init__(self, hot_set_size=HOT_SET_SIZE, hot_refresh=HOT_REFRESH_SECONDS, cold_refresh=COLD_REFRESH_SECONDS):
+        self.hot_set_size = hot_set_size
+        self.hot_refresh = hot_refresh
+        self.cold_refresh = cold_refresh
+        self.spreads = {} # {crypto: best cross-exchange spread (%)}
+        self.volatility = {} # {crypto: EWMA of the absolute mid-price move between quotes (%)}
+        self.last_mids = {} # {(crypto, exchange_id): last mid price}
+
+    def clear(self):
+        self.spreads.clear()
+        self.volatility.clear()
+        self.last_mids.clear()
+
+    def observe_batch(self, message, spread_tracker):
+        """Updates the volatility and spread of the cryptos in a 'price_batch' message."""
+        exchange_id = message['id']
+        for base_crypto, bid, ask in zip(message['base_cryptos'], message['bids'], message['asks']):
+            if bid is None or ask is None:
+                continue
+            mid = (bid + ask) / 2
+            last_mid = self.last_mids.get((base_crypto, exchange_id))
+            self.last_mids[(base_crypto, exchange_id)] = mid
+            if last_mid:
+                move = abs(mid / last_mid - 1) * 100
+                previous = self.volatility.get(base_crypto)
+                self.volatility[base_crypto] = move if previous is None else previous + VOLATILITY_EWMA_ALPHA * (move - previous)
+            opportunity = spread_tracker.get(base_crypto)
+            if opportunity is None:
+                self.spreads.pop(base_crypto, None)
+            else:
+                self.spreads[base_crypto] = opportunity.spread_pct
+
+    def heat(self, crypto):
+        return max(0.0, self.spreads.get(crypto, 0.0)) + VOLATILITY_WEIGHT * self.volatility.get(crypto, 0.0)
+
+    def hot_set(self, cryptos):
+        """The `hot_set_size` cryptos of `cryptos` with the highest heat (only those with any heat at all)."""
+        heats = [(self.heat(crypto), crypto) for crypto in cryptos]
+        return {crypto for heat, crypto in heapq.nlargest(self.hot_set_size, heats) if heat > 0}
+
+
+class SymbolPriorityScheduler:
+    """
+    Picks which cryptos a single-ticker exchange fetches in its next cycle. Every
+    crypto has a target quote age (hot_refresh for the hot set, cold_refresh for the
+    rest); each cycle takes only the cryptos that reached their target, most overdue
+    first, so a crypto is not requested again before its target age and the rest of
+    the rate limit stays unused. When nothing is due, `idle_delay` says how long the
+    fetcher may sleep. Keeps per-crypto freshness for metrics.
+    """
+    def __init__(self, exchange_id, cryptos, priority, clock=time.monotonic):
+        self.exchange_id = exchange_id
+        self.cryptos = cryptos # The fetcher's (shared) crypto list
+        self.priority = priority
+        self.clock = clock
+        self.last_attempt = {} # {crypto: clock time of the last request}
+        self.last_success = {} # {crypto: clock time of the last quote received}
+        self.fetches = {} # {crypto: number of requests}
+        self.failures = {} # {crypto: number of failed requests}
+        self.hot = set()
+        self.idle_delay = 0.0 # Seconds until the next crypto is due, set by plan() when nothing is
+
+    def plan(self, limit):
+        """
+        Returns up to `limit` cryptos that reached their target age, most overdue first
+        (never fetched ones first of all); [] when none is due yet.
+        """
+        now = self.clock()
+        self.hot = self.priority.hot_set(self.cryptos)
+        urgency = []
+        next_due = math.inf
+        for crypto in self.cryptos:
+            last = self.last_attempt.get(crypto)
+            target = self.priority.hot_refresh if crypto in self.hot else self.priority.cold_refresh
+            if last is None or now - last >= target:
+                urgency.append((math.inf if last is None else (now - last) / target, crypto))
+            else:
+                next_due = min(next_due, last + target - now)
+        # Re-plan at least every hot_refresh: a crypto that turns hot is due sooner than planned
+        self.idle_delay = min(next_due, self.priority.hot_refresh)
+        return [crypto for _, crypto in heapq.nlargest(max(1, int(limit)), urgency)]
+
+    def record(self, crypto, ok):
+        """Called after each request for `crypto`; `ok` is False when it failed."""
+        now = self.clock()
+        self.last_attempt[crypto] = now
+        self.fetches[crypto] = self.fetches.get(crypto, 0) + 1
+        if ok:
+            self.last_success[crypto] = now
+        else:
+            self.failures[crypto] = self.failures.get(crypto, 0) + 1
+
+    def freshness(self):
+        """
+        Per-crypto freshness: {crypto: {'age': seconds since the last quote (None if never),
+        'target': target age, 'hot': bool, 'heat': score, 'fetches': n, 'failures': n}}.
+        """
+        now = self.clock()
+        metrics = {}
+        for crypto in self.cryptos:
+            last = self.last_success.get(crypto)
+            hot = crypto in self.hot
+            metrics[crypto] = {
+                'age': None if last is None else now - last,
+                'target': self.priority.hot_refresh if hot else self.priority.cold_refresh,
+                'hot': hot,
+                'heat': self.priority.heat(crypto),
+                'fetches': self.fetches.get(crypto, 0),
+                'failures': self.failures.get(crypto, 0),
+            }
+        return metrics
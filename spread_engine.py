@@ -0,0 +1,380 @@
+import collections
+import heapq
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One cross-exchange opportunity: buy `crypto` on `buy_exchange` at its ask and
+# sell it on `sell_exchange` at its bid. `spread_pct` is (sell_bid - buy_ask) / buy_ask * 100,
+# `net_spread_pct` the same after paying the fee of each leg (see SpreadMatrix.set_fees).
+Opportunity = collections.namedtuple(
+    'Opportunity', ['crypto', 'buy_exchange', 'buy_ask', 'sell_exchange', 'sell_bid', 'spread_pct', 'net_spread_pct']
+)
+
+
+def _as_float_array(values):
+    """Converts a list that may contain None into a float array with NaN for missing values."""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+class SpreadMatrix:
+    """
+    Holds the latest bids and asks of every crypto on every selected exchange in
+    two crypto x exchange NumPy arrays (NaN = no quote), and computes spreads
+    across all exchanges at once instead of one fixed pair of exchanges.
+
+    The fee rate of every market is kept in a third array, together with the price
+    factors derived from it, so net spreads cost two multiplications per quote and
+    no lookups. Pairs are ranked by net spread. `fees` ({exchange_id: rate}) sets
+    the initial rate of each exchange (default: no fees, net = gross).
+    """
+    def __init__(self, cryptos, exchange_ids, fees=None):
+        self.cryptos = list(cryptos)
+        self.exchange_ids = list(exchange_ids)
+        self.crypto_index = {crypto: i for i, crypto in enumerate(self.cryptos)}
+        self.exchange_index = {ex_id: j for j, ex_id in enumerate(self.exchange_ids)}
+        shape = (len(self.cryptos), len(self.exchange_ids))
+        self.bids = np.full(shape, np.nan)
+        self.asks = np.full(shape, np.nan)
+        self.fees = np.zeros(shape) # Fee rate per leg (0.001 = 0.1%)
+        self.buy_factor = np.ones(shape) # Buying at `ask` costs ask * buy_factor
+        self.sell_factor = np.ones(shape) # Selling at `bid` yields bid * sell_factor
+        for exchange_id, fee in (fees or {}).items():
+            self.set_exchange_fee(exchange_id, fee)
+
+    def update(self, base_crypto, exchange_id, bid_price, ask_price):
+        """Stores a single quote. Unknown cryptos or exchanges are ignored."""
+        i = self.crypto_index.get(base_crypto)
+        j = self.exchange_index.get(exchange_id)
+        if i is None or j is None:
+            return
+        self.bids[i, j] = np.nan if bid_price is None else bid_price
+        self.asks[i, j] = np.nan if ask_price is None else ask_price
+
+    def apply_batch(self, message):
+        """
+        Stores all quotes of a 'price_batch' message (see arbitrage_core.PriceBatch) in one
+        vectorized assignment. Returns the row indices that were written.
+        """
+        j = self.exchange_index.get(message['id'])
+        if j is None or not message['base_cryptos']:
+            return np.empty(0, dtype=np.intp)
+        rows = np.fromiter((self.crypto_index.get(c, -1) for c in message['base_cryptos']),
+                           dtype=np.intp, count=len(message['base_cryptos']))
+        known = rows >= 0
+        rows = rows[known]
+        self.bids[rows, j] = _as_float_array(message['bids'])[known]
+        self.asks[rows, j] = _as_float_array(message['asks'])[known]
+        return rows
+
+    def clear_exchange(self, exchange_id):
+        j = self.exchange_index.get(exchange_id)
+        if j is not None:
+            self.bids[:, j] = np.nan
+            self.asks[:, j] = np.nan
+
+    def set_exchange_fee(self, exchange_id, fee):
+        """Sets the fee rate of every market of an exchange. Returns the rows whose fee changed."""
+        j = self.exchange_index.get(exchange_id)
+        if j is None:
+            return np.empty(0, dtype=np.intp)
+        rows = np.flatnonzero(self.fees[:, j] != fee)
+        self.fees[:, j] = fee
+        self.buy_factor[:, j] = 1 + fee
+        self.sell_factor[:, j] = 1 - fee
+        return rows
+
+    def set_fees(self, exchange_id, base_cryptos, fees):
+        """
+        Sets the fee rate of the markets of `base_cryptos` on an exchange (parallel lists,
+        e.g. from a 'market_fees' message). Returns the rows whose fee changed.
+        """
+        j = self.exchange_index.get(exchange_id)
+        if j is None or not base_cryptos:
+            return np.empty(0, dtype=np.intp)
+        rows = np.fromiter((self.crypto_index.get(c, -1) for c in base_cryptos), dtype=np.intp, count=len(base_cryptos))
+        known = rows >= 0
+        rows = rows[known]
+        fees = np.asarray(fees, dtype=float)[known]
+        changed = self.fees[rows, j] != fees
+        self.fees[rows, j] = fees
+        self.buy_factor[rows, j] = 1 + fees
+        self.sell_factor[rows, j] = 1 - fees
+        return rows[changed]
+
+    def clear_quotes(self, quotes):
+        """
+        Drops single quotes, given as (base_crypto, exchange_id) pairs (e.g. expired ones).
+        Unknown cryptos or exchanges are ignored. Returns the row indices that were cleared.
+        """
+        cells = [(self.crypto_index.get(crypto), self.exchange_index.get(exchange_id)) for crypto, exchange_id in quotes]
+        cells = [(i, j) for i, j in cells if i is not None and j is not None]
+        if not cells:
+            return np.empty(0, dtype=np.intp)
+        rows, cols = np.array(cells, dtype=np.intp).T
+        self.bids[rows, cols] = np.nan
+        self.asks[rows, cols] = np.nan
+        return rows
+
+    def _best_pairs(self, rows=None):
+        """
+        For each crypto in `rows` (all cryptos by default), finds the pair of
+        different exchanges with the largest net spread: buy at the lowest ask plus
+        fee, sell at the highest bid minus fee. Returns (rows, buy_idx, sell_idx,
+        buy_ask, sell_bid, spread_pct, net_spread_pct) with the quoted prices, where
+        both spreads are NaN if fewer than two exchanges have usable quotes.
+        """
+        if rows is None:
+            rows = np.arange(len(self.cryptos))
+        quoted_bids = self.bids[rows]
+        quoted_asks = self.asks[rows]
+        # Proceeds of a sell and cost of a buy after fees; the pair search runs on these
+        bids = np.where(np.isnan(quoted_bids), -np.inf, quoted_bids * self.sell_factor[rows])
+        asks = np.where(np.isnan(quoted_asks) | (quoted_asks <= 0), np.inf, quoted_asks * self.buy_factor[rows])
+        r = np.arange(len(rows))
+
+        sell_idx = bids.argmax(axis=1)
+        buy_idx = asks.argmin(axis=1)
+
+        # When the best bid and the best ask are on the same exchange, the best
+        # cross-exchange pair uses the runner-up on one of the two sides.
+        clash = sell_idx == buy_idx
+        if clash.any() and len(self.exchange_ids) > 1:
+            bids_without_best = bids.copy()
+            bids_without_best[r, sell_idx] = -np.inf
+            alt_sell_idx = bids_without_best.argmax(axis=1)
+            asks_without_best = asks.copy()
+            asks_without_best[r, buy_idx] = np.inf
+            alt_buy_idx = asks_without_best.argmin(axis=1)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                spread_alt_sell = (bids[r, alt_sell_idx] - asks[r, buy_idx]) / asks[r, buy_idx]
+                spread_alt_buy = (bids[r, sell_idx] - asks[r, alt_buy_idx]) / asks[r, alt_buy_idx]
+            use_alt_sell = np.nan_to_num(spread_alt_sell, nan=-np.inf) >= np.nan_to_num(spread_alt_buy, nan=-np.inf)
+            new_sell_idx = np.where(clash & use_alt_sell, alt_sell_idx, sell_idx)
+            buy_idx = np.where(clash & ~use_alt_sell, alt_buy_idx, buy_idx)
+            sell_idx = new_sell_idx
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            net_spread_pct = (bids[r, sell_idx] - asks[r, buy_idx]) / asks[r, buy_idx] * 100
+        sell_bid = quoted_bids[r, sell_idx]
+        buy_ask = quoted_asks[r, buy_idx]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spread_pct = (sell_bid - buy_ask) / buy_ask * 100
+        invalid = ~np.isfinite(net_spread_pct) | (sell_idx == buy_idx)
+        spread_pct[invalid] = np.nan
+        net_spread_pct[invalid] = np.nan
+        return rows, buy_idx, sell_idx, buy_ask, sell_bid, spread_pct, net_spread_pct
+
+    def best_opportunities(self):
+        """Returns the best cross-exchange Opportunity (by net spread) for every crypto that has one."""
+        rows, buy_idx, sell_idx, buy_ask, sell_bid, spread_pct, net_spread_pct = self._best_pairs()
+        opportunities = []
+        for k in np.flatnonzero(~np.isnan(net_spread_pct)):
+            opportunities.append(Opportunity(
+                self.cryptos[rows[k]],
+                self.exchange_ids[buy_idx[k]], float(buy_ask[k]),
+                self.exchange_ids[sell_idx[k]], float(sell_bid[k]),
+                float(spread_pct[k]), float(net_spread_pct[k]),
+            ))
+        return opportunities
+
+    def pairwise_spreads(self, rows=None, net=False):
+        """
+        Full pairwise spread tensor, computed on demand: result[c, b, s] is the spread
+        (in %) of buying crypto c on exchange b at its ask and selling on exchange s
+        at its bid, after both fees if `net`. The diagonal (b == s) and pairs with
+        missing quotes are NaN.
+        """
+        bids = self.bids if rows is None else self.bids[rows]
+        asks = self.asks if rows is None else self.asks[rows]
+        asks = np.where(asks > 0, asks, np.nan)
+        if net:
+            bids = bids * (self.sell_factor if rows is None else self.sell_factor[rows])
+            asks = asks * (self.buy_factor if rows is None else self.buy_factor[rows])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spreads = (bids[:, None, :] - asks[:, :, None]) / asks[:, :, None] * 100
+        diagonal = np.arange(len(self.exchange_ids))
+        spreads[:, diagonal, diagonal] = np.nan
+        return spreads
+
+    def pair_opportunities(self, crypto):
+        """Returns every ordered exchange pair for one crypto as a list of Opportunity."""
+        i = self.crypto_index.get(crypto)
+        if i is None:
+            return []
+        spreads = self.pairwise_spreads(np.array([i]))[0]
+        net_spreads = self.pairwise_spreads(np.array([i]), net=True)[0]
+        opportunities = []
+        for b, s in zip(*np.nonzero(~np.isnan(spreads))):
+            opportunities.append(Opportunity(
+                crypto,
+                self.exchange_ids[b], float(self.asks[i, b]),
+                self.exchange_ids[s], float(self.bids[i, s]),
+                float(spreads[b, s]), float(net_spreads[b, s]),
+            ))
+        return opportunities
+
+
+class IndexedMaxHeap:
+    """
+    Binary max-heap of (value, key) with a key -> position index, so a key's value
+    can be changed or removed in O(log n) without rebuilding the heap.
+    """
+    def __init__(self):
+        self.heap = [] # [(value, key)]
+        self.position = {} # {key: index in self.heap}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key):
+        return key in self.position
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][1]] = i
+        self.position[self.heap[j][1]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.heap[i][0] <= self.heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        n = len(self.heap)
+        while True:
+            largest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self.heap[child][0] > self.heap[largest][0]:
+                    largest = child
+            if largest == i:
+                break
+            self._swap(i, largest)
+            i = largest
+
+    def set(self, key, value):
+        """Inserts `key` or changes its value."""
+        i = self.position.get(key)
+        if i is None:
+            self.heap.append((value, key))
+            self.position[key] = len(self.heap) - 1
+            self._sift_up(len(self.heap) - 1)
+            return
+        old_value = self.heap[i][0]
+        self.heap[i] = (value, key)
+        if value > old_value:
+            self._sift_up(i)
+        elif value < old_value:
+            self._sift_down(i)
+
+    def remove(self, key):
+        i = self.position.pop(key, None)
+        if i is None:
+            return
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.position[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self.position[last[1]])
+
+    def top(self, k):
+        """
+        Returns the `k` largest (value, key) pairs in descending order. Walks the heap
+        best-first with a small frontier, so the cost is O(k log k) regardless of size.
+        """
+        result = []
+        if not self.heap or k <= 0:
+            return result
+        frontier = [(-self.heap[0][0], 0)] # heapq is a min-heap, so values are negated
+        while frontier and len(result) < k:
+            _, i = heapq.heappop(frontier)
+            result.append(self.heap[i])
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.heap):
+                    heapq.heappush(frontier, (-self.heap[child][0], child))
+        return result
+
+
+class OpportunityTracker:
+    """
+    Incremental view of the best cross-exchange opportunity (by net spread) per crypto.
+    Each price update recomputes only the cryptos it touched and re-positions them in an
+    indexed heap, so `top(k)` does not depend on the size of the crypto universe.
+    Has no Tk dependency; arbitrage_core.ArbitrageCore owns one per loaded exchange set.
+    """
+    def __init__(self, spread_matrix, k=100):
+        self.matrix = spread_matrix
+        self.k = k
+        self.heap = IndexedMaxHeap()
+        self.best = {} # {crypto: Opportunity}
+        # Last computed (buy_idx, sell_idx, buy_ask, sell_bid, spread_pct, net_spread_pct) per matrix row,
+        # NaN = none, so a refresh only builds Opportunity objects for the rows whose best pair changed
+        self.state = np.full((len(spread_matrix.cryptos), 6), np.nan)
+        self.version = 0 # Bumped whenever a crypto's best opportunity changes
+
+    def apply_batch(self, message):
+        """Stores a 'price_batch' message and refreshes only the cryptos it contains."""
+        self._refresh(self.matrix.apply_batch(message))
+
+    def update(self, base_crypto, exchange_id, bid_price, ask_price):
+        self.matrix.update(base_crypto, exchange_id, bid_price, ask_price)
+        i = self.matrix.crypto_index.get(base_crypto)
+        if i is not None:
+            self._refresh(np.array([i]))
+
+    def clear_exchange(self, exchange_id):
+        """Drops all quotes of an exchange; every crypto may have lost its best pair."""
+        self.matrix.clear_exchange(exchange_id)
+        self._refresh(np.arange(len(self.matrix.cryptos)))
+
+    def clear_quotes(self, quotes):
+        """Drops single (base_crypto, exchange_id) quotes and refreshes only their cryptos."""
+        self._refresh(self.matrix.clear_quotes(quotes))
+
+    def set_fees(self, exchange_id, base_cryptos, fees):
+        """Updates market fee rates (see SpreadMatrix.set_fees) and refreshes the cryptos whose fee changed."""
+        self._refresh(self.matrix.set_fees(exchange_id, base_cryptos, fees))
+
+    def set_exchange_fee(self, exchange_id, fee):
+        self._refresh(self.matrix.set_exchange_fee(exchange_id, fee))
+
+    def _refresh(self, rows):
+        if len(rows) == 0:
+            return
+        rows = np.unique(rows)
+        rows, buy_idx, sell_idx, buy_ask, sell_bid, spread_pct, net_spread_pct = self.matrix._best_pairs(rows)
+        state = np.column_stack((buy_idx, sell_idx, buy_ask, sell_bid, spread_pct, net_spread_pct))
+        state[np.isnan(net_spread_pct)] = np.nan
+        old_state = self.state[rows]
+        differs = ~((state == old_state) | (np.isnan(state) & np.isnan(old_state))).all(axis=1)
+        if not differs.any():
+            return
+        self.state[rows] = state
+        cryptos, exchange_ids = self.matrix.cryptos, self.matrix.exchange_ids
+        for row, b, s, ask, bid, spread, net_spread in zip(rows[differs].tolist(), buy_idx[differs].tolist(),
+                                                           sell_idx[differs].tolist(), buy_ask[differs].tolist(),
+                                                           sell_bid[differs].tolist(), spread_pct[differs].tolist(),
+                                                           net_spread_pct[differs].tolist()):
+            crypto = cryptos[row]
+            if net_spread != net_spread: # NaN: no usable pair any more
+                if crypto in self.best:
+                    del self.best[crypto]
+                    self.heap.remove(crypto)
+                continue
+            self.best[crypto] = Opportunity(crypto, exchange_ids[b], ask, exchange_ids[s], bid, spread, net_spread)
+            self.heap.set(crypto, net_spread)
+        self.version += 1
+
+    def get(self, crypto):
+        return self.best.get(crypto)
+
+    def top(self, k=None):
+        """Returns up to `k` (default: self.k) opportunities, highest net spread first."""
+        return [self.best[crypto] for _, crypto in self.heap.top(self.k if k is None else k)]
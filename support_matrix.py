@@ -0,0 +1,202 @@
+import argparse
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# --- File Format ---
+#
+# Header:        magic (4 bytes) | version (uint16) | crypto count (uint32) | exchange count (uint32)
+# Crypto index:  for each crypto, its symbol as a length-prefixed (uint8) UTF-8 string
+# Exchanges:     for each exchange, its id and display name as length-prefixed strings,
+#                a market fingerprint of FINGERPRINT_SIZE bytes (version 2+, all zeros if unknown),
+#                followed by a bitset of ceil(crypto count / 8) bytes (little-endian),
+#                where bit i is set if the exchange supports crypto i of the index.
+# All integers are little-endian.
+
+SUPPORT_MATRIX_MAGIC = b'CSMX'
+SUPPORT_MATRIX_VERSION = 2
+FINGERPRINT_SIZE = 20 # SHA-1 digest
+_HEADER = struct.Struct('<4sHII')
+_NO_FINGERPRINT = bytes(FINGERPRINT_SIZE)
+
+
+def _write_str(f, value):
+    data = value.encode('utf-8')
+    if len(data) > 255:
+        raise ValueError(f"String too long for support matrix: {value!r}")
+    f.write(struct.pack('<B', len(data)))
+    f.write(data)
+
+
+def _read_str(f):
+    (length,) = struct.unpack('<B', f.read(1))
+    return f.read(length).decode('utf-8')
+
+
+class SupportMatrix:
+    """
+    Compact crypto x exchange support matrix.
+    Cryptos are interned into a fixed index and every exchange is a single
+    integer bitset over that index, so "which cryptos do all of these exchanges
+    support" is a bitwise AND of a handful of integers.
+    """
+    def __init__(self, cryptos):
+        self.cryptos = list(cryptos)
+        self.crypto_index = {crypto: i for i, crypto in enumerate(self.cryptos)}
+        self.bitsets = {} # {exchange_id: int}
+        self.exchange_names = {} # {exchange_id: display name}
+        self.fingerprints = {} # {exchange_id: bytes}, fingerprint of the market set the column was built from
+
+    @classmethod
+    def from_support_data(cls, support_data, exchange_names=None):
+        """
+        Builds a matrix from the {'exchange_id': {'crypto_symbol': True/False}}
+        dictionary produced by exchange3.get_exchange_crypto_support().
+        """
+        cryptos = sorted({crypto for support in support_data.values() for crypto in support})
+        matrix = cls(cryptos)
+        exchange_names = exchange_names or {}
+        for exchange_id, support in support_data.items():
+            matrix.set_exchange(exchange_id, support, exchange_names.get(exchange_id, exchange_id))
+        return matrix
+
+    @classmethod
+    def from_excel(cls, excel_path, exchange_name_to_id):
+        """
+        Builds a matrix from a legacy ✅/❌ Excel report (sheet 'Crypto Support').
+        `exchange_name_to_id` maps the Excel column names back to exchange IDs.
+        """
+        import pandas as pd # Only needed for the legacy Excel path
+
+        df = pd.read_excel(excel_path, sheet_name='Crypto Support', index_col='Crypto')
+        matrix = cls(sorted(df.index.astype(str)))
+        for column in df.columns:
+            exchange_id = exchange_name_to_id.get(column, column)
+            support = {str(crypto): value == '✅' for crypto, value in df[column].items()}
+            matrix.set_exchange(exchange_id, support, column)
+        return matrix
+
+    def set_exchange(self, exchange_id, support, name=None, fingerprint=None):
+        """
+        Stores the support of one exchange from a {'crypto_symbol': True/False} dictionary.
+        `fingerprint` identifies the market set the column was derived from (see exchange3.market_fingerprint).
+        """
+        bits = 0
+        for crypto, is_supported in support.items():
+            if is_supported and crypto in self.crypto_index:
+                bits |= 1 << self.crypto_index[crypto]
+        self.set_exchange_bits(exchange_id, bits, name, fingerprint)
+
+    def set_exchange_bits(self, exchange_id, bits, name=None, fingerprint=None):
+        """Stores the support of one exchange from an integer bitset over `crypto_index`."""
+        self.bitsets[exchange_id] = bits
+        self.exchange_names[exchange_id] = name or self.exchange_names.get(exchange_id, exchange_id)
+        if fingerprint is not None:
+            self.fingerprints[exchange_id] = fingerprint
+        else:
+            self.fingerprints.pop(exchange_id, None)
+
+    def supports(self, exchange_id, crypto):
+        index = self.crypto_index.get(crypto)
+        if index is None:
+            return False
+        return bool((self.bitsets.get(exchange_id, 0) >> index) & 1)
+
+    def _cryptos_from_bits(self, bits):
+        cryptos = []
+        while bits:
+            lowest = bits & -bits
+            cryptos.append(self.cryptos[lowest.bit_length() - 1])
+            bits ^= lowest
+        return cryptos
+
+    def common_cryptos(self, exchange_ids):
+        """
+        Returns a sorted list of cryptos supported by ALL of the given exchanges.
+        Exchanges that are not in the matrix are ignored.
+        """
+        bitsets = [self.bitsets[ex_id] for ex_id in exchange_ids if ex_id in self.bitsets]
+        if not bitsets:
+            return []
+        bits = bitsets[0]
+        for other in bitsets[1:]:
+            bits &= other
+        return sorted(self._cryptos_from_bits(bits))
+
+    def reindexed(self, cryptos):
+        """
+        Copy of the matrix over another crypto index, every column mapped by crypto name
+        (cryptos new to the index are unsupported). Fingerprints are dropped, since the
+        columns no longer match what they were built from.
+        """
+        matrix = type(self)(cryptos)
+        for exchange_id, bits in self.bitsets.items():
+            support = {crypto: True for crypto in self._cryptos_from_bits(bits)}
+            matrix.set_exchange(exchange_id, support, self.exchange_names.get(exchange_id))
+        return matrix
+
+    def to_support_data(self):
+        """Expands the matrix back to {'exchange_id': {'crypto_symbol': True/False}}."""
+        return {
+            exchange_id: {crypto: bool((bits >> i) & 1) for i, crypto in enumerate(self.cryptos)}
+            for exchange_id, bits in self.bitsets.items()
+        }
+
+    def save(self, path):
+        """Writes the matrix to `path` in the binary format described at the top of this module."""
+        bitset_len = (len(self.cryptos) + 7) // 8
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(SUPPORT_MATRIX_MAGIC, SUPPORT_MATRIX_VERSION, len(self.cryptos), len(self.bitsets)))
+            for crypto in self.cryptos:
+                _write_str(f, crypto)
+            for exchange_id, bits in self.bitsets.items():
+                _write_str(f, exchange_id)
+                _write_str(f, self.exchange_names.get(exchange_id, exchange_id))
+                f.write(self.fingerprints.get(exchange_id, _NO_FINGERPRINT))
+                f.write(bits.to_bytes(bitset_len, 'little'))
+        os.replace(tmp_path, path)
+        logger.info(f"Support matrix ({len(self.cryptos)} cryptos x {len(self.bitsets)} exchanges) written to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """Reads a matrix previously written with save(). Raises ValueError on a malformed file."""
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError(f"Truncated support matrix file: {path}")
+            magic, version, crypto_count, exchange_count = _HEADER.unpack(header)
+            if magic != SUPPORT_MATRIX_MAGIC:
+                raise ValueError(f"Not a support matrix file: {path}")
+            if version not in (1, SUPPORT_MATRIX_VERSION):
+                raise ValueError(f"Unsupported support matrix version {version} in {path}")
+
+            matrix = cls([_read_str(f) for _ in range(crypto_count)])
+            bitset_len = (crypto_count + 7) // 8
+            for _ in range(exchange_count):
+                exchange_id = _read_str(f)
+                name = _read_str(f)
+                fingerprint = f.read(FINGERPRINT_SIZE) if version >= 2 else _NO_FINGERPRINT
+                data = f.read(bitset_len)
+                if len(data) != bitset_len:
+                    raise ValueError(f"Truncated support matrix file: {path}")
+                matrix.bitsets[exchange_id] = int.from_bytes(data, 'little')
+                matrix.exchange_names[exchange_id] = name
+                if fingerprint != _NO_FINGERPRINT:
+                    matrix.fingerprints[exchange_id] = fingerprint
+        return matrix
+
+
+if __name__ == "__main__":
+    # Converts a legacy Excel report into the binary support matrix format
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Convert a crypto_exchange_support.xlsx report to a binary support matrix.")
+    parser.add_argument('excel_path')
+    parser.add_argument('output_path')
+    args = parser.parse_args()
+
+    from exchange3 import EXCHANGES_TO_CHECK
+    name_to_id = {ex['name']: ex['id'] for ex in EXCHANGES_TO_CHECK}
+    SupportMatrix.from_excel(args.excel_path, name_to_id).save(args.output_path)
@@ -0,0 +1,282 @@
+import bisect
+import logging
+import tkinter as tk
+from tkinter import ttk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROW_HEIGHT = 20 # Fallback when the ttk style doesn't report a Treeview rowheight
+
+
+def _rows_in_place(current, target_index):
+    """
+    Returns the keys of the longest subsequence of `current` that is already in target
+    order (longest increasing subsequence of target positions). Those rows can stay
+    where they are; every other row is moved once.
+    """
+    tail_positions = [] # Smallest target position ending an increasing run of each length
+    tail_keys = []
+    previous = {}
+    for key in current:
+        position = target_index[key]
+        length = bisect.bisect_left(tail_positions, position)
+        previous[key] = tail_keys[length - 1] if length > 0 else None
+        if length == len(tail_positions):
+            tail_positions.append(position)
+            tail_keys.append(key)
+        else:
+            tail_positions[length] = position
+            tail_keys[length] = key
+    in_place = set()
+    key = tail_keys[-1] if tail_keys else None
+    while key is not None:
+        in_place.add(key)
+        key = previous[key]
+    return in_place
+
+
+class SortedRowModel:
+    """
+    Numeric shadow of a table: every row's display values plus its raw sort values
+    (floats, strings for text columns, None = missing), kept ordered by the current
+    sort column with bisect. Setting a row only re-ranks it when its value in the
+    sort column changed, and a full sort only happens when the sort column or
+    direction changes. Rows without a sort value are always listed last.
+    """
+    def __init__(self, columns, sort_col, descending=False):
+        self.columns = list(columns)
+        self.sort_index = self.columns.index(sort_col)
+        self.descending = descending
+        self.rows_by_key = {} # {key: (values, tags, sort_values)}
+        self.ranked = [] # [(sort_value, key)] in ascending order
+        self.missing = {} # {key: None}, rows whose sort value is None (insertion ordered)
+        self.version = 0 # Bumped on every change, so views can skip re-rendering
+
+    def __len__(self):
+        return len(self.rows_by_key)
+
+    def __contains__(self, key):
+        return key in self.rows_by_key
+
+    def _rank(self, key, sort_value):
+        if sort_value is None:
+            self.missing[key] = None
+        else:
+            bisect.insort(self.ranked, (sort_value, key))
+
+    def _unrank(self, key, sort_value):
+        if sort_value is None:
+            del self.missing[key]
+        else:
+            del self.ranked[bisect.bisect_left(self.ranked, (sort_value, key))]
+
+    def set_row(self, key, values, sort_values, tags=()):
+        """Adds or updates a row. `sort_values` holds one raw value per column."""
+        row = (tuple(values), tuple(tags), tuple(sort_values))
+        old_row = self.rows_by_key.get(key)
+        if old_row == row:
+            return
+        self.rows_by_key[key] = row
+        new_sort_value = row[2][self.sort_index]
+        if old_row is None:
+            self._rank(key, new_sort_value)
+        elif old_row[2][self.sort_index] != new_sort_value:
+            self._unrank(key, old_row[2][self.sort_index])
+            self._rank(key, new_sort_value)
+        self.version += 1
+
+    def remove_row(self, key):
+        row = self.rows_by_key.pop(key, None)
+        if row is not None:
+            self._unrank(key, row[2][self.sort_index])
+            self.version += 1
+
+    def replace_rows(self, rows):
+        """Makes `rows` ([(key, values, sort_values, tags)]) the table content, diffing against the current rows."""
+        new_keys = set()
+        for key, values, sort_values, tags in rows:
+            new_keys.add(key)
+            self.set_row(key, values, sort_values, tags)
+        for key in [key for key in self.rows_by_key if key not in new_keys]:
+            self.remove_row(key)
+
+    def clear(self):
+        if self.rows_by_key:
+            self.rows_by_key.clear()
+            self.ranked.clear()
+            self.missing.clear()
+            self.version += 1
+
+    def set_sort(self, col, descending):
+        """Changes the sort column/direction; re-sorts only if either actually changed."""
+        sort_index = self.columns.index(col)
+        if sort_index == self.sort_index and descending == self.descending:
+            return
+        self.sort_index = sort_index
+        self.descending = descending
+        self.ranked = []
+        self.missing = {}
+        for key, row in self.rows_by_key.items():
+            if row[2][sort_index] is None:
+                self.missing[key] = None
+            else:
+                self.ranked.append((row[2][sort_index], key))
+        self.ranked.sort()
+        self.version += 1
+
+    def keys(self):
+        """Returns the row keys in display order."""
+        keys = [key for _, key in self.ranked]
+        if self.descending:
+            keys.reverse()
+        keys.extend(self.missing)
+        return keys
+
+    def rows(self):
+        """Returns all rows as [(key, values, tags)] in display order."""
+        return [(key,) + self.rows_by_key[key][:2] for key in self.keys()]
+
+
+class KeyedTreeView:
+    """
+    Keeps a ttk.Treeview in sync with a list of keyed rows by diffing instead of
+    deleting and re-inserting everything:
+      - rows are Treeview items whose iid is the row key (crypto, exchange id, ...)
+      - only cells whose values or tags changed are written with `tree.item`
+      - rows are moved only when their rank changed
+      - heading texts are only reconfigured when they changed
+    With `virtual=True` only the rows in the visible viewport exist as Treeview
+    items; the scrollbar passed in scrolls through the full row list.
+    """
+    def __init__(self, tree, scrollbar=None, virtual=False):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.virtual = virtual
+        self.order = [] # Row keys in display order (all rows, not just the rendered ones)
+        self.data = {} # {key: (values, tags)}
+        self.rendered = {} # {key: (values, tags)} currently present in the Treeview
+        self.headings = {} # {column: heading text currently shown}
+        self.model_version = None # SortedRowModel.version last rendered by render_model()
+        self.offset = 0 # Index of the first rendered row (virtual mode)
+        self.visible_rows = 1
+
+        if self.virtual:
+            if self.scrollbar is not None:
+                self.scrollbar.configure(command=self._on_scrollbar)
+            self.tree.bind("<Configure>", self._on_resize)
+            self.tree.bind("<MouseWheel>", self._on_mousewheel) # Windows / macOS
+            self.tree.bind("<Button-4>", lambda event: self._scroll_by(-3)) # X11 wheel up
+            self.tree.bind("<Button-5>", lambda event: self._scroll_by(3)) # X11 wheel down
+        elif self.scrollbar is not None:
+            self.tree.configure(yscrollcommand=self.scrollbar.set)
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def rows(self):
+        """Returns all rows as [(key, values, tags)] in display order."""
+        return [(key,) + self.data[key] for key in self.order]
+
+    def set_rows(self, rows):
+        """Replaces the table content with `rows` ([(key, values, tags)], in display order)."""
+        self.order = [key for key, _, _ in rows]
+        self.data = {key: (tuple(values), tuple(tags)) for key, values, tags in rows}
+        self._render()
+
+    def render_model(self, model):
+        """Renders a SortedRowModel, skipping the diff entirely if it hasn't changed since the last call."""
+        if model.version != self.model_version:
+            self.model_version = model.version
+            self.set_rows(model.rows())
+
+    def set_headings(self, texts):
+        """Sets heading texts ({column: text}), touching only headings that changed."""
+        for col, text in texts.items():
+            if self.headings.get(col) != text:
+                self.tree.heading(col, text=text)
+                self.headings[col] = text
+
+    def _window(self):
+        if not self.virtual:
+            return self.order
+        max_offset = max(0, len(self.order) - self.visible_rows)
+        self.offset = min(self.offset, max_offset)
+        return self.order[self.offset:self.offset + self.visible_rows]
+
+    def _render(self):
+        window = self._window()
+        wanted = set(window)
+
+        for key in [key for key in self.rendered if key not in wanted]:
+            self.tree.delete(key)
+            del self.rendered[key]
+
+        for index, key in enumerate(window):
+            row = self.data[key]
+            if key not in self.rendered:
+                self.tree.insert("", index, iid=key, values=row[0], tags=row[1])
+                self.rendered[key] = row
+            elif self.rendered[key] != row:
+                self.tree.item(key, values=row[0], tags=row[1])
+                self.rendered[key] = row
+
+        # Move only the rows whose rank changed: rows outside the longest already-ordered
+        # run are placed right after their new predecessor, in target order
+        current = list(self.tree.get_children(""))
+        if current != window:
+            in_place = _rows_in_place(current, {key: index for index, key in enumerate(window)})
+            for index, key in enumerate(window):
+                if key in in_place:
+                    continue
+                current.remove(key)
+                position = current.index(window[index - 1]) + 1 if index > 0 else 0
+                self.tree.move(key, "", position)
+                current.insert(position, key)
+
+        if self.virtual:
+            self._update_scrollbar()
+
+    # --- Virtual viewport ---
+
+    def _update_scrollbar(self):
+        if self.scrollbar is None:
+            return
+        total = len(self.order)
+        if total <= self.visible_rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.visible_rows) / total)
+
+    def _scroll_to(self, offset):
+        offset = max(0, min(int(offset), max(0, len(self.order) - self.visible_rows)))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _scroll_by(self, rows):
+        self._scroll_to(self.offset + rows)
+
+    def _on_scrollbar(self, action, *args):
+        if action == tk.MOVETO:
+            self._scroll_to(float(args[0]) * len(self.order))
+        elif action == tk.SCROLL:
+            amount, unit = int(args[0]), args[1]
+            self._scroll_by(amount * (self.visible_rows if unit == tk.PAGES else 1))
+
+    def _on_mousewheel(self, event):
+        self._scroll_by(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_resize(self, event):
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            row_height = int(row_height)
+        except (TypeError, ValueError):
+            row_height = DEFAULT_ROW_HEIGHT
+        visible_rows = max(1, event.height // row_height) # Includes the heading row as spare
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._render()
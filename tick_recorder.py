@@ -0,0 +1,320 @@
+import glob
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+# Directory to record every quote to; recording is off unless it is set.
+TICK_RECORD_DIR = os.environ.get('CRYPTO_ARB_TICK_DIR')
+
+SEGMENT_CAPACITY = 1_000_000 # Records per segment file (~30 MB)
+SEGMENT_MAX_SECONDS = 60 * 60 # Roll over to a new segment at least every hour
+FLUSH_INTERVAL = 5.0 # Seconds between msyncs of the open segment
+
+# --- File layout ---
+# A recording directory holds `names.json` ({"exchanges": [...], "cryptos": [...]}, the
+# ids behind the exchange/crypto indexes, append-only) and segment files named
+# `ticks-<first time ms>-<sequence>.bin` (the sequence orders segments opened within
+# the same millisecond; older recordings may have `ticks-<ms>.bin`). A segment is a fixed-size file: a 64-byte header
+# (magic, capacity, record count, first and last time in ms) followed by one
+# fixed-width column per field, each `capacity` values long. Times are milliseconds
+# since the epoch and never decrease within a directory, so readers can binary
+# search the time column of a memory-mapped segment.
+
+SEGMENT_MAGIC = b'TICKS001'
+HEADER = struct.Struct('<8sQQqq') # magic, capacity, count, first_ms, last_ms
+HEADER_SIZE = 64
+# Widest types first, so every column stays aligned
+COLUMNS = (('time_ms', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('crypto', '<u4'), ('exchange', '<u2'))
+TICK_DTYPE = np.dtype([('time_ms', '<i8'), ('exchange', '<u2'), ('crypto', '<u4'), ('bid', '<f8'), ('ask', '<f8')])
+
+
+def _column_offsets(capacity):
+    offsets = {}
+    offset = HEADER_SIZE
+    for name, dtype in COLUMNS:
+        offsets[name] = offset
+        offset += capacity * np.dtype(dtype).itemsize
+    return offsets, offset
+
+
+def _map_columns(path, capacity, mode):
+    offsets, _ = _column_offsets(capacity)
+    return {name: np.memmap(path, dtype=dtype, mode=mode, offset=offsets[name], shape=(capacity,))
+            for name, dtype in COLUMNS}
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        magic, capacity, count, first_ms, last_ms = HEADER.unpack(f.read(HEADER.size))
+    if magic != SEGMENT_MAGIC:
+        raise ValueError(f"{path} is not a tick segment")
+    return capacity, count, first_ms, last_ms
+
+
+class TickSegment:
+    """The open segment file being appended to (writer side)."""
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        _, size = _column_offsets(capacity)
+        with open(path, 'wb') as f:
+            f.truncate(size) # Sparse on most filesystems until written
+        self.header = np.memmap(path, dtype=np.uint8, mode='r+', offset=0, shape=(HEADER_SIZE,))
+        self.columns = _map_columns(path, capacity, 'r+')
+        self.count = 0
+        self.first_ms = None
+        self.last_ms = None
+        self.opened_at = time.monotonic()
+
+    def free(self):
+        return self.capacity - self.count
+
+    def append(self, times, exchanges, cryptos, bids, asks):
+        n = len(times)
+        end = self.count + n
+        columns = self.columns
+        columns['time_ms'][self.count:end] = times
+        columns['exchange'][self.count:end] = exchanges
+        columns['crypto'][self.count:end] = cryptos
+        columns['bid'][self.count:end] = bids
+        columns['ask'][self.count:end] = asks
+        self.count = end
+        if self.first_ms is None:
+            self.first_ms = int(times[0])
+        self.last_ms = int(times[-1])
+        # The count is published last, so a concurrent reader never sees unwritten records
+        self.header[:HEADER.size] = np.frombuffer(
+            HEADER.pack(SEGMENT_MAGIC, self.capacity, self.count, self.first_ms, self.last_ms), dtype=np.uint8)
+
+    def flush(self):
+        self.header.flush()
+        for column in self.columns.values():
+            column.flush()
+
+    def close(self):
+        self.flush()
+        del self.header, self.columns
+
+
+class TickRecorder:
+    """
+    Appends every quote of the 'price_batch' messages it is given to memory-mapped
+    segment files in `directory` (see the file layout above). record_batch() only
+    puts the message on an internal queue; a background thread converts each batch
+    to index/price arrays and copies them into the open segment with a few vectorized
+    slice assignments, rolling over when a segment is full or older than `max_seconds`.
+    Quotes with an error code or a missing bid and ask are not recorded.
+    """
+    def __init__(self, directory, capacity=SEGMENT_CAPACITY, max_seconds=SEGMENT_MAX_SECONDS, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.capacity = capacity
+        self.max_seconds = max_seconds
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        self.names_path = os.path.join(directory, 'names.json')
+        self.exchanges, self.cryptos = _load_names(self.names_path)
+        self.exchange_index = {exchange_id: i for i, exchange_id in enumerate(self.exchanges)}
+        self.crypto_index = {crypto: i for i, crypto in enumerate(self.cryptos)}
+        self.last_ms = _last_time(directory)
+        self.segment = None
+        self.records = 0 # Written since start
+        self.names_changed = False
+        self.pending = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write_loop, name="TickRecorder", daemon=True)
+        self.writer.start()
+
+    def record_batch(self, message):
+        """Queues a 'price_batch' message for recording (cheap; safe from any thread)."""
+        self.pending.put(message)
+
+    def close(self):
+        """Writes everything queued so far and closes the open segment."""
+        self.pending.put(None)
+        self.writer.join(timeout=10)
+
+    def _index(self, names, index, name):
+        i = index.get(name)
+        if i is None:
+            i = index[name] = len(names)
+            names.append(name)
+            self.names_changed = True
+        return i
+
+    def _write_loop(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                message = self.pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                message = False
+            if message is None:
+                break
+            if message:
+                try:
+                    self._write_batch(message)
+                except Exception as e:
+                    logger.error(f"Tick recorder failed to write a batch from {message.get('id')}: {type(e).__name__} - {str(e)}")
+            if self.segment is not None and time.monotonic() - last_flush >= self.flush_interval:
+                self.segment.flush()
+                last_flush = time.monotonic()
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+        logger.info(f"Tick recorder stopped after {self.records} records in {self.directory}")
+
+    def _write_batch(self, message):
+        errors = np.asarray(message['errors'])
+        bids = np.array(message['bids'], dtype=float) # None becomes NaN
+        asks = np.array(message['asks'], dtype=float)
+        keep = (errors == 0) & ~(np.isnan(bids) & np.isnan(asks)) # 0 = PRICE_OK
+        if not keep.any():
+            return
+        self.names_changed = False
+        exchange = self._index(self.exchanges, self.exchange_index, message['id'])
+        cryptos = np.array([self._index(self.cryptos, self.crypto_index, crypto)
+                            for crypto, k in zip(message['base_cryptos'], keep) if k], dtype=np.uint32)
+        if self.names_changed: # Names must be on disk before records that use them
+            _save_names(self.names_path, self.exchanges, self.cryptos)
+
+        time_ms = max(int(message.get('received_at') or time.time() * 1000), self.last_ms) # Never decreasing
+        self.last_ms = time_ms
+        bids, asks = bids[keep], asks[keep]
+        start = 0
+        while start < len(cryptos):
+            segment = self._open_segment(time_ms)
+            end = start + min(segment.free(), len(cryptos) - start)
+            segment.append(np.full(end - start, time_ms, dtype=np.int64), exchange, cryptos[start:end], bids[start:end], asks[start:end])
+            start = end
+        self.records += len(cryptos)
+
+    def _open_segment(self, time_ms):
+        segment = self.segment
+        if segment is not None and (segment.free() == 0 or time.monotonic() - segment.opened_at >= self.max_seconds):
+            segment.close()
+            segment = self.segment = None
+        if segment is None:
+            sequence = 0
+            path = os.path.join(self.directory, f"ticks-{time_ms:013d}-{sequence:04d}.bin")
+            while os.path.exists(path): # Several rollovers within one millisecond
+                sequence += 1
+                path = os.path.join(self.directory, f"ticks-{time_ms:013d}-{sequence:04d}.bin")
+            segment = self.segment = TickSegment(path, self.capacity)
+            logger.info(f"Recording ticks to {path}")
+        return segment
+
+
+def _load_names(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            names = json.load(f)
+        return list(names['exchanges']), list(names['cryptos'])
+    except FileNotFoundError:
+        return [], []
+
+
+def _save_names(path, exchanges, cryptos):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'exchanges': exchanges, 'cryptos': cryptos}, f)
+    os.replace(tmp_path, path) # Readers never see a half-written file
+
+
+def _segment_key(path):
+    """(first time ms, sequence) from a segment name; `ticks-<ms>.bin` (older recordings) is sequence 0."""
+    parts = os.path.basename(path)[len('ticks-'):-len('.bin')].split('-')
+    return int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+
+
+def _segment_paths(directory):
+    """Segment files in recording order (not name order, which puts `-1` before `.bin`)."""
+    return sorted(glob.glob(os.path.join(directory, 'ticks-*.bin')), key=_segment_key)
+
+
+def _last_time(directory):
+    """Last recorded time in `directory` (0 if empty), so appends after a restart stay ordered."""
+    last_ms = 0
+    for path in _segment_paths(directory):
+        try:
+            _, count, _, segment_last_ms = _read_header(path)
+        except (OSError, ValueError, struct.error):
+            continue
+        if count:
+            last_ms = max(last_ms, segment_last_ms)
+    return last_ms
+
+
+class TickReader:
+    """
+    Reads a recording directory written by TickRecorder. Segments are memory-mapped
+    and sliced by binary search on their time column, so a query only touches the
+    pages of the records in its time range; segments outside it are skipped by
+    their header alone.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.exchanges, self.cryptos = _load_names(os.path.join(directory, 'names.json'))
+
+    def segments(self):
+        """[(path, count, first_ms, last_ms)] of the non-empty segments, oldest first."""
+        segments = []
+        for path in _segment_paths(self.directory):
+            capacity, count, first_ms, last_ms = _read_header(path)
+            if count:
+                segments.append((path, count, first_ms, last_ms))
+        return segments
+
+    def read(self, start_ms=None, end_ms=None, cryptos=None, exchanges=None):
+        """
+        Returns the records with start_ms <= time_ms < end_ms (open-ended when None),
+        optionally only those of the given crypto / exchange ids, as a TICK_DTYPE
+        structured array in time order. Decode indexes with `self.exchanges` and
+        `self.cryptos` (or use `decode`).
+        """
+        parts = list(self.iter_read(start_ms, end_ms, cryptos, exchanges))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=TICK_DTYPE)
+
+    def iter_read(self, start_ms=None, end_ms=None, cryptos=None, exchanges=None):
+        """Like read(), but yields one array per segment, so long ranges never sit in memory at once."""
+        crypto_ids = self._indexes(self.cryptos, cryptos)
+        exchange_ids = self._indexes(self.exchanges, exchanges)
+        for path, count, first_ms, last_ms in self.segments():
+            if (end_ms is not None and first_ms >= end_ms) or (start_ms is not None and last_ms < start_ms):
+                continue
+            capacity, _, _, _ = _read_header(path)
+            columns = _map_columns(path, capacity, 'r')
+            times = columns['time_ms'][:count]
+            lo = 0 if start_ms is None else int(np.searchsorted(times, start_ms, side='left'))
+            hi = count if end_ms is None else int(np.searchsorted(times, end_ms, side='left'))
+            if lo >= hi:
+                continue
+            mask = np.ones(hi - lo, dtype=bool)
+            if crypto_ids is not None:
+                mask &= np.isin(columns['crypto'][lo:hi], crypto_ids)
+            if exchange_ids is not None:
+                mask &= np.isin(columns['exchange'][lo:hi], exchange_ids)
+            part = np.empty(int(mask.sum()), dtype=TICK_DTYPE)
+            for name, _ in COLUMNS:
+                part[name] = columns[name][lo:hi][mask]
+            yield part
+
+    def _indexes(self, names, wanted):
+        if wanted is None:
+            return None
+        index = {name: i for i, name in enumerate(names)}
+        return np.array([index[name] for name in wanted if name in index], dtype=np.int64)
+
+    def decode(self, records):
+        """Yields (time_ms, exchange_id, crypto, bid, ask) tuples for records returned by read()."""
+        for record in records:
+            yield (int(record['time_ms']), self.exchanges[record['exchange']], self.cryptos[record['crypto']],
+                   float(record['bid']), float(record['ask']))
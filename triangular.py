@@ -0,0 +1,204 @@
+import collections
+import logging
+import threading
+import time
+
+import numpy as np
+
+from fees import FeeSchedule, market_fee
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+
+TRIANGULAR_MIN_PROFIT_PCT = 0.0 # Cycles are reported from this profit (%, after the fee of all three legs)
+TRIANGULAR_MAX_CYCLES = 20 # At most this many cycles (the most profitable) are reported per exchange and scan
+
+# One intra-exchange cycle: starting with `currencies[0]`, trade along `symbols` (one market per
+# leg, 'buy' at its ask or 'sell' at its bid, the quoted `prices`) back to `currencies[0]`.
+# `profit_pct` is what one unit of the start currency gains over the cycle, after fees.
+TriangularCycle = collections.namedtuple(
+    'TriangularCycle', ['exchange', 'currencies', 'symbols', 'sides', 'prices', 'profit_pct']
+)
+
+
+class TriangularScanner:
+    """
+    Currency graph of one exchange's spot markets, priced from a bulk fetch_tickers response.
+
+    Every market BASE/QUOTE gives two directed edges: QUOTE -> BASE (buy at the ask) and
+    BASE -> QUOTE (sell at the bid). Every triangle of currencies connected by markets is
+    enumerated once, when the scanner is built, as two cycles (one per direction) of three
+    edge indices. A scan then only fills the edges' log rates from the tickers (minus the
+    fees) and sums them per cycle in one vectorized pass; a positive sum is a profit.
+    """
+    def __init__(self, exchange_id, symbols, bases, quotes, fees):
+        self.exchange_id = exchange_id
+        self.symbols = list(symbols)
+        self.bases = list(bases)
+        self.quotes = list(quotes)
+        fees = np.asarray(fees, dtype=float)
+        # Edge 2m buys market m's base with its quote, edge 2m + 1 sells it
+        self.log_buy_factor = np.log1p(fees) # Buying at `ask` costs ask * (1 + fee) of the quote currency
+        self.log_sell_factor = np.log1p(-fees) # Selling at `bid` yields bid * (1 - fee)
+
+        currencies = {}
+        pair_market = {} # {(currency index, currency index): market}, both orders
+        neighbours = collections.defaultdict(set)
+        for m, (base, quote) in enumerate(zip(self.bases, self.quotes)):
+            u = currencies.setdefault(base, len(currencies))
+            v = currencies.setdefault(quote, len(currencies))
+            if u == v or (u, v) in pair_market: # Keep the first market of a currency pair
+                continue
+            pair_market[(u, v)] = pair_market[(v, u)] = m
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+        self.currencies = list(currencies)
+
+        def edge(a, b):
+            """Index of the edge trading currency a into currency b."""
+            m = pair_market[(a, b)]
+            return 2 * m if currencies[self.bases[m]] == b else 2 * m + 1
+
+        cycles = []
+        starts = []
+        for (u, v) in pair_market:
+            if not u < v:
+                continue
+            for w in neighbours[u] & neighbours[v]:
+                if w > v: # Each triangle once, as u < v < w
+                    cycles.append((edge(u, v), edge(v, w), edge(w, u)))
+                    cycles.append((edge(u, w), edge(w, v), edge(v, u)))
+                    starts.extend((u, u))
+        self.cycles = np.array(cycles, dtype=np.intp).reshape(-1, 3)
+        self.cycle_starts = np.array(starts, dtype=np.intp)
+        logger.info(f"Triangular scanner for {exchange_id}: {len(self.symbols)} markets, "
+                    f"{len(self.currencies)} currencies, {len(self.cycles)} cycles")
+
+    @classmethod
+    def from_exchange(cls, exchange_id, exchange, fee_schedule):
+        """Builds the scanner from a loaded ccxt exchange's active spot markets."""
+        symbols, bases, quotes, fees = [], [], [], []
+        for symbol, market in exchange.markets.items():
+            if not market.get('spot') or market.get('active') is False or not market.get('base') or not market.get('quote'):
+                continue
+            symbols.append(symbol)
+            bases.append(market['base'])
+            quotes.append(market['quote'])
+            fees.append(fee_schedule.fee(exchange_id, symbol, market_fee(exchange, symbol, fee_schedule.role)))
+        return cls(exchange_id, symbols, bases, quotes, fees)
+
+    def log_rates(self, tickers):
+        """Log exchange rate of every edge from a fetch_tickers response ({symbol: ticker}); -inf = no quote."""
+        bids = np.empty(len(self.symbols))
+        asks = np.empty(len(self.symbols))
+        for m, symbol in enumerate(self.symbols):
+            ticker = tickers.get(symbol)
+            bid = ticker.get('bid') if ticker is not None else None
+            ask = ticker.get('ask') if ticker is not None else None
+            bids[m] = np.nan if bid is None else bid
+            asks[m] = np.nan if ask is None else ask
+        usable = (bids > 0) & (asks > 0) # Also False for NaN
+        rates = np.full(2 * len(self.symbols), -np.inf)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates[0::2] = np.where(usable, -np.log(asks) - self.log_buy_factor, -np.inf)
+            rates[1::2] = np.where(usable, np.log(bids) + self.log_sell_factor, -np.inf)
+        return rates, bids, asks
+
+    def scan(self, tickers, min_profit_pct=TRIANGULAR_MIN_PROFIT_PCT, limit=TRIANGULAR_MAX_CYCLES):
+        """Returns the (at most `limit`) most profitable cycles above `min_profit_pct`, best first."""
+        if len(self.cycles) == 0:
+            return []
+        rates, bids, asks = self.log_rates(tickers)
+        profits = rates[self.cycles].sum(axis=1)
+        with np.errstate(divide='ignore'): # min_profit_pct = -100 reports every priced cycle
+            hits = np.flatnonzero(profits > np.log1p(min_profit_pct / 100))
+        if len(hits) > limit:
+            hits = hits[np.argpartition(profits[hits], -limit)[-limit:]]
+        hits = hits[np.argsort(profits[hits])[::-1]]
+
+        result = []
+        for k in hits.tolist():
+            edges = self.cycles[k].tolist()
+            markets = [e // 2 for e in edges]
+            start = self.currencies[self.cycle_starts[k]]
+            path = [start]
+            sides = []
+            prices = []
+            for e, m in zip(edges, markets):
+                if e % 2 == 0:
+                    path.append(self.bases[m])
+                    sides.append('buy')
+                    prices.append(float(asks[m]))
+                else:
+                    path.append(self.quotes[m])
+                    sides.append('sell')
+                    prices.append(float(bids[m]))
+            result.append(TriangularCycle(self.exchange_id, tuple(path[:3]), tuple(self.symbols[m] for m in markets),
+                                          tuple(sides), tuple(prices), float(np.expm1(profits[k]) * 100)))
+        return result
+
+
+class TriangularTracker:
+    """
+    Optional triangular mode: intra-exchange cycles found from each exchange's full market graph.
+
+    Shared like the DepthTracker: fetchers of exchanges that support fetch_tickers call build()
+    once their markets are loaded, ask for every ticker in each cycle (wants_all_tickers) and
+    call scan() on the response from their own thread, which returns a 'triangular' message:
+        {'type': 'triangular', 'id': exchange_id, 'cycles': [TriangularCycle, ...],
+         'cycles_checked': n, 'scan_ms': ms}
+    ArbitrageCore passes those to apply(); the front-ends read top(). Without a `fee_schedule`,
+    ArbitrageCore shares its own, so the cycles are priced with the same fees as the spreads.
+    """
+    def __init__(self, fee_schedule=None, min_profit_pct=TRIANGULAR_MIN_PROFIT_PCT, max_cycles=TRIANGULAR_MAX_CYCLES):
+        self.fee_schedule = fee_schedule # None = default FeeSchedule, unless ArbitrageCore sets its own
+        self.min_profit_pct = min_profit_pct
+        self.max_cycles = max_cycles
+        self.lock = threading.Lock() # Guards `scanners`, written by the fetchers
+        self.scanners = {} # {exchange_id: TriangularScanner}
+        self.cycles = {} # {exchange_id: [TriangularCycle, ...]}, written by the consumer
+        self.version = 0 # Bumped whenever the cycles change
+
+    def build(self, exchange_id, exchange):
+        fee_schedule = self.fee_schedule if self.fee_schedule is not None else FeeSchedule()
+        scanner = TriangularScanner.from_exchange(exchange_id, exchange, fee_schedule)
+        with self.lock:
+            self.scanners[exchange_id] = scanner
+
+    def wants_all_tickers(self, exchange_id):
+        with self.lock:
+            return exchange_id in self.scanners
+
+    def scan(self, exchange_id, tickers):
+        """Scans a fetch_tickers response of `exchange_id`; returns its 'triangular' message (None without a scanner)."""
+        with self.lock:
+            scanner = self.scanners.get(exchange_id)
+        if scanner is None:
+            return None
+        start = time.perf_counter()
+        cycles = scanner.scan(tickers, self.min_profit_pct, self.max_cycles)
+        return {'type': 'triangular', 'id': exchange_id, 'cycles': cycles, 'cycles_checked': len(scanner.cycles),
+                'scan_ms': (time.perf_counter() - start) * 1000}
+
+    def apply(self, message):
+        if message['cycles'] or self.cycles.get(message['id']):
+            self.cycles[message['id']] = message['cycles']
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.scanners.clear()
+        self.cycles.clear()
+        self.version += 1
+
+    def clear_exchange(self, exchange_id):
+        with self.lock:
+            self.scanners.pop(exchange_id, None)
+        if self.cycles.pop(exchange_id, None):
+            self.version += 1
+
+    def top(self, k=None):
+        """The most profitable cycles over all exchanges, best first."""
+        cycles = sorted((cycle for cycles in self.cycles.values() for cycle in cycles), key=lambda c: c.profit_pct, reverse=True)
+        return cycles if k is None else cycles[:k]